@@ -4,8 +4,9 @@ from flask_migrate import Migrate
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from app.config import config
+from app.db_routing import RoutingSession, init_replicas
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 limiter = Limiter(
     key_func=get_remote_address,
@@ -20,11 +21,47 @@ def create_app(config_name='default'):
     # Load configuration
     app.config.from_object(config[config_name])
     
+    from app.json_provider import init_json_provider
+    init_json_provider(app)
+    
+    # Registered first so it runs after every other after_request hook
+    from app.compression import init_compression
+    init_compression(app)
+    
+    # Registered before the other hooks so the timings cover them
+    from app.metrics import init_metrics
+    init_metrics(app)
+    
     # Initialise extensions
+    init_replicas(app)
     db.init_app(app)
     migrate.init_app(app, db)
     limiter.init_app(app)
     
+    from app.slow_queries import init_slow_query_log
+    init_slow_query_log(app)
+    
+    from app.query_stats import init_query_stats
+    init_query_stats(app)
+    
+    from app.auth_cache import init_auth_cache
+    init_auth_cache(app)
+    
+    from app.services.password_service import init_password_hasher
+    init_password_hasher(app)
+    
+    from app.services.s3_service import init_s3_service
+    init_s3_service(app)
+    
+    from app.services.image_pipeline import init_image_pipeline
+    init_image_pipeline(app)
+    
+    from app.services.email_service import init_email_dispatcher
+    init_email_dispatcher(app)
+    
+    from app.services.reminder_service import init_reminder_scheduler
+    init_reminder_scheduler(app)
+    
     # Register blueprints
     from app.routes.meals import meals_bp
     app.register_blueprint(meals_bp)
@@ -41,6 +78,10 @@ def create_app(config_name='default'):
     # Register error handlers
     register_error_handlers(app)
     
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
+    
     return app
 
 
@@ -59,4 +100,11 @@ def register_error_handlers(app):
     
     @app.errorhandler(400)
     def bad_request(error):
-        return jsonify({'error': 'Bad request', 'message': error.description}), 400
\ No newline at end of file
+        return jsonify({'error': 'Bad request', 'message': error.description}), 400
+    
+    from app.services.password_service import PasswordHasherBusyError
+    
+    @app.errorhandler(PasswordHasherBusyError)
+    def password_hasher_busy(error):
+        db.session.rollback()
+        return jsonify({'error': 'Service unavailable', 'message': str(error)}), 503, {'Retry-After': '1'}
\ No newline at end of file
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+
+class Principal:
+    '''Lightweight stand-in for the authenticated user when only its id is needed'''
+    __slots__ = ('id',)
+
+    def __init__(self, user_id):
+        self.id = user_id
+
+    def __repr__(self):
+        return f'<Principal {self.id}>'
+
+
+class PrincipalCache:
+    '''Bounded, thread-safe TTL + LRU cache of authenticated users' column values'''
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        '''Return cached column values for a user, or None on a miss'''
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                expires_at, values = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return values
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+
+    def set(self, user_id, values):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0
+            }
+
+
+def init_auth_cache(app):
+    app.extensions['auth_cache'] = PrincipalCache(
+        maxsize=app.config.get('AUTH_CACHE_MAX_SIZE', 1024),
+        ttl=app.config.get('AUTH_CACHE_TTL', 60)
+    )
+
+
+def get_auth_cache():
+    return current_app.extensions['auth_cache']
+
+
+def invalidate_user(user_id):
+    '''Drop a user from the principal cache after its row changes'''
+    get_auth_cache().invalidate(user_id)
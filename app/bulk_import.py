@@ -0,0 +1,185 @@
+import codecs
+import json
+import re
+from collections import defaultdict
+from types import SimpleNamespace
+from pydantic import ValidationError
+from sqlalchemy import insert
+from app import db
+from app.models.meal import Meal
+from app.models.meal_counters import MealCountersMixin
+from app.schemas.meal_schema import MealCreateSchema
+
+CHUNK_SIZE = 64 * 1024
+MAX_ITEM_BYTES = 64 * 1024
+_JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+MEAL_IMPORT_FIELDS = ('name', 'description', 'datetime', 'is_on_diet', 'category', 'calories',
+                      'protein_grams', 'carbohydrates_grams', 'fats_grams')
+
+
+class BulkImportError(ValueError):
+    '''Raised when the request body cannot be parsed as a stream of meals'''
+
+
+def iter_ndjson(stream):
+    '''Yield one decoded object per non-blank line of a newline-delimited JSON stream'''
+    line_number = 0
+    while True:
+        # Bounded read, so an oversized line is rejected without buffering all of it
+        line = stream.readline(MAX_ITEM_BYTES + 1)
+        if not line:
+            return
+        line_number += 1
+        if len(line) > MAX_ITEM_BYTES:
+            raise BulkImportError(f'Line {line_number} exceeds {MAX_ITEM_BYTES} bytes')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise BulkImportError(f'Invalid JSON on line {line_number}: {e}') from e
+
+
+def iter_json_array(stream):
+    '''
+    Yield the elements of a top-level JSON array, reading the stream in chunks
+
+    Parsing advances a position through the buffer; the consumed prefix is
+    only dropped when the next chunk is appended, so each byte is copied a
+    bounded number of times however small the elements are.
+    '''
+    decoder = json.JSONDecoder()
+    # Incremental so multi-byte characters split across chunks decode correctly
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = 0
+    eof = False
+    started = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            eof = True
+            text = text_decoder.decode(b'', final=True)
+        else:
+            text = text_decoder.decode(chunk)
+        buffer = buffer[position:] + text
+        position = 0
+
+    while True:
+        position = _JSON_WHITESPACE.match(buffer, position).end()
+        if position == len(buffer) and not eof:
+            fill()
+            continue
+        if not started:
+            if not buffer.startswith('[', position):
+                raise BulkImportError('Expected a JSON array or NDJSON body')
+            position += 1
+            started = True
+            continue
+        if buffer.startswith(']', position):
+            return
+        if buffer.startswith(',', position):
+            position += 1
+            continue
+        if position == len(buffer):
+            raise BulkImportError('Unexpected end of JSON array')
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except ValueError as e:
+            # Most likely the element is split across chunks: read more and retry
+            if eof or len(buffer) - position > MAX_ITEM_BYTES:
+                raise BulkImportError(f'Invalid JSON array element: {e}') from e
+            fill()
+            continue
+        if end == len(buffer) and not eof:
+            # A number at the end of the buffer may continue in the next chunk
+            fill()
+            continue
+        position = end
+        yield item
+
+
+def _insert_chunk(user_id, chunk, results):
+    '''Validate a chunk, insert the valid rows with one executemany and commit'''
+    rows = []
+    indexes = []
+    for index, item in chunk:
+        try:
+            if not isinstance(item, dict):
+                raise TypeError('Each meal must be a JSON object')
+            meal = MealCreateSchema.parse_obj(item)
+        except ValidationError as e:
+            results.append({'index': index, 'status': 'error', 'errors': json.loads(e.json())})
+            continue
+        except TypeError as e:
+            results.append({'index': index, 'status': 'error', 'errors': [{'msg': str(e)}]})
+            continue
+        row = {field: getattr(meal, field) for field in MEAL_IMPORT_FIELDS}
+        row['user_id'] = user_id
+        rows.append(row)
+        indexes.append(index)
+
+    if not rows:
+        return 0
+
+    ids = db.session.execute(
+        insert(Meal).returning(Meal.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+    _record_bulk_create([SimpleNamespace(**row) for row in rows])
+    db.session.commit()
+
+    results.extend({'index': index, 'status': 'created', 'id': meal_id} for index, meal_id in zip(indexes, ids))
+    return len(rows)
+
+
+def _record_bulk_create(meals):
+    '''Apply one aggregated delta per counter row, in a single upsert per table'''
+    for table in MealCountersMixin.__subclasses__():
+        deltas = defaultdict(lambda: defaultdict(int))
+        keys = {}
+        for meal in meals:
+            key = table.key_of(meal)
+            key_id = tuple(key.values())
+            keys[key_id] = key
+            for name, value in table.meal_values(meal).items():
+                deltas[key_id][name] += value
+        table.apply_deltas([(keys[key_id], delta) for key_id, delta in deltas.items()])
+
+
+def import_meals(user_id, items, batch_size=1000, max_items=None):
+    '''
+    Validate and insert meals from an iterable, committing every ``batch_size`` items
+
+    Chunks committed before a parse error are kept; the error is reported
+    alongside the results gathered so far.
+
+    :param items: Iterable of decoded JSON values, consumed lazily
+    :return: Dict with created/failed counts, per-item results and an optional error
+    '''
+    results = []
+    created = 0
+    chunk = []
+    error = None
+    try:
+        for index, item in enumerate(items):
+            if max_items is not None and index >= max_items:
+                raise BulkImportError(f'A bulk import may contain at most {max_items} meals')
+            chunk.append((index, item))
+            if len(chunk) >= batch_size:
+                created += _insert_chunk(user_id, chunk, results)
+                chunk = []
+    except BulkImportError as e:
+        error = str(e)
+    if chunk:
+        created += _insert_chunk(user_id, chunk, results)
+    results.sort(key=lambda result: result['index'])
+    return {
+        'created': created,
+        'failed': len(results) - created,
+        'error': error,
+        'results': results
+    }
@@ -0,0 +1,116 @@
+import click
+from app import db
+
+
+def register_commands(app):
+    """Register custom Flask CLI commands"""
+
+    @app.cli.command('rebuild-meal-stats')
+    @click.option('--user-id', type=int, default=None, help='Only rebuild stats for this user.')
+    def rebuild_meal_stats(user_id):
+        '''Backfill or rebuild the user_meal_stats table from meals'''
+        from app.models.user_meal_stats import UserMealStats
+
+        key = {'user_id': user_id} if user_id is not None else {}
+        rows = UserMealStats.rebuild(**key)
+        db.session.commit()
+        click.echo(f'Rebuilt meal stats for {rows} user(s).')
+
+    @app.cli.command('rebuild-meal-rollups')
+    @click.option('--user-id', type=int, default=None, help='Only rebuild rollups for this user.')
+    def rebuild_meal_rollups(user_id):
+        '''Backfill or rebuild the meal_daily_rollups table from meals'''
+        from app.models.meal_daily_rollup import MealDailyRollup
+
+        key = {'user_id': user_id} if user_id is not None else {}
+        rows = MealDailyRollup.rebuild(**key)
+        db.session.commit()
+        click.echo(f'Rebuilt {rows} daily meal rollup(s).')
+
+    @app.cli.command('rebuild-feeds')
+    def rebuild_feeds():
+        '''Backfill or rebuild the feed_entries table from followers and shared items'''
+        from app.models.feed_entry import FeedEntry
+
+        rows = FeedEntry.rebuild()
+        db.session.commit()
+        click.echo(f'Rebuilt {rows} feed entries.')
+
+    @app.cli.command('rebuild-shared-snapshots')
+    @click.option('--batch-size', type=int, default=500, help='Shared items refreshed per transaction.')
+    def rebuild_shared_snapshots(batch_size):
+        '''Rebuild the meal snapshots stored on shared items'''
+        from app.models.shared_item import SharedItem
+
+        total = 0
+        last_id = 0
+        while True:
+            items = SharedItem.query.filter(SharedItem.id > last_id).order_by(SharedItem.id).limit(batch_size).all()
+            if not items:
+                break
+            SharedItem.refresh_snapshots(items)
+            db.session.commit()
+            total += len(items)
+            last_id = items[-1].id
+        click.echo(f'Rebuilt meal snapshots for {total} shared item(s).')
+
+    @app.cli.command('sweep-refresh-tokens')
+    @click.option('--batch-size', type=int, default=1000, help='Expired tokens deleted per transaction.')
+    def sweep_refresh_tokens(batch_size):
+        '''Delete expired refresh tokens in batches'''
+        from app.models.refresh_token import RefreshToken
+
+        rows = RefreshToken.sweep_expired(batch_size)
+        click.echo(f'Deleted {rows} expired refresh token(s).')
+
+    @app.cli.command('sweep-image-jobs')
+    @click.option('--max-age', type=int, default=None,
+                  help='Minutes after which a pending image is considered lost (default IMAGE_JOB_MAX_AGE_MINUTES).')
+    def sweep_image_jobs(max_age):
+        '''Re-queue or fail meal images stuck in pending and delete orphaned spool files'''
+        from app.services.image_pipeline import get_image_pipeline
+
+        if max_age is None:
+            max_age = app.config.get('IMAGE_JOB_MAX_AGE_MINUTES', 15)
+        totals = get_image_pipeline().sweep(max_age)
+        click.echo(f"Requeued {totals['requeued']} image job(s), failed {totals['failed']}, "
+                   f"deleted {totals['deleted']} orphaned spool file(s).")
+
+    @app.cli.command('dispatch-emails')
+    @click.option('--once', is_flag=True, help='Drain the outbox once and exit instead of running continuously.')
+    def dispatch_emails(once):
+        '''Deliver queued emails from the outbox'''
+        from app.services.email_service import get_email_dispatcher
+
+        dispatcher = get_email_dispatcher()
+        if once:
+            totals = dispatcher.drain()
+            click.echo(f"Sent {totals['sent']} email(s), {totals['failed']} failed.")
+            return
+        click.echo('Dispatching emails, press Ctrl+C to stop.')
+        dispatcher.run_forever()
+
+    @app.cli.command('slow-queries')
+    @click.option('--top', type=int, default=10, help='Number of statements to show.')
+    @click.option('--sort', type=click.Choice(['total', 'count', 'max', 'mean']), default='total',
+                  help='Rank statements by total, count, max or mean duration.')
+    @click.option('--plans/--no-plans', default=True, help='Show the latest captured EXPLAIN plan.')
+    def slow_queries(top, sort, plans):
+        '''Summarise the slow-query log by statement fingerprint'''
+        from app.slow_queries import read_slow_queries, slow_query_log_path, summarize_slow_queries
+
+        path = slow_query_log_path(app)
+        groups = summarize_slow_queries(read_slow_queries(path))
+        if not groups:
+            click.echo(f'No slow queries logged in {path}.')
+            return
+        groups.sort(key=lambda group: group[sort if sort == 'count' else f'{sort}_ms'], reverse=True)
+        for rank, group in enumerate(groups[:top], start=1):
+            click.echo(f"{rank}. {group['count']}x  total {group['total_ms']:.1f} ms  "
+                       f"mean {group['mean_ms']:.1f} ms  max {group['max_ms']:.1f} ms")
+            click.echo(f"   {group['fingerprint']}")
+            if group['routes']:
+                click.echo(f"   routes: {', '.join(group['routes'])}")
+            if plans and group['plan']:
+                for line in group['plan']:
+                    click.echo(f'   | {line}')
@@ -0,0 +1,91 @@
+import gzip
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is listed in requirements.txt
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = (
+    'application/json', 'application/msgpack', 'application/x-ndjson',
+    'text/csv', 'text/html', 'text/plain'
+)
+
+
+def _choose_encoding():
+    encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(encodings)
+
+
+def _compressor(encoding, gzip_level, brotli_quality):
+    '''Return (compress, flush) callables for a streaming compressor'''
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=brotli_quality)
+        return compressor.process, compressor.finish
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def _compress_stream(chunks, body, encoding, gzip_level, brotli_quality):
+    compress, flush = _compressor(encoding, gzip_level, brotli_quality)
+    try:
+        for chunk in chunks:
+            data = compress(chunk)
+            if data:
+                yield data
+        yield flush()
+    finally:
+        close = getattr(body, 'close', None)
+        if close is not None:
+            close()
+
+
+def compress_response(response, min_size=1024, gzip_level=6, brotli_quality=4):
+    '''
+    Compress a response with brotli or gzip if the client accepts it
+
+    Buffered bodies smaller than ``min_size`` are left alone; streamed bodies
+    are compressed chunk by chunk as they are produced.
+    '''
+    if (
+        response.status_code < 200 or response.status_code in (204, 304)
+        or response.direct_passthrough
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.iter_encoded(), response.response, encoding, gzip_level, brotli_quality)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        if encoding == 'br':
+            response.set_data(brotli.compress(data, quality=brotli_quality))
+        else:
+            response.set_data(gzip.compress(data, compresslevel=gzip_level, mtime=0))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_compression(app):
+    '''Compress eligible responses in an after_request hook'''
+    if not app.config.get('COMPRESSION_ENABLED', True):
+        return
+
+    min_size = app.config.get('COMPRESSION_MIN_SIZE', 1024)
+    gzip_level = app.config.get('COMPRESSION_GZIP_LEVEL', 6)
+    brotli_quality = app.config.get('COMPRESSION_BROTLI_QUALITY', 4)
+
+    @app.after_request
+    def compress(response):
+        return compress_response(response, min_size, gzip_level, brotli_quality)
@@ -4,10 +4,121 @@ from pathlib import Path
 basedir = Path(__file__).parent.parent
 
 
+def _engine_options():
+    '''Connection pool settings for every engine, from DB_POOL_* environment variables'''
+    options = {'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')}
+    for option, variable in (('pool_size', 'DB_POOL_SIZE'), ('max_overflow', 'DB_MAX_OVERFLOW'),
+                             ('pool_timeout', 'DB_POOL_TIMEOUT'), ('pool_recycle', 'DB_POOL_RECYCLE')):
+        if os.environ.get(variable):
+            options[option] = int(os.environ[variable])
+    return options
+
+
+def _replica_uris():
+    return [uri.strip() for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri.strip()]
+
+
 class Config:
     '''Base configuration'''
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options()
+    
+    # Flask-Limiter; disable for load tests against a running server
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    
+    # Read replicas for handlers marked with use_replica (comma-separated DATABASE_REPLICA_URLS)
+    SQLALCHEMY_REPLICA_URIS = _replica_uris()
+    
+    # Response compression (brotli or gzip, by Accept-Encoding) for bodies above the minimum size
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+    
+    # Per-request SQL statement counting; warn above QUERY_COUNT_WARN_THRESHOLD
+    # statements or when one statement repeats QUERY_REPEAT_WARN_THRESHOLD times (N+1)
+    QUERY_STATS_ENABLED = os.environ.get('QUERY_STATS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    QUERY_COUNT_WARN_THRESHOLD = int(os.environ.get('QUERY_COUNT_WARN_THRESHOLD', 20))
+    QUERY_REPEAT_WARN_THRESHOLD = int(os.environ.get('QUERY_REPEAT_WARN_THRESHOLD', 5))
+    
+    # Statements slower than SLOW_QUERY_THRESHOLD_MS go to a rotating JSON-lines log
+    # (one file per process, default instance/slow_queries.<pid>.log) with their EXPLAIN plan;
+    # summarise with `flask slow-queries`
+    SLOW_QUERY_LOG_ENABLED = os.environ.get('SLOW_QUERY_LOG_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    SLOW_QUERY_LOG_FILE = os.environ.get('SLOW_QUERY_LOG_FILE')
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 100))
+    SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'true').lower() in ('1', 'true', 'yes')
+    SLOW_QUERY_EXPLAIN_INTERVAL = int(os.environ.get('SLOW_QUERY_EXPLAIN_INTERVAL', 300))
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024))
+    SLOW_QUERY_LOG_BACKUPS = int(os.environ.get('SLOW_QUERY_LOG_BACKUPS', 5))
+    
+    # Request metrics, optionally served at /metrics; with several worker processes point METRICS_DIR
+    # (or PROMETHEUS_MULTIPROC_DIR) at a directory they share so every scrape sees all of them
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    METRICS_DIR = os.environ.get('METRICS_DIR') or os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))
+    METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', 'true').lower() in ('1', 'true', 'yes')
+    # /metrics exposes per-route traffic and internals: off unless enabled for the deployment,
+    # and then limited to METRICS_TOKEN (Authorization: Bearer) and/or METRICS_ALLOWED_IPS (comma-separated),
+    # or to loopback clients when neither is set
+    METRICS_ENDPOINT_ENABLED = os.environ.get('METRICS_ENDPOINT_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_ALLOWED_IPS = [ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+    
+    # Authenticated-user cache used by token_required
+    AUTH_CACHE_MAX_SIZE = int(os.environ.get('AUTH_CACHE_MAX_SIZE', 1024))
+    AUTH_CACHE_TTL = int(os.environ.get('AUTH_CACHE_TTL', 60))
+    
+    # Password hashing: Werkzeug method string and the size of the hashing pool
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 8))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+    
+    # Meal image pipeline: uploads are spooled locally and pushed to storage in the background
+    IMAGE_STORAGE_BACKEND = os.environ.get('IMAGE_STORAGE_BACKEND', 's3')
+    IMAGE_STORAGE_DIR = os.environ.get('IMAGE_STORAGE_DIR') or str(basedir / 'instance' / 'images')
+    IMAGE_STORAGE_BASE_URL = os.environ.get('IMAGE_STORAGE_BASE_URL')
+    IMAGE_SPOOL_DIR = os.environ.get('IMAGE_SPOOL_DIR')
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+    IMAGE_THUMBNAIL_SIZES = (128, 512)
+    # Pending images older than this are re-queued or failed by `flask sweep-image-jobs`
+    IMAGE_JOB_MAX_AGE_MINUTES = int(os.environ.get('IMAGE_JOB_MAX_AGE_MINUTES', 15))
+    IMAGE_MAX_UPLOAD_BYTES = int(os.environ.get('IMAGE_MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+    IMAGE_UPLOAD_URL_EXPIRES = int(os.environ.get('IMAGE_UPLOAD_URL_EXPIRES', 300))
+    
+    # Shared S3 client: connection pool, timeouts and multipart transfer tuning
+    S3_BUCKET_NAME = os.environ.get('S3_BUCKET_NAME')
+    AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
+    AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
+    AWS_REGION = os.environ.get('AWS_REGION')
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL')
+    S3_MAX_POOL_CONNECTIONS = int(os.environ.get('S3_MAX_POOL_CONNECTIONS', 50))
+    S3_CONNECT_TIMEOUT = float(os.environ.get('S3_CONNECT_TIMEOUT', 5))
+    S3_READ_TIMEOUT = float(os.environ.get('S3_READ_TIMEOUT', 60))
+    S3_MAX_ATTEMPTS = int(os.environ.get('S3_MAX_ATTEMPTS', 3))
+    S3_MULTIPART_THRESHOLD = int(os.environ.get('S3_MULTIPART_THRESHOLD', 8 * 1024 * 1024))
+    S3_MULTIPART_CHUNKSIZE = int(os.environ.get('S3_MULTIPART_CHUNKSIZE', 8 * 1024 * 1024))
+    S3_MAX_CONCURRENCY = int(os.environ.get('S3_MAX_CONCURRENCY', 4))
+    
+    # Email outbox: transport, dispatcher placement (thread, worker or inline) and retry policy
+    EMAIL_TRANSPORT = os.environ.get('EMAIL_TRANSPORT', 'sendgrid')
+    SENDGRID_API_KEY = os.environ.get('SENDGRID_API_KEY')
+    SENDER_EMAIL = os.environ.get('SENDER_EMAIL')
+    EMAIL_DISPATCH_MODE = os.environ.get('EMAIL_DISPATCH_MODE', 'thread')
+    EMAIL_BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', 500))
+    EMAIL_POLL_INTERVAL = float(os.environ.get('EMAIL_POLL_INTERVAL', 5))
+    EMAIL_MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', 5))
+    EMAIL_BACKOFF_BASE = float(os.environ.get('EMAIL_BACKOFF_BASE', 30))
+    EMAIL_BACKOFF_MAX = float(os.environ.get('EMAIL_BACKOFF_MAX', 3600))
+    EMAIL_LEASE_SECONDS = int(os.environ.get('EMAIL_LEASE_SECONDS', 300))
+    
+    # Reminder scheduler (scheduler.py): how far ahead to remind and how often to scan
+    REMINDER_LEAD_MINUTES = int(os.environ.get('REMINDER_LEAD_MINUTES', 60))
+    REMINDER_INTERVAL_SECONDS = int(os.environ.get('REMINDER_INTERVAL_SECONDS', 300))
+    REMINDER_USER_BATCH_SIZE = int(os.environ.get('REMINDER_USER_BATCH_SIZE', 1000))
+    REMINDER_RETENTION_HOURS = int(os.environ.get('REMINDER_RETENTION_HOURS', 24))
     
     
 class DevelopmentConfig(Config):
@@ -27,6 +138,16 @@ class TestingConfig(Config):
     '''Testing configuration'''
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SQLALCHEMY_REPLICA_URIS = []
+    METRICS_DIR = None
+    SLOW_QUERY_LOG_ENABLED = False
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    PASSWORD_HASH_WORKERS = 0
+    IMAGE_STORAGE_BACKEND = 'filesystem'
+    IMAGE_WORKERS = 0
+    EMAIL_TRANSPORT = 'local'
+    EMAIL_DISPATCH_MODE = 'inline'
 
 
 config = {
@@ -0,0 +1,102 @@
+import random
+import threading
+import time
+import weakref
+from functools import wraps
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+
+REPLICA_BIND_PREFIX = 'replica_'
+# Seconds a replica that failed to connect is skipped before it is tried again
+REPLICA_RETRY_SECONDS = 30
+
+# Replica engine -> time.monotonic() until which it is skipped
+_unavailable_until = weakref.WeakKeyDictionary()
+_unavailable_lock = threading.Lock()
+
+
+class RoutingSession(Session):
+    '''
+    Session that sends the reads of replica-enabled handlers to a read replica
+
+    Everything else uses the primary: writes, flushes, locking reads and raw
+    SQL. Once a session has written, it stays pinned to the primary so the
+    rest of the request reads its own writes. A replica that cannot be
+    connected to is skipped for REPLICA_RETRY_SECONDS and its reads go to
+    the primary.
+    '''
+
+    def _is_write(self, clause):
+        if self._flushing or clause is None:
+            return self._flushing
+        if isinstance(clause, (UpdateBase, TextClause)):
+            return True
+        return getattr(clause, '_for_update_arg', None) is not None
+
+    def _replica_engine(self):
+        # Stick to one replica per session so a request sees a single snapshot
+        if 'replica_key' in self.info:
+            key = self.info['replica_key']
+            return self._db.engines[key] if key is not None else None
+
+        now = time.monotonic()
+        engines = self._db.engines
+        replica_keys = [
+            key for key in engines
+            if key and key.startswith(REPLICA_BIND_PREFIX) and _unavailable_until.get(engines[key], 0) <= now
+        ]
+        key = random.choice(replica_keys) if replica_keys else None
+        if key is not None and not _is_available(engines[key]):
+            key = None
+        self.info['replica_key'] = key
+        return engines[key] if key is not None else None
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context() and g.get('use_replica') and not self.info.get('pinned_to_primary'):
+            if self._is_write(clause) or self.new or self.dirty or self.deleted:
+                self.info['pinned_to_primary'] = True
+            else:
+                engine = self._replica_engine()
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _is_available(engine):
+    '''Check out a connection from the replica's pool; mark the replica unavailable if that fails'''
+    try:
+        with engine.connect():
+            return True
+    except DBAPIError as e:
+        with _unavailable_lock:
+            _unavailable_until[engine] = time.monotonic() + REPLICA_RETRY_SECONDS
+        current_app.logger.warning('Replica %s unavailable, reading from the primary: %s', engine.url, e)
+        return False
+
+
+def init_replicas(app):
+    '''Register SQLALCHEMY_REPLICA_URIS as replica binds; call before db.init_app'''
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    engine_options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    for index, uri in enumerate(app.config.get('SQLALCHEMY_REPLICA_URIS') or []):
+        # Binds do not inherit SQLALCHEMY_ENGINE_OPTIONS, so pass the pool settings explicitly
+        binds[f'{REPLICA_BIND_PREFIX}{index}'] = {'url': uri, **engine_options}
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def use_replica(f):
+    '''
+    Let a read-only handler read from a replica when one is configured
+
+    Apply it below ``token_required`` so the authenticated user is still
+    loaded from the primary.
+    '''
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.use_replica = True
+        return f(*args, **kwargs)
+
+    return decorated
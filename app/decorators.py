@@ -1,11 +1,55 @@
 from functools import wraps
+import time
 import jwt
 from flask import request, jsonify, current_app
+from sqlalchemy.orm import make_transient_to_detached
+from app import db
+from app.auth_cache import Principal, get_auth_cache
+from app.metrics import record_phase
 from app.models.user import User
 
-def token_required(f):
+
+# Credentials stay out of the cache; on a hit they are loaded on first access
+UNCACHED_USER_COLUMNS = ('password_hash',)
+
+
+def load_user(user_id, bypass_cache=False):
+    '''
+    Load the authenticated user, going through the principal cache.
+
+    On a hit the cached column values are merged into the session without a
+    SELECT. They may be up to AUTH_CACHE_TTL seconds old (another worker may
+    have changed the row), so handlers that modify the user pass
+    ``bypass_cache=True`` to read the row itself.
+    '''
+    cache = get_auth_cache()
+    values = None if bypass_cache else cache.get(user_id)
+    if values is None:
+        user = db.session.get(User, user_id)
+        if user is not None:
+            cache.set(user_id, {column.key: getattr(user, column.key) for column in User.__table__.columns
+                                if column.key not in UNCACHED_USER_COLUMNS})
+        return user
+
+    user = User(**values)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def token_required(f=None, *, load_user_row=True, bypass_cache=False):
+    '''
+    Require a valid access token and pass the authenticated user as first argument.
+
+    Use ``@token_required(load_user_row=False)`` for handlers that only need
+    ``current_user.id``: they receive a Principal and no user lookup happens.
+    Handlers that write to the user use ``@token_required(bypass_cache=True)``.
+    '''
+    if f is None:
+        return lambda func: token_required(func, load_user_row=load_user_row, bypass_cache=bypass_cache)
+
     @wraps(f)
     def decorated(*args, **kwargs):
+        started = time.perf_counter()
         token = None
         if 'Authorization' in request.headers:
             token = request.headers['Authorization'].split(' ')[1]
@@ -15,12 +59,19 @@ def token_required(f):
 
         try:
             data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.get(data['user_id'])
         except jwt.ExpiredSignatureError:
             return jsonify({'error': 'Token has expired'}), 401
         except jwt.InvalidTokenError:
             return jsonify({'error': 'Token is invalid'}), 401
 
+        if load_user_row:
+            current_user = load_user(data['user_id'], bypass_cache=bypass_cache)
+            if current_user is None:
+                return jsonify({'error': 'Token is invalid'}), 401
+        else:
+            current_user = Principal(data['user_id'])
+
+        record_phase('auth', time.perf_counter() - started)
         return f(current_user, *args, **kwargs)
 
     return decorated
@@ -0,0 +1,69 @@
+import hashlib
+from datetime import timezone
+from flask import current_app, has_request_context, request, make_response
+from app.json_provider import negotiated_mimetype
+
+
+def make_etag(*parts):
+    '''
+    Build an ETag from cheap version stamps (ids, timestamps, counters), not the body
+
+    Inside a request the negotiated mimetype is part of the tag, so the JSON
+    and MessagePack representations of a resource never share one.
+    '''
+    if has_request_context():
+        parts += (negotiated_mimetype(),)
+    raw = '|'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha1(raw.encode()).hexdigest()[:32]
+
+
+def _as_utc(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def is_not_modified(etag, last_modified=None):
+    '''Evaluate If-None-Match / If-Modified-Since against the current version'''
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return _as_utc(last_modified).replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional_response(etag, build, last_modified=None, public=False, max_age=0):
+    '''
+    Answer a GET with 304 when the client already holds the current version.
+
+    :param etag: Version stamp from make_etag
+    :param build: Callable returning the usual (body, status) pair; skipped on 304
+    :param last_modified: Datetime of the last change, or None if it cannot be trusted
+    :param public: Allow shared caches (CDNs) to store the response
+    :param max_age: Seconds shared caches may serve a public response without revalidating
+    :return: Flask response
+    '''
+    if is_not_modified(etag, last_modified):
+        response = make_response('', 304)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+
+    response.set_etag(etag, weak=True)
+    # The 304 must name the same request headers as the 200 it revalidates
+    response.vary.add('Accept')
+    if current_app.config.get('COMPRESSION_ENABLED', True):
+        response.vary.add('Accept-Encoding')
+    if last_modified is not None:
+        response.last_modified = _as_utc(last_modified)
+    if public:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+    else:
+        # Per-user data: browsers may keep it but must revalidate every time
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,87 @@
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from app.metrics import timed_phase
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is listed in requirements.txt
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is listed in requirements.txt
+    msgpack = None
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+
+def wants_msgpack():
+    '''True when the request's Accept header prefers MessagePack over JSON'''
+    if msgpack is None or not has_request_context():
+        return False
+    return request.accept_mimetypes.best_match(['application/json', MSGPACK_MIMETYPE]) == MSGPACK_MIMETYPE
+
+
+def negotiated_mimetype():
+    '''Mimetype jsonify() will answer the current request with'''
+    return MSGPACK_MIMETYPE if wants_msgpack() else 'application/json'
+
+
+class NegotiatingJSONProvider(DefaultJSONProvider):
+    '''
+    JSON provider whose jsonify() responses honour ``Accept: application/msgpack``
+
+    The MessagePack body encodes the same object as the JSON one, with the
+    same ``default`` hook for datetimes and other non-native values.
+    '''
+
+    def response(self, *args, **kwargs):
+        with timed_phase('serialization'):
+            return self._negotiated_response(*args, **kwargs)
+
+    def _negotiated_response(self, *args, **kwargs):
+        if wants_msgpack():
+            obj = self._prepare_response_obj(args, kwargs)
+            response = self._app.response_class(
+                msgpack.packb(obj, default=self.default, use_bin_type=True),
+                mimetype=MSGPACK_MIMETYPE
+            )
+        else:
+            response = self.json_response(*args, **kwargs)
+        response.vary.add('Accept')
+        return response
+
+    def json_response(self, *args, **kwargs):
+        return super().response(*args, **kwargs)
+
+
+class OrjsonProvider(NegotiatingJSONProvider):
+    '''
+    JSON provider backed by orjson
+
+    Datetimes are passed through to Flask's default hook so the output matches
+    DefaultJSONProvider; keys are not sorted, which saves a pass per object.
+    '''
+    sort_keys = False
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def json_response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.option
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option) + b'\n',
+            mimetype=self.mimetype
+        )
+
+
+def init_json_provider(app):
+    '''Use orjson for request/response JSON when it is installed; negotiate MessagePack either way'''
+    app.json = OrjsonProvider(app) if orjson is not None else NegotiatingJSONProvider(app)
@@ -0,0 +1,328 @@
+import atexit
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from flask import Response, current_app, g, jsonify, request
+
+# Latency histogram upper bounds in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Server-Timing entries, in header order; 'total' is always present
+PHASES = ('auth', 'db', 'serialization')
+
+# Who may scrape /metrics when neither METRICS_TOKEN nor METRICS_ALLOWED_IPS is set
+LOOPBACK_ADDRESSES = frozenset(('127.0.0.1', '::1'))
+
+# name -> (type, help)
+METRICS = {
+    'http_requests_total': ('counter', 'Requests handled, by route, method and status'),
+    'http_request_duration_seconds': ('histogram', 'Request latency by route and phase (total, auth, db, serialization)'),
+    'http_request_db_queries_total': ('counter', 'SQL statements executed by requests, by route'),
+    'ratelimit_rejections_total': ('counter', 'Requests rejected by the rate limiter, by route'),
+    'auth_cache_hits_total': ('counter', 'Authenticated-user cache hits'),
+    'auth_cache_misses_total': ('counter', 'Authenticated-user cache misses'),
+    'auth_cache_evictions_total': ('counter', 'Authenticated-user cache evictions'),
+    'auth_cache_hit_ratio': ('gauge', 'Authenticated-user cache hits over lookups, across workers'),
+    'db_pool_size': ('gauge', 'Configured connection pool size, by bind'),
+    'db_pool_checked_out': ('gauge', 'Connections currently in use, by bind'),
+    'db_pool_checked_in': ('gauge', 'Idle connections held by the pool, by bind'),
+    'db_pool_overflow': ('gauge', 'Connections opened beyond the pool size (negative while below it), by bind'),
+}
+
+# Per-process totals from the auth cache, reported as counters
+_AUTH_CACHE_COUNTERS = (
+    ('auth_cache_hits_total', 'hits'),
+    ('auth_cache_misses_total', 'misses'),
+    ('auth_cache_evictions_total', 'evictions'),
+)
+
+
+@contextmanager
+def timed_phase(phase):
+    '''Add the time spent in the block to the current request's ``phase``'''
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - started)
+
+
+def record_phase(phase, seconds):
+    timings = g.get('phase_timings')
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+
+class MetricsRegistry:
+    '''
+    Per-process counters and histograms
+
+    With a ``directory`` every worker process writes its own snapshot to
+    ``metrics_<pid>.json`` there (at most once per ``flush_interval`` and on
+    exit), and render() aggregates all of them, so any worker can answer a
+    scrape for the whole server. Counters and histograms of exited workers
+    keep counting; their gauges are dropped. Empty the directory when the
+    server is redeployed.
+    '''
+
+    def __init__(self, directory=None, buckets=DEFAULT_BUCKETS, flush_interval=1.0):
+        self.directory = directory
+        self.buckets = tuple(buckets)
+        self.flush_interval = flush_interval
+        # Callables returning {(name, labels): value}, read at every snapshot
+        self.counter_callbacks = []
+        self.gauge_callbacks = []
+        self._reset()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            atexit.register(self.flush, force=True)
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._last_flush = 0.0
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            self._counters[(name, labels)] += value
+
+    def observe(self, name, labels, value):
+        '''Record ``value`` in the histogram; stored as per-bucket counts, then sum and count'''
+        with self._lock:
+            series = self._histograms.get((name, labels))
+            if series is None:
+                series = self._histograms[(name, labels)] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            index = 0
+            while index < len(self.buckets) and value > self.buckets[index]:
+                index += 1
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        '''This process's series as JSON-serialisable lists, gauges read from the callbacks now'''
+        def read(callbacks):
+            return [[name, list(labels), value] for callback in callbacks for (name, labels), value in callback().items()]
+
+        gauges = read(self.gauge_callbacks)
+        counters = read(self.counter_callbacks)
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'buckets': list(self.buckets),
+                'counters': counters + [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), list(series)] for (name, labels), series in self._histograms.items()],
+                'gauges': gauges,
+            }
+
+    def flush(self, force=False):
+        '''Write this process's snapshot to the shared directory, if due'''
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        path = os.path.join(self.directory, f'metrics_{os.getpid()}.json')
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as output:
+            json.dump(self.snapshot(), output)
+        os.replace(temporary, path)
+
+    def collect(self):
+        '''Snapshots of every process sharing the directory, or just this one'''
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush(force=True)
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics_*.json')):
+            try:
+                with open(path) as source:
+                    snapshots.append(json.load(source))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render(self):
+        '''Aggregate all processes in the Prometheus text exposition format'''
+        counters = defaultdict(float)
+        gauges = defaultdict(float)
+        histograms = {}
+        buckets = self.buckets
+        for snapshot in self.collect():
+            for name, labels, value in snapshot['counters']:
+                counters[(name, _labels_key(labels))] += value
+            if _is_alive(snapshot['pid']):
+                for name, labels, value in snapshot['gauges']:
+                    gauges[(name, _labels_key(labels))] += value
+            if tuple(snapshot['buckets']) != buckets:
+                continue
+            for name, labels, series in snapshot['histograms']:
+                key = (name, _labels_key(labels))
+                total = histograms.get(key)
+                histograms[key] = series if total is None else [a + b for a, b in zip(total, series)]
+
+        hits = counters.get(('auth_cache_hits_total', ()), 0)
+        lookups = hits + counters.get(('auth_cache_misses_total', ()), 0)
+        gauges[('auth_cache_hit_ratio', ())] = hits / lookups if lookups else 0.0
+
+        series_by_name = defaultdict(list)
+        for (name, labels), value in sorted(counters.items()) + sorted(gauges.items()):
+            series_by_name[name].append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        for (name, labels), series in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), series):
+                cumulative += count
+                bucket_labels = labels + (('le', _format_value(bound) if bound != '+Inf' else bound),)
+                series_by_name[name].append(f'{name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+            series_by_name[name].append(f'{name}_sum{_format_labels(labels)} {_format_value(series[-2])}')
+            series_by_name[name].append(f'{name}_count{_format_labels(labels)} {series[-1]}')
+
+        lines = []
+        for name in sorted(series_by_name):
+            kind, help_text = METRICS.get(name, ('untyped', name))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(series_by_name[name])
+        return '\n'.join(lines) + '\n'
+
+
+def _labels_key(labels):
+    return tuple(tuple(pair) for pair in labels)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _is_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _pool_gauges(app):
+    '''Connection pool occupancy of every engine, labelled by bind'''
+    from app import db
+
+    def collect():
+        values = {}
+        with app.app_context():
+            engines = dict(db.engines)
+        for bind, engine in engines.items():
+            pool = engine.pool
+            labels = (('bind', bind or 'default'),)
+            for name, attribute in (('db_pool_size', 'size'), ('db_pool_checked_out', 'checkedout'),
+                                    ('db_pool_checked_in', 'checkedin'), ('db_pool_overflow', 'overflow')):
+                method = getattr(pool, attribute, None)
+                if method is not None:
+                    values[(name, labels)] = method()
+        return values
+    return collect
+
+
+def _auth_cache_counters(app):
+    '''The auth cache's cumulative hit, miss and eviction totals for this process'''
+    def collect():
+        cache = app.extensions.get('auth_cache')
+        stats = cache.stats() if cache is not None else {}
+        return {(name, ()): stats.get(key, 0) for name, key in _AUTH_CACHE_COUNTERS}
+    return collect
+
+
+def init_metrics(app):
+    '''Time every request, add Server-Timing and, when enabled, serve /metrics in Prometheus text format'''
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    registry = MetricsRegistry(
+        directory=app.config.get('METRICS_DIR'),
+        flush_interval=app.config.get('METRICS_FLUSH_INTERVAL', 1.0)
+    )
+    registry.counter_callbacks.append(_auth_cache_counters(app))
+    registry.gauge_callbacks.append(_pool_gauges(app))
+    app.extensions['metrics'] = registry
+    server_timing = app.config.get('METRICS_SERVER_TIMING', True)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.phase_timings = {}
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('request_started')
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        method = request.method
+        registry.inc('http_requests_total', (('route', route), ('method', method), ('status', str(response.status_code))))
+        if response.status_code == 429:
+            registry.inc('ratelimit_rejections_total', (('route', route),))
+        if started is None:
+            return response
+
+        phases = dict(g.get('phase_timings') or {})
+        query_stats = g.get('query_stats')
+        if query_stats is not None:
+            phases['db'] = query_stats.duration
+            registry.inc('http_request_db_queries_total', (('route', route),), query_stats.count)
+        total = time.perf_counter() - started
+        for phase, seconds in (('total', total),) + tuple((phase, phases[phase]) for phase in PHASES if phase in phases):
+            registry.observe('http_request_duration_seconds', (('route', route), ('method', method), ('phase', phase)), seconds)
+
+        if server_timing:
+            entries = [f'{phase};dur={phases[phase] * 1000:.2f}' for phase in PHASES if phase in phases]
+            entries.append(f'total;dur={total * 1000:.2f}')
+            response.headers['Server-Timing'] = ', '.join(entries)
+        registry.flush()
+        return response
+
+    if app.config.get('METRICS_ENDPOINT_ENABLED', False):
+        register_metrics_endpoint(app, registry)
+
+
+def register_metrics_endpoint(app, registry):
+    '''
+    Serve /metrics, restricted to METRICS_TOKEN (as a bearer token) and/or
+    METRICS_ALLOWED_IPS when they are set, and to loopback clients when
+    neither is
+    '''
+    token = app.config.get('METRICS_TOKEN')
+    allowed_ips = set(app.config.get('METRICS_ALLOWED_IPS') or ())
+    if not token and not allowed_ips:
+        allowed_ips = LOOPBACK_ADDRESSES
+
+    def metrics():
+        if allowed_ips and request.remote_addr not in allowed_ips:
+            return jsonify({'error': 'Forbidden'}), 403
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return jsonify({'error': 'Invalid metrics token'}), 401
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    from app import limiter
+    app.add_url_rule('/metrics', 'metrics', limiter.exempt(metrics))
+
+
+def get_metrics():
+    return current_app.extensions['metrics']
@@ -1,5 +1,11 @@
 from app.models.meal import Meal
 from app.models.user import User
 from app.models.shared_item import SharedItem
+from app.models.user_meal_stats import UserMealStats
+from app.models.meal_daily_rollup import MealDailyRollup
+from app.models.feed_entry import FeedEntry
+from app.models.refresh_token import RefreshToken
+from app.models.email_outbox import EmailOutbox
+from app.models.meal_reminder import MealReminder
 
-__all__ = ['Meal', 'User', 'SharedItem']
+__all__ = ['Meal', 'User', 'SharedItem', 'UserMealStats', 'MealDailyRollup', 'FeedEntry', 'RefreshToken', 'EmailOutbox', 'MealReminder']
@@ -0,0 +1,124 @@
+import random
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert, or_, select, update
+from app import db
+
+
+class EmailOutbox(db.Model):
+    '''
+    An email waiting to be delivered by the background dispatcher
+
+    Rows are added in the same transaction as the change that triggers the
+    email, so a rolled-back request never sends mail and a committed one
+    never loses it.
+    '''
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    html_content = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<EmailOutbox {self.id} {self.to_email} {self.status}>'
+
+    @classmethod
+    def enqueue(cls, to_email, subject, html_content):
+        '''Add an email to the outbox; it is only sent once the caller commits'''
+        message = cls(to_email=to_email, subject=subject, html_content=html_content)
+        db.session.add(message)
+        return message
+
+    @classmethod
+    def enqueue_many(cls, messages):
+        '''
+        Add many emails with a single executemany INSERT
+
+        :param messages: Iterable of dicts with to_email, subject and html_content
+        :return: Number of emails queued
+        '''
+        now = datetime.now(timezone.utc)
+        rows = [{**message, 'status': cls.PENDING, 'attempts': 0, 'next_attempt_at': now, 'created_at': now}
+                for message in messages]
+        if rows:
+            db.session.execute(insert(cls), rows)
+        return len(rows)
+
+    @classmethod
+    def claim_batch(cls, limit, lease_seconds=300):
+        '''
+        Lease up to ``limit`` due emails to the calling dispatcher
+
+        A claimed email is marked sending and its next_attempt_at is pushed out
+        by the lease, so a dispatcher that dies mid-batch only delays those
+        emails until the lease expires. Row locks are skipped where the
+        database supports it, letting several dispatchers drain concurrently.
+        '''
+        now = datetime.now(timezone.utc)
+        messages = db.session.execute(
+            select(cls)
+            .where(
+                or_(cls.status == cls.PENDING, cls.status == cls.SENDING),
+                cls.next_attempt_at <= now
+            )
+            .order_by(cls.next_attempt_at, cls.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if messages:
+            db.session.execute(
+                update(cls)
+                .where(cls.id.in_([message.id for message in messages]))
+                .values(status=cls.SENDING, next_attempt_at=now + timedelta(seconds=lease_seconds))
+                .execution_options(synchronize_session=False)
+            )
+        return messages
+
+    @classmethod
+    def mark_sent(cls, ids):
+        '''Record delivery of a group of emails with one UPDATE'''
+        db.session.execute(
+            update(cls)
+            .where(cls.id.in_(ids))
+            .values(status=cls.SENT, attempts=cls.attempts + 1, sent_at=datetime.now(timezone.utc), last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+
+    @classmethod
+    def mark_failed(cls, attempts_by_id, error, max_attempts=5, backoff_base=30, backoff_max=3600):
+        '''
+        Schedule a retry with exponential backoff, or give up after ``max_attempts``
+
+        :param attempts_by_id: Dict of email id to the attempts made before this one
+        '''
+        ids_by_attempts = {}
+        for message_id, attempts in attempts_by_id.items():
+            ids_by_attempts.setdefault(attempts + 1, []).append(message_id)
+        now = datetime.now(timezone.utc)
+        for attempts, ids in ids_by_attempts.items():
+            values = {'attempts': attempts, 'last_error': str(error)[:1000]}
+            if attempts >= max_attempts:
+                values['status'] = cls.FAILED
+            else:
+                delay = min(backoff_max, backoff_base * 2 ** (attempts - 1))
+                # Jitter keeps a batch that failed together from retrying in lockstep
+                delay += random.uniform(0, backoff_base)
+                values['status'] = cls.PENDING
+                values['next_attempt_at'] = now + timedelta(seconds=delay)
+            db.session.execute(
+                update(cls).where(cls.id.in_(ids)).values(**values).execution_options(synchronize_session=False)
+            )
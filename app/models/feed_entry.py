@@ -0,0 +1,75 @@
+from sqlalchemy import delete, insert, select
+from app import db
+from app.models.shared_item import SharedItem
+from app.models.user import followers
+
+
+class FeedEntry(db.Model):
+    '''A shared item fanned out into one follower's feed at share time'''
+    __tablename__ = 'feed_entries'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'shared_item_id', name='uq_feed_entries_user_id_shared_item_id'),
+        db.Index('ix_feed_entries_user_id_created_at_shared_item_id', 'user_id', 'created_at', 'shared_item_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    shared_item_id = db.Column(db.Integer, db.ForeignKey('shared_items.id'), nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    shared_item = db.relationship('SharedItem')
+
+    BACKFILL_LIMIT = 100
+
+    def __repr__(self):
+        return f'<FeedEntry User {self.user_id} - SharedItem {self.shared_item_id}>'
+
+    @classmethod
+    def fan_out(cls, shared_item):
+        '''Insert a flushed shared item into the feed of every follower of its author'''
+        query = select(
+            followers.c.follower_id,
+            db.literal(shared_item.id),
+            db.literal(shared_item.user_id),
+            db.literal(shared_item.created_at, db.DateTime)
+        ).where(followers.c.followed_id == shared_item.user_id)
+        return db.session.execute(
+            insert(cls).from_select(['user_id', 'shared_item_id', 'author_id', 'created_at'], query)
+        ).rowcount
+
+    @classmethod
+    def backfill(cls, follower_id, author_id, limit=BACKFILL_LIMIT):
+        '''Copy an author's most recent shared items into a new follower's feed'''
+        query = select(
+            db.literal(follower_id),
+            SharedItem.id,
+            SharedItem.user_id,
+            SharedItem.created_at
+        ).where(SharedItem.user_id == author_id).order_by(SharedItem.created_at.desc()).limit(limit)
+        return db.session.execute(
+            insert(cls).from_select(['user_id', 'shared_item_id', 'author_id', 'created_at'], query)
+        ).rowcount
+
+    @classmethod
+    def remove(cls, follower_id, author_id):
+        '''Drop an author's items from a former follower's feed'''
+        return db.session.execute(
+            delete(cls)
+            .where(cls.user_id == follower_id, cls.author_id == author_id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    @classmethod
+    def rebuild(cls):
+        '''Recompute every feed from the follower graph and shared items'''
+        db.session.execute(delete(cls).execution_options(synchronize_session=False))
+        query = select(
+            followers.c.follower_id,
+            SharedItem.id,
+            SharedItem.user_id,
+            SharedItem.created_at
+        ).join(SharedItem, SharedItem.user_id == followers.c.followed_id).distinct()
+        return db.session.execute(
+            insert(cls).from_select(['user_id', 'shared_item_id', 'author_id', 'created_at'], query)
+        ).rowcount
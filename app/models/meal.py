@@ -5,6 +5,10 @@ from app import db
 class Meal(db.Model):
     '''Meal model representing a daily diet entry'''
     __tablename__ = 'meals'
+    __table_args__ = (
+        db.Index('ix_meals_user_id_datetime_id', 'user_id', 'datetime', 'id'),
+        db.Index('ix_meals_datetime_user_id', 'datetime', 'user_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -22,6 +26,8 @@ class Meal(db.Model):
     carbohydrates_grams = db.Column(db.Float, nullable=True)
     fats_grams = db.Column(db.Float, nullable=True)
     image_url = db.Column(db.String(255), nullable=True)
+    image_status = db.Column(db.String(20), nullable=True)
+    image_thumbnails = db.Column(db.JSON, nullable=True)
     
     def __repr__(self):
         return f'<Meal {self.name} - User {self.user_id}>'
@@ -42,5 +48,7 @@ class Meal(db.Model):
             'protein_grams': self.protein_grams,
             'carbohydrates_grams': self.carbohydrates_grams,
             'fats_grams': self.fats_grams,
-            'image_url': self.image_url
+            'image_url': self.image_url,
+            'image_status': self.image_status,
+            'image_thumbnails': self.image_thumbnails
         }
\ No newline at end of file
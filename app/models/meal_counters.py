@@ -0,0 +1,221 @@
+from datetime import datetime, timezone
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import db
+from app.models.meal import Meal
+
+
+class MealCountersMixin:
+    '''
+    Counter columns derived from the meals table and maintained on every meal write.
+
+    Subclasses declare ``KEY_COLUMNS`` and implement ``key_of``,
+    ``key_expressions`` and ``meal_filters`` to describe how meals map onto rows.
+    '''
+    COUNTERS = ('total_meals', 'on_diet_meals', 'off_diet_meals', 'total_calories',
+                'total_protein_grams', 'total_carbohydrates_grams', 'total_fats_grams')
+    KEY_COLUMNS = ()
+    # Optional column incremented on every meal write of the key, counters changed or not
+    VERSION_COLUMN = None
+
+    total_meals = db.Column(db.Integer, nullable=False, default=0)
+    on_diet_meals = db.Column(db.Integer, nullable=False, default=0)
+    off_diet_meals = db.Column(db.Integer, nullable=False, default=0)
+    total_calories = db.Column(db.Integer, nullable=False, default=0)
+    total_protein_grams = db.Column(db.Float, nullable=False, default=0)
+    total_carbohydrates_grams = db.Column(db.Float, nullable=False, default=0)
+    total_fats_grams = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    @classmethod
+    def key_of(cls, meal):
+        '''Key column values of the row a meal contributes to'''
+        raise NotImplementedError
+
+    @classmethod
+    def key_expressions(cls):
+        '''SQL expressions over meals producing ``KEY_COLUMNS``'''
+        raise NotImplementedError
+
+    @classmethod
+    def meal_filters(cls, key):
+        '''Filters selecting the meals that contribute to the given key values'''
+        raise NotImplementedError
+
+    def counters(self):
+        return {name: getattr(self, name) for name in self.COUNTERS}
+
+    @staticmethod
+    def meal_values(meal):
+        '''Counter contributions of a single meal'''
+        return {
+            'total_meals': 1,
+            'on_diet_meals': 1 if meal.is_on_diet else 0,
+            'off_diet_meals': 0 if meal.is_on_diet else 1,
+            'total_calories': meal.calories or 0,
+            'total_protein_grams': meal.protein_grams or 0,
+            'total_carbohydrates_grams': meal.carbohydrates_grams or 0,
+            'total_fats_grams': meal.fats_grams or 0
+        }
+
+    @staticmethod
+    def aggregate_columns():
+        '''Aggregates over meals producing ``COUNTERS``, in order'''
+        on_diet = func.coalesce(func.sum(case((Meal.is_on_diet.is_(True), 1), else_=0)), 0)
+        return (
+            func.count(Meal.id),
+            on_diet,
+            func.count(Meal.id) - on_diet,
+            func.coalesce(func.sum(Meal.calories), 0),
+            func.coalesce(func.sum(Meal.protein_grams), 0),
+            func.coalesce(func.sum(Meal.carbohydrates_grams), 0),
+            func.coalesce(func.sum(Meal.fats_grams), 0)
+        )
+
+    @classmethod
+    def aggregate_query(cls):
+        '''SELECT computing every row of the table from meals'''
+        keys = cls.key_expressions()
+        return select(*keys, *cls.aggregate_columns()).group_by(*keys)
+
+    @classmethod
+    def upsert_statement(cls):
+        '''
+        INSERT of one row per key that adds its counters to an existing row instead
+
+        Uses the dialect's ON CONFLICT / ON DUPLICATE KEY clause so concurrent
+        transactions creating the same row both succeed.
+        '''
+        table = cls.__table__
+        summed = cls.COUNTERS + ((cls.VERSION_COLUMN,) if cls.VERSION_COLUMN else ())
+        dialect = db.session.get_bind(mapper=cls.__mapper__).dialect.name
+        if dialect in ('mysql', 'mariadb'):
+            stmt = mysql_insert(table)
+            return stmt.on_duplicate_key_update(
+                **{name: table.c[name] + stmt.inserted[name] for name in summed},
+                updated_at=stmt.inserted.updated_at
+            )
+        if dialect == 'postgresql':
+            stmt = postgresql_insert(table)
+        elif dialect == 'sqlite':
+            stmt = sqlite_insert(table)
+        else:
+            raise NotImplementedError(f'Counter upserts are not implemented for {dialect}')
+        return stmt.on_conflict_do_update(
+            index_elements=list(cls.KEY_COLUMNS),
+            set_={
+                **{name: table.c[name] + stmt.excluded[name] for name in summed},
+                'updated_at': stmt.excluded.updated_at
+            }
+        )
+
+    @classmethod
+    def apply_delta(cls, key, delta):
+        '''
+        Atomically add ``delta`` to the counters of one row in the current transaction.
+
+        A missing row is created from the delta itself, so the counter tables
+        must have been backfilled (``rebuild``) before meals are written.
+        '''
+        cls.apply_deltas([(key, delta)])
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        '''
+        Upsert several (key, delta) pairs with one executemany
+
+        Rows are written in key order so concurrent transactions lock them in
+        the same order and cannot deadlock on each other.
+        '''
+        now = datetime.now(timezone.utc)
+        rows = []
+        for key, delta in sorted(deltas, key=lambda pair: tuple(pair[0][name] for name in cls.KEY_COLUMNS)):
+            delta = {k: v for k, v in delta.items() if v}
+            if cls.VERSION_COLUMN:
+                delta[cls.VERSION_COLUMN] = 1
+            if delta:
+                rows.append({**key, **dict.fromkeys(cls.COUNTERS, 0), **delta, 'updated_at': now})
+        if rows:
+            db.session.execute(cls.upsert_statement(), rows)
+
+    @classmethod
+    def rebuild(cls, **key):
+        '''
+        Recompute rows from the meals table, for backfills and repairs.
+
+        Not safe against concurrent meal writes; the write path uses apply_delta.
+
+        :param key: Only rebuild rows matching these key values; rebuild every row if empty
+        :return: Number of rows written
+        '''
+        stale_rows = delete(cls)
+        query = cls.aggregate_query()
+        if key:
+            stale_rows = stale_rows.where(*(getattr(cls, k) == v for k, v in key.items()))
+            query = query.where(*cls.meal_filters(key))
+        db.session.execute(stale_rows.execution_options(synchronize_session=False))
+        result = db.session.execute(
+            insert(cls).from_select([*cls.KEY_COLUMNS, *cls.COUNTERS], query)
+        )
+        return result.rowcount
+
+    @classmethod
+    def snapshot(cls, meal):
+        return cls.key_of(meal), cls.meal_values(meal)
+
+    @classmethod
+    def record_create(cls, meal):
+        cls.apply_delta(cls.key_of(meal), cls.meal_values(meal))
+
+    @classmethod
+    def record_delete(cls, meal):
+        cls.apply_delta(cls.key_of(meal), {k: -v for k, v in cls.meal_values(meal).items()})
+
+    @classmethod
+    def record_touch(cls, meal):
+        cls.apply_delta(cls.key_of(meal), {})
+
+    @classmethod
+    def record_update(cls, snapshot, meal):
+        old_key, old_values = snapshot
+        new_key, new_values = cls.snapshot(meal)
+        if old_key == new_key:
+            cls.apply_delta(new_key, {k: new_values[k] - old_values[k] for k in new_values})
+        else:
+            cls.apply_deltas([(old_key, {k: -v for k, v in old_values.items()}), (new_key, new_values)])
+
+
+def _counter_tables():
+    return MealCountersMixin.__subclasses__()
+
+
+def snapshot_meal(meal):
+    '''Capture a meal's counter contributions before it is modified'''
+    return {table: table.snapshot(meal) for table in _counter_tables()}
+
+
+def record_meal_create(meal):
+    '''Apply a flushed meal insert to every counter table'''
+    for table in _counter_tables():
+        table.record_create(meal)
+
+
+def record_meal_update(snapshots, meal):
+    '''Apply a flushed meal update to every counter table'''
+    for table in _counter_tables():
+        table.record_update(snapshots[table], meal)
+
+
+def record_meal_delete(meal):
+    '''Apply a flushed meal delete to every counter table'''
+    for table in _counter_tables():
+        table.record_delete(meal)
+
+
+def record_meal_touch(meal):
+    '''Bump version stamps for a meal change that does not affect any counter (e.g. its image)'''
+    for table in _counter_tables():
+        if table.VERSION_COLUMN:
+            table.record_touch(meal)
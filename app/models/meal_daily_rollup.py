@@ -0,0 +1,54 @@
+from datetime import datetime, time, timedelta
+from sqlalchemy import func
+from app import db
+from app.models.meal import Meal
+from app.models.meal_counters import MealCountersMixin
+
+
+class MealDailyRollup(MealCountersMixin, db.Model):
+    '''Per-user, per-day nutrition totals, kept in step with every meal write'''
+    __tablename__ = 'meal_daily_rollups'
+
+    KEY_COLUMNS = ('user_id', 'day')
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+
+    def __repr__(self):
+        return f'<MealDailyRollup User {self.user_id} - {self.day}>'
+
+    @classmethod
+    def key_of(cls, meal):
+        return {'user_id': meal.user_id, 'day': meal.datetime.date()}
+
+    @classmethod
+    def key_expressions(cls):
+        return (Meal.user_id, func.date(Meal.datetime))
+
+    @classmethod
+    def meal_filters(cls, key):
+        filters = []
+        if 'user_id' in key:
+            filters.append(Meal.user_id == key['user_id'])
+        if 'day' in key:
+            day_start = datetime.combine(key['day'], time.min)
+            filters.extend((Meal.datetime >= day_start, Meal.datetime < day_start + timedelta(days=1)))
+        return filters
+
+    @classmethod
+    def totals(cls, user_id, start_day, end_day):
+        '''
+        Sum counters over a range of days
+
+        :param start_day: First day included
+        :param end_day: First day excluded
+        :return: Dict of counter totals
+        '''
+        row = db.session.query(
+            *(func.coalesce(func.sum(getattr(cls, name)), 0) for name in cls.COUNTERS)
+        ).filter(
+            cls.user_id == user_id,
+            cls.day >= start_day,
+            cls.day < end_day
+        ).one()
+        return dict(zip(cls.COUNTERS, row))
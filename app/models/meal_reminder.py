@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+from sqlalchemy import delete, insert
+from app import db
+
+
+class MealReminder(db.Model):
+    '''
+    Log of reminders already queued by the scheduler, one row per meal occurrence
+
+    Keyed on the meal's datetime as well as its id, so a meal moved to a new
+    time is reminded again while repeated scheduler ticks never duplicate.
+    '''
+    __tablename__ = 'meal_reminders'
+    __table_args__ = (
+        db.UniqueConstraint('meal_id', 'meal_datetime', name='uq_meal_reminders_meal_id_meal_datetime'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    meal_id = db.Column(db.Integer, db.ForeignKey('meals.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    meal_datetime = db.Column(db.DateTime, nullable=False, index=True)
+    sent_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<MealReminder Meal {self.meal_id} at {self.meal_datetime}>'
+
+    @classmethod
+    def record_many(cls, meals):
+        '''
+        Log reminders for many meals with a single executemany INSERT
+
+        :param meals: Iterable of rows with id, user_id and datetime
+        '''
+        now = datetime.now(timezone.utc)
+        rows = [{'meal_id': meal.id, 'user_id': meal.user_id, 'meal_datetime': meal.datetime, 'sent_at': now}
+                for meal in meals]
+        if rows:
+            db.session.execute(insert(cls), rows)
+        return len(rows)
+
+    @classmethod
+    def sweep(cls, before):
+        '''Forget reminders for meals that started before ``before``'''
+        return db.session.execute(
+            delete(cls).where(cls.meal_datetime < before).execution_options(synchronize_session=False)
+        ).rowcount
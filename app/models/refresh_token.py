@@ -0,0 +1,106 @@
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, select
+from app import db
+
+
+class RefreshToken(db.Model):
+    '''A refresh token issued to one device; only a hash of the token is stored'''
+    __tablename__ = 'refresh_tokens'
+
+    LIFETIME = timedelta(days=30)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    token_hash = db.Column(db.String(64), nullable=False, unique=True)
+    device = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    user = db.relationship('User', back_populates='refresh_tokens')
+
+    def __repr__(self):
+        return f'<RefreshToken User {self.user_id} - {self.device}>'
+
+    @staticmethod
+    def hash_token(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @classmethod
+    def issue(cls, user_id, device=None):
+        '''
+        Create a refresh token for a user's device
+
+        A named device holds one token at a time: its previous token is revoked.
+
+        :return: Tuple of the new row and the plaintext token, which is never stored
+        '''
+        if device is not None:
+            db.session.execute(
+                delete(cls)
+                .where(cls.user_id == user_id, cls.device == device)
+                .execution_options(synchronize_session=False)
+            )
+        token = os.urandom(32).hex()
+        refresh_token = cls(
+            user_id=user_id,
+            token_hash=cls.hash_token(token),
+            device=device,
+            expires_at=datetime.now(timezone.utc) + cls.LIFETIME
+        )
+        db.session.add(refresh_token)
+        return refresh_token, token
+
+    @classmethod
+    def find(cls, token):
+        return cls.query.filter_by(token_hash=cls.hash_token(token)).first()
+
+    @property
+    def is_expired(self):
+        expires_at = self.expires_at
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return expires_at <= datetime.now(timezone.utc)
+
+    def rotate(self):
+        '''
+        Consume this token and issue its replacement for the same device
+
+        :return: The new plaintext token, or None if the token was already used concurrently
+        '''
+        consumed = db.session.execute(
+            delete(RefreshToken)
+            .where(RefreshToken.id == self.id)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if consumed != 1:
+            return None
+        _, token = RefreshToken.issue(self.user_id, self.device)
+        return token
+
+    @classmethod
+    def revoke(cls, user_id, token=None):
+        '''Revoke one of a user's tokens, or all of them if no token is given'''
+        statement = delete(cls).where(cls.user_id == user_id)
+        if token is not None:
+            statement = statement.where(cls.token_hash == cls.hash_token(token))
+        return db.session.execute(statement.execution_options(synchronize_session=False)).rowcount
+
+    @classmethod
+    def sweep_expired(cls, batch_size=1000):
+        '''
+        Delete expired tokens in chunks, committing after each one
+
+        :return: Number of rows deleted
+        '''
+        total = 0
+        while True:
+            ids = db.session.execute(
+                select(cls.id).where(cls.expires_at <= datetime.now(timezone.utc)).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                return total
+            db.session.execute(delete(cls).where(cls.id.in_(ids)).execution_options(synchronize_session=False))
+            db.session.commit()
+            total += len(ids)
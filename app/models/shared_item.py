@@ -1,5 +1,7 @@
 from datetime import datetime, timezone
+from sqlalchemy import delete
 from app import db
+from app.models.meal import Meal
 
 shared_item_meals = db.Table('shared_item_meals',
     db.Column('shared_item_id', db.Integer, db.ForeignKey('shared_items.id')),
@@ -9,17 +11,43 @@ shared_item_meals = db.Table('shared_item_meals',
 class SharedItem(db.Model):
     __tablename__ = 'shared_items'
 
+    # Bump whenever the shape of Meal.to_dict() changes so stale snapshots get rebuilt
+    MEALS_SNAPSHOT_VERSION = 2
+
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
     is_public = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    meals_snapshot = db.Column(db.JSON, nullable=True)
+    meals_snapshot_version = db.Column(db.Integer, nullable=True)
     
     user = db.relationship('User')
     meals = db.relationship('Meal', secondary=shared_item_meals, lazy='dynamic')
 
-    def to_dict(self):
+    @property
+    def has_current_snapshot(self):
+        return self.meals_snapshot is not None and self.meals_snapshot_version == self.MEALS_SNAPSHOT_VERSION
+
+    def take_snapshot(self, meals):
+        '''Store the serialized meals on the row so reads never touch the meals table'''
+        self.meals_snapshot = [meal if isinstance(meal, dict) else meal.to_dict() for meal in meals]
+        self.meals_snapshot_version = self.MEALS_SNAPSHOT_VERSION
+        self.updated_at = datetime.now(timezone.utc)
+
+    @property
+    def last_modified(self):
+        return self.updated_at or self.created_at
+
+    def to_dict(self, meals=None):
+        if meals is not None:
+            meal_dicts = [meal if isinstance(meal, dict) else meal.to_dict() for meal in meals]
+        elif self.has_current_snapshot:
+            meal_dicts = self.meals_snapshot
+        else:
+            meal_dicts = self.load_meals([self])[self.id]
         return {
             'id': self.id,
             'user_id': self.user_id,
@@ -27,5 +55,61 @@ class SharedItem(db.Model):
             'description': self.description,
             'is_public': self.is_public,
             'created_at': self.created_at.isoformat(),
-            'meals': [meal.to_dict() for meal in self.meals]
+            'meals': meal_dicts
         }
+
+    @staticmethod
+    def load_meals(items):
+        '''Load the serialized meals of several shared items with a single query'''
+        from app.serializers import serialize_meal_row
+
+        meals_by_item = {item.id: [] for item in items}
+        if meals_by_item:
+            rows = db.session.execute(
+                serialize_meal_row.select()
+                .add_columns(shared_item_meals.c.shared_item_id)
+                .join(shared_item_meals, Meal.id == shared_item_meals.c.meal_id)
+                .where(shared_item_meals.c.shared_item_id.in_(list(meals_by_item)))
+                .order_by(Meal.datetime.asc(), Meal.id.asc())
+            ).all()
+            for row in rows:
+                meals_by_item[row.shared_item_id].append(serialize_meal_row(row[:-1]))
+        return meals_by_item
+
+    @classmethod
+    def to_dicts(cls, items):
+        '''Serialize several shared items; only items without a current snapshot read meals'''
+        meals_by_item = cls.load_meals([item for item in items if not item.has_current_snapshot])
+        return [item.to_dict(meals_by_item.get(item.id)) for item in items]
+
+    @classmethod
+    def refresh_snapshots(cls, items):
+        '''Rebuild the meal snapshots of the given shared items'''
+        meals_by_item = cls.load_meals(items)
+        for item in items:
+            item.take_snapshot(meals_by_item[item.id])
+
+    @classmethod
+    def containing_meal(cls, meal_id):
+        '''Shared items that include a meal'''
+        return cls.query.join(shared_item_meals, shared_item_meals.c.shared_item_id == cls.id).filter(
+            shared_item_meals.c.meal_id == meal_id).all()
+
+    @classmethod
+    def refresh_snapshots_for_meal(cls, meal_id):
+        '''Rebuild the snapshots of every shared item containing a meal'''
+        items = cls.containing_meal(meal_id)
+        cls.refresh_snapshots(items)
+        return len(items)
+
+    @classmethod
+    def detach_meal(cls, meal_id):
+        '''
+        Remove a meal that is about to be deleted from every shared item
+
+        :return: The affected shared items; refresh their snapshots once the delete is flushed
+        '''
+        items = cls.containing_meal(meal_id)
+        if items:
+            db.session.execute(delete(shared_item_meals).where(shared_item_meals.c.meal_id == meal_id))
+        return items
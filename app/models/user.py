@@ -1,11 +1,11 @@
-import os
-from datetime import datetime, timedelta, timezone
-from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
+from app.services.password_service import get_password_hasher
 
 followers = db.Table('followers',
     db.Column('follower_id', db.Integer, db.ForeignKey('users.id')),
-    db.Column('followed_id', db.Integer, db.ForeignKey('users.id'))
+    db.Column('followed_id', db.Integer, db.ForeignKey('users.id')),
+    db.Index('ix_followers_follower_id_followed_id', 'follower_id', 'followed_id'),
+    db.Index('ix_followers_followed_id_follower_id', 'followed_id', 'follower_id')
 )
 
 class User(db.Model):
@@ -16,8 +16,7 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(256))
     meals = db.relationship('Meal', back_populates='user', lazy='dynamic')
-    refresh_token = db.Column(db.String(128), unique=True)
-    refresh_token_expiration = db.Column(db.DateTime)
+    refresh_tokens = db.relationship('RefreshToken', back_populates='user', lazy='dynamic', cascade='all, delete-orphan')
     
     followed = db.relationship(
         'User', secondary=followers,
@@ -26,27 +25,38 @@ class User(db.Model):
         backref=db.backref('followers', lazy='dynamic'), lazy='dynamic')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = get_password_hasher().hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return get_password_hasher().verify(self.password_hash, password)
 
-    def generate_refresh_token(self):
-        self.refresh_token = os.urandom(32).hex()
-        self.refresh_token_expiration = datetime.now(timezone.utc) + timedelta(days=30)
-        return self.refresh_token
+    def password_needs_rehash(self):
+        return get_password_hasher().needs_rehash(self.password_hash)
 
-    def revoke_refresh_token(self):
-        self.refresh_token = None
-        self.refresh_token_expiration = None
+    def generate_refresh_token(self, device=None):
+        from app.models.refresh_token import RefreshToken
+
+        _, token = RefreshToken.issue(self.id, device)
+        return token
+
+    def revoke_refresh_token(self, token=None):
+        from app.models.refresh_token import RefreshToken
+
+        return RefreshToken.revoke(self.id, token)
 
     def follow(self, user):
+        from app.models.feed_entry import FeedEntry
+
         if not self.is_following(user):
             self.followed.append(user)
+            FeedEntry.backfill(self.id, user.id)
 
     def unfollow(self, user):
+        from app.models.feed_entry import FeedEntry
+
         if self.is_following(user):
             self.followed.remove(user)
+            FeedEntry.remove(self.id, user.id)
 
     def is_following(self, user):
         return self.followed.filter(
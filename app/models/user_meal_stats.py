@@ -0,0 +1,58 @@
+from app import db
+from app.models.meal import Meal
+from app.models.meal_counters import MealCountersMixin
+
+
+class UserMealStats(MealCountersMixin, db.Model):
+    '''Per-user diet statistics, kept in step with every meal write'''
+    __tablename__ = 'user_meal_stats'
+
+    KEY_COLUMNS = ('user_id',)
+    VERSION_COLUMN = 'meals_version'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    # Incremented on every write to the user's meals; the /meals ETag is built from it
+    meals_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def __repr__(self):
+        return f'<UserMealStats User {self.user_id} - {self.total_meals} meals>'
+
+    def to_dict(self):
+        '''Convert stats row to the /meals/stats response shape'''
+        return self.build_response(self.user_id, self.counters())
+
+    @staticmethod
+    def build_response(user_id, counters):
+        total_meals = counters['total_meals']
+        on_diet_percentage = (counters['on_diet_meals'] / total_meals * 100) if total_meals > 0 else 0
+        return {
+            'user_id': user_id,
+            'total_meals': total_meals,
+            'on_diet_meals': counters['on_diet_meals'],
+            'off_diet_meals': counters['off_diet_meals'],
+            'on_diet_percentage': round(on_diet_percentage, 2),
+            'total_calories': counters['total_calories'],
+            'total_protein_grams': counters['total_protein_grams'],
+            'total_carbohydrates_grams': counters['total_carbohydrates_grams'],
+            'total_fats_grams': counters['total_fats_grams']
+        }
+
+    @classmethod
+    def key_of(cls, meal):
+        return {'user_id': meal.user_id}
+
+    @classmethod
+    def key_expressions(cls):
+        return (Meal.user_id,)
+
+    @classmethod
+    def meal_filters(cls, key):
+        return (Meal.user_id == key['user_id'],)
+
+    @classmethod
+    def compute(cls, user_id):
+        '''Compute counters for one user straight from the meals table'''
+        row = db.session.execute(cls.aggregate_query().where(Meal.user_id == user_id)).first()
+        if row is None:
+            return dict.fromkeys(cls.COUNTERS, 0)
+        return dict(zip(cls.COUNTERS, row[1:]))
@@ -0,0 +1,30 @@
+import base64
+import json
+from datetime import datetime
+
+
+class InvalidCursorError(ValueError):
+    '''Raised when a pagination cursor cannot be decoded'''
+
+
+def encode_cursor(position_datetime, row_id):
+    '''Encode the (datetime, id) position of a row into an opaque cursor'''
+    payload = json.dumps({'d': position_datetime.isoformat(), 'i': row_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    '''Decode an opaque cursor back into its (datetime, id) position'''
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload['d']), int(payload['i'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError('Invalid cursor') from e
+
+
+def parse_bool_arg(value, default=False):
+    '''Interpret a query string flag such as ?include_total=true'''
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes')
@@ -0,0 +1,137 @@
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Every QueryStats collecting in the current context; a request and an
+# assert_max_queries block around it can both be active
+_collectors = ContextVar('query_stats_collectors', default=())
+_listening = False
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_NAMED_PARAMETER = re.compile(r'%\(\w+\)s|:\w+|\$\d+|%s')
+_PARAMETER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+
+def fingerprint(statement):
+    '''Normalise a statement so executions differing only in parameters compare equal'''
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    statement = _STRING_LITERAL.sub('?', statement)
+    statement = _NAMED_PARAMETER.sub('?', statement)
+    statement = _NUMBER_LITERAL.sub('?', statement)
+    return _PARAMETER_LIST.sub('(?+)', statement)
+
+
+class QueryStats:
+    '''Statements executed, time spent in the database and repeated fingerprints'''
+
+    def __init__(self, keep_statements=False):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.statements = [] if keep_statements else None
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.fingerprints[fingerprint(statement)] += 1
+        if self.statements is not None:
+            self.statements.append(statement)
+
+    def repeated(self, min_count=2):
+        '''Fingerprints executed at least ``min_count`` times, most frequent first'''
+        return [(statement, count) for statement, count in self.fingerprints.most_common() if count >= min_count]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, which is discarded with a failed statement
+    if context is not None:
+        context.query_stats_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'query_stats_started', None)
+    collectors = _collectors.get()
+    if started is not None and collectors:
+        duration = time.perf_counter() - started
+        for stats in collectors:
+            stats.record(statement, duration)
+
+
+def listen_for_queries():
+    '''Attach the timing listeners to every engine, once per process'''
+    global _listening
+    if not _listening:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listening = True
+
+
+@contextmanager
+def collect_queries(keep_statements=False):
+    '''Collect the statements executed inside the block into a QueryStats'''
+    listen_for_queries()
+    stats = QueryStats(keep_statements)
+    token = _collectors.set(_collectors.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _collectors.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit):
+    '''
+    Fail if the block executes more than ``limit`` SQL statements
+
+    Pin an endpoint's query budget in a test::
+
+        with assert_max_queries(3):
+            client.get('/social/feed', headers=headers)
+    '''
+    with collect_queries(keep_statements=True) as stats:
+        yield stats
+    if stats.count > limit:
+        executed = '\n'.join(f'  {index}. {statement}' for index, statement in enumerate(stats.statements, start=1))
+        raise AssertionError(f'Expected at most {limit} queries, {stats.count} were executed:\n{executed}')
+
+
+def init_query_stats(app):
+    '''Count each request's queries and warn about heavy or repetitive ones'''
+    if not app.config.get('QUERY_STATS_ENABLED', True):
+        return
+    listen_for_queries()
+    max_queries = app.config.get('QUERY_COUNT_WARN_THRESHOLD', 20)
+    max_repeats = app.config.get('QUERY_REPEAT_WARN_THRESHOLD', 5)
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = QueryStats()
+        g.query_stats_token = _collectors.set(_collectors.get() + (g.query_stats,))
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.get('query_stats')
+        if stats is None:
+            return response
+        repeated = stats.repeated(max_repeats)
+        if stats.count > max_queries or repeated:
+            app.logger.warning(
+                '%s %s executed %d queries in %.1f ms%s',
+                request.method, request.url_rule.rule if request.url_rule else request.path,
+                stats.count, stats.duration * 1000,
+                ''.join(f'\n  {count}x {statement}' for statement, count in repeated)
+            )
+        return response
+
+    @app.teardown_request
+    def stop_query_stats(error=None):
+        token = g.pop('query_stats_token', None)
+        if token is not None:
+            _collectors.reset(token)
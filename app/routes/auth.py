@@ -4,7 +4,9 @@ from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime, timedelta, timezone
 from app import db, limiter
 from app.models.user import User
+from app.models.refresh_token import RefreshToken
 from app.decorators import token_required
+from app.auth_cache import invalidate_user
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -54,12 +56,16 @@ def login():
     if user is None or not user.check_password(data['password']):
         return jsonify({'error': 'Invalid email or password'}), 401
 
+    # Transparently upgrade hashes made with outdated method/cost settings
+    if user.password_needs_rehash():
+        user.set_password(data['password'])
+
     access_token = jwt.encode({
         'user_id': user.id,
         'exp': datetime.now(timezone.utc) + timedelta(hours=1)
     }, current_app.config['SECRET_KEY'], algorithm='HS256')
 
-    refresh_token = user.generate_refresh_token()
+    refresh_token = user.generate_refresh_token(data.get('device'))
     db.session.commit()
 
     return jsonify({'access_token': access_token, 'refresh_token': refresh_token})
@@ -70,25 +76,35 @@ def refresh():
     if not data or not data.get('refresh_token'):
         return jsonify({'error': 'Missing refresh token'}), 400
 
-    refresh_token = data['refresh_token']
-    user = User.query.filter_by(refresh_token=refresh_token).first()
+    stored_token = RefreshToken.find(data['refresh_token'])
 
-    if not user:
+    if not stored_token:
         return jsonify({'error': 'Invalid refresh token'}), 401
 
-    if user.refresh_token_expiration < datetime.now(timezone.utc):
+    if stored_token.is_expired:
         return jsonify({'error': 'Refresh token expired'}), 401
 
+    # Rotate: the presented token is consumed and a new one is issued for the same device
+    user_id = stored_token.user_id
+    refresh_token = stored_token.rotate()
+    if refresh_token is None:
+        db.session.rollback()
+        return jsonify({'error': 'Invalid refresh token'}), 401
+    db.session.commit()
+
     access_token = jwt.encode({
-        'user_id': user.id,
+        'user_id': user_id,
         'exp': datetime.now(timezone.utc) + timedelta(hours=1)
     }, current_app.config['SECRET_KEY'], algorithm='HS256')
 
-    return jsonify({'access_token': access_token})
+    return jsonify({'access_token': access_token, 'refresh_token': refresh_token})
 
 @auth_bp.route('/logout', methods=['POST'])
-@token_required
+@token_required(bypass_cache=True)
 def logout(current_user):
-    current_user.revoke_refresh_token()
+    '''Revoke the given refresh token, or every refresh token of the user if none is given'''
+    data = request.get_json(silent=True) or {}
+    current_user.revoke_refresh_token(data.get('refresh_token'))
     db.session.commit()
+    invalidate_user(current_user.id)
     return jsonify({'message': 'Successfully logged out'}), 200
\ No newline at end of file
@@ -1,16 +1,42 @@
-import os
-from flask import Blueprint, request, jsonify, url_for
+import csv
+import io
+import json
+import uuid
+from math import ceil
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context, url_for
+from werkzeug.utils import secure_filename
 from datetime import datetime, timezone, date, timedelta
+from sqlalchemy import and_, func, or_, select
 from app import db
 from app.models.meal import Meal
+from app.models.user_meal_stats import UserMealStats
+from app.models.meal_daily_rollup import MealDailyRollup
+from app.models.shared_item import SharedItem
+from app.models.meal_counters import snapshot_meal, record_meal_create, record_meal_update, record_meal_delete, record_meal_touch
+from app.http_cache import conditional_response, make_etag
+from app.bulk_import import import_meals, iter_json_array, iter_ndjson
+from app.serializers import fetch_meal_dicts, select_meal_rows, serialize_meal_row
+from app.pagination import InvalidCursorError, decode_cursor, encode_cursor, parse_bool_arg
 from flask_pydantic import validate
-from app.schemas.meal_schema import MealCreateSchema, MealUpdateSchema
+from app.schemas.meal_schema import MealCreateSchema, MealUpdateSchema, MealImageUploadUrlSchema, MealImageCompleteSchema
 from app.decorators import token_required
-from app.services.s3_service import upload_file_to_s3
-from app.services.email_service import send_email
+from app.db_routing import use_replica
+from app.auth_cache import get_auth_cache
+from app.services.image_pipeline import get_image_pipeline
+from app.services.s3_service import delete_object, generate_presigned_upload, get_object_metadata, get_s3_service, object_url
+from app.services.email_service import get_email_dispatcher, queue_email
+from app.services.reminder_service import REMINDER_SUBJECT, render_meal_reminder
 
 meals_bp = Blueprint('meals', __name__, url_prefix='')
 
+MAX_PER_PAGE = 100
+MAX_TOP_STREAKS = 50
+MAX_TIMESERIES_DAYS = 366
+BULK_BATCH_SIZE = 1000
+MAX_BULK_ITEMS = 100000
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonlines')
+IMAGE_CONTENT_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'image/gif')
+
 @meals_bp.route('/', methods=['GET'])
 def index():
     '''API landing page with a list of available endpoints'''
@@ -30,15 +56,21 @@ def index():
         'meal_endpoints': [
             str(url_for('meals.health_check', _external=True)),
             str(url_for('meals.create_meal', _external=True)) + ' (token required)',
+            str(url_for('meals.bulk_create_meals', _external=True)) + ' (token required)',
             str(url_for('meals.get_meals', _external=True)) + ' (token required)',
+            str(url_for('meals.export_meals', _external=True)) + ' (token required)',
             str(url_for('meals.get_meal', meal_id=1, _external=True)) + ' (token required)',
             str(url_for('meals.update_meal', meal_id=1, _external=True)) + ' (token required)',
             str(url_for('meals.delete_meal', meal_id=1, _external=True)) + ' (token required)',
             str(url_for('meals.get_user_stats', _external=True)) + ' (token required)',
             str(url_for('meals.get_best_diet_sequence', _external=True)) + ' (token required)',
             str(url_for('meals.get_meal_reports', _external=True)) + ' (token required)',
+            str(url_for('meals.get_meal_timeseries', _external=True)) + ' (token required)',
             str(url_for('meals.upload_meal_image', meal_id=1, _external=True)) + ' (token required)',
+            str(url_for('meals.create_meal_image_upload_url', meal_id=1, _external=True)) + ' (token required)',
+            str(url_for('meals.complete_meal_image_upload', meal_id=1, _external=True)) + ' (token required)',
             str(url_for('meals.send_meal_reminders', _external=True)) + ' (token required)',
+        ],
         'social_endpoints': [
             str(url_for('social.share_meals', _external=True)) + ' (token required)',
             str(url_for('social.get_shared_item', shared_item_id=1, _external=True)) + ' (token required)',
@@ -52,12 +84,14 @@ def health_check():
     '''Health check endpoint'''
     return jsonify({
         'status': 'healthy',
-        'message': 'Daily Diet API is running'
+        'message': 'Daily Diet API is running',
+        'auth_cache': get_auth_cache().stats(),
+        's3': get_s3_service().stats()
     }), 200
 
 
 @meals_bp.route('/meals', methods=['POST'])
-@token_required
+@token_required(load_user_row=False)
 @validate()
 def create_meal(current_user, body: MealCreateSchema):
     '''Register a new meal for the authenticated user'''
@@ -76,6 +110,8 @@ def create_meal(current_user, body: MealCreateSchema):
         )
         
         db.session.add(new_meal)
+        db.session.flush()
+        record_meal_create(new_meal)
         db.session.commit()
         
         return jsonify({
@@ -87,50 +123,218 @@ def create_meal(current_user, body: MealCreateSchema):
         db.session.rollback()
         return jsonify({'error': f'Failed to register meal: {str(e)}'}), 500
 
+@meals_bp.route('/meals/bulk', methods=['POST'])
+@token_required(load_user_row=False)
+def bulk_create_meals(current_user):
+    '''Register many meals from a JSON array or a streamed NDJSON body
+
+    The body is parsed incrementally and inserted in committed batches, so
+    large offline logs can be uploaded in one request.
+    '''
+    try:
+        if request.mimetype in NDJSON_MIMETYPES:
+            items = iter_ndjson(request.stream)
+        else:
+            items = iter_json_array(request.stream)
+
+        summary = import_meals(current_user.id, items, batch_size=BULK_BATCH_SIZE, max_items=MAX_BULK_ITEMS)
+        if summary['error'] is not None:
+            return jsonify(summary), 400
+        return jsonify(summary), 201 if summary['failed'] == 0 else 207
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to import meals: {str(e)}'}), 500
+
+
 @meals_bp.route('/meals', methods=['GET'])
-@token_required
+@token_required(load_user_row=False)
+@use_replica
 def get_meals(current_user):
-    '''List all meals for the authenticated user'''
+    '''List all meals for the authenticated user
+
+    Supports classic page/per_page pagination as well as keyset pagination:
+    pass ``cursor`` (empty for the first page) and follow ``next_cursor``.
+    Honors If-None-Match against a version stamp of the user's meals.
+    '''
     try:
-        # Pagination
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
+        # One primary-key lookup; meals_version moves in the same transaction as every meal write
+        version = db.session.execute(
+            select(UserMealStats.meals_version, UserMealStats.updated_at).where(UserMealStats.user_id == current_user.id)
+        ).first()
+        meals_version, stats_updated_at = version if version is not None else (0, None)
+        etag = make_etag('meals', current_user.id, meals_version, stats_updated_at, request.query_string.decode())
+        return conditional_response(etag, lambda: _list_meals(current_user))
         
-        # Filtering
-        query = Meal.query.filter_by(user_id=current_user.id)
+    except Exception as e:
+        return jsonify({'error': f'Failed to retrieve meals: {str(e)}'}), 500
+
+
+def _list_meals(current_user):
+    '''Build the /meals listing for the current query string'''
+    per_page = min(max(request.args.get('per_page', 10, type=int), 1), MAX_PER_PAGE)
+    
+    # Filtering
+    filters = [Meal.user_id == current_user.id]
+    
+    start_date = request.args.get('start_date')
+    if start_date:
+        filters.append(Meal.datetime >= datetime.fromisoformat(start_date))
+        
+    end_date = request.args.get('end_date')
+    if end_date:
+        filters.append(Meal.datetime <= datetime.fromisoformat(end_date))
         
+    on_diet = request.args.get('on_diet')
+    if on_diet is not None:
+        filters.append(Meal.is_on_diet == (on_diet.lower() == 'true'))
+
+    if 'cursor' in request.args:
+        return _get_meals_by_cursor(current_user, filters, per_page)
+
+    # Pagination
+    page = max(request.args.get('page', 1, type=int), 1)
+    include_total = parse_bool_arg(request.args.get('include_total'), default=True)
+
+    total_meals = _count_meals(filters) if include_total else None
+    # Fetch one extra row to learn whether another page exists without a COUNT
+    meals = fetch_meal_dicts(
+        select_meal_rows(*filters)
+        .order_by(Meal.datetime.desc(), Meal.id.desc())
+        .limit(per_page + 1)
+        .offset((page - 1) * per_page)
+    )
+    has_next = len(meals) > per_page
+    
+    return jsonify({
+        'user_id': current_user.id,
+        'total_meals': total_meals,
+        'page': page,
+        'per_page': per_page,
+        'total_pages': ceil(total_meals / per_page) if include_total else None,
+        'has_next': has_next,
+        'has_prev': page > 1,
+        'meals': meals[:per_page]
+    }), 200
+
+
+def _count_meals(filters):
+    return db.session.execute(select(func.count(Meal.id)).where(*filters)).scalar()
+
+
+def _get_meals_by_cursor(current_user, filters, per_page):
+    '''Keyset pagination over (datetime, id), newest first'''
+    cursor = request.args.get('cursor')
+    include_total = parse_bool_arg(request.args.get('include_total'))
+
+    total_meals = _count_meals(filters) if include_total else None
+
+    if cursor:
+        try:
+            cursor_datetime, cursor_id = decode_cursor(cursor)
+        except InvalidCursorError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        filters = [*filters, or_(
+            Meal.datetime < cursor_datetime,
+            and_(Meal.datetime == cursor_datetime, Meal.id < cursor_id)
+        )]
+
+    # Fetch one extra row to learn whether another page exists without a COUNT
+    rows = db.session.execute(
+        select_meal_rows(*filters).order_by(Meal.datetime.desc(), Meal.id.desc()).limit(per_page + 1)
+    ).all()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = encode_cursor(rows[-1].datetime, rows[-1].id) if has_next else None
+
+    return jsonify({
+        'user_id': current_user.id,
+        'total_meals': total_meals,
+        'per_page': per_page,
+        'has_next': has_next,
+        'next_cursor': next_cursor,
+        'meals': serialize_meal_row.many(rows)
+    }), 200
+
+
+@meals_bp.route('/meals/export', methods=['GET'])
+@token_required(load_user_row=False)
+@use_replica
+def export_meals(current_user):
+    '''Stream the user's meal history as NDJSON or CSV
+
+    Rows are read from a server-side cursor as plain column tuples and
+    written out as they arrive, so memory stays flat for any history size.
+    '''
+    try:
+        export_format = request.args.get('format', 'ndjson', type=str)
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': 'Invalid format specified. Use ndjson or csv.'}), 400
+
+        statement = select(*(getattr(Meal, column) for column in EXPORT_COLUMNS)).where(
+            Meal.user_id == current_user.id)
         start_date = request.args.get('start_date')
         if start_date:
-            query = query.filter(Meal.datetime >= datetime.fromisoformat(start_date))
-            
+            statement = statement.where(Meal.datetime >= datetime.fromisoformat(start_date))
         end_date = request.args.get('end_date')
         if end_date:
-            query = query.filter(Meal.datetime <= datetime.fromisoformat(end_date))
-            
-        on_diet = request.args.get('on_diet')
-        if on_diet is not None:
-            query = query.filter(Meal.is_on_diet == (on_diet.lower() == 'true'))
-            
-        meals_pagination = query.order_by(Meal.datetime.desc()).paginate(page=page, per_page=per_page, error_out=False)
-        meals = meals_pagination.items
-        
-        return jsonify({
-            'user_id': current_user.id,
-            'total_meals': meals_pagination.total,
-            'page': meals_pagination.page,
-            'per_page': meals_pagination.per_page,
-            'total_pages': meals_pagination.pages,
-            'has_next': meals_pagination.has_next,
-            'has_prev': meals_pagination.has_prev,
-            'meals': [meal.to_dict() for meal in meals]
-        }), 200
-        
+            statement = statement.where(Meal.datetime <= datetime.fromisoformat(end_date))
+        statement = statement.order_by(Meal.datetime.asc(), Meal.id.asc()).execution_options(
+            yield_per=EXPORT_BATCH_SIZE)
+
+        encode, mimetype = EXPORT_FORMATS[export_format]
+        filename = f'meals_{current_user.id}.{export_format}'
+        return Response(
+            stream_with_context(encode(db.session.execute(statement))),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+
+    except ValueError as e:
+        return jsonify({'error': f'Invalid date: {str(e)}'}), 400
     except Exception as e:
-        return jsonify({'error': f'Failed to retrieve meals: {str(e)}'}), 500
+        return jsonify({'error': f'Failed to export meals: {str(e)}'}), 500
+
+
+EXPORT_COLUMNS = ('id', 'name', 'description', 'datetime', 'is_on_diet', 'category', 'calories',
+                  'protein_grams', 'carbohydrates_grams', 'fats_grams', 'image_url', 'created_at', 'updated_at')
+EXPORT_BATCH_SIZE = 1000
+
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _export_ndjson(result):
+    for rows in result.partitions():
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, map(_export_value, row))), separators=(',', ':')) + '\n'
+            for row in rows
+        )
+
+
+def _export_csv(result):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in result.partitions():
+        writer.writerows([_export_value(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    'ndjson': (_export_ndjson, 'application/x-ndjson'),
+    'csv': (_export_csv, 'text/csv')
+}
 
 
 @meals_bp.route('/meals/<int:meal_id>', methods=['GET'])
-@token_required
+@token_required(load_user_row=False)
+@use_replica
 def get_meal(current_user, meal_id):
     '''Retrieve a single meal by ID, if it belongs to the user'''
     try:
@@ -139,14 +343,18 @@ def get_meal(current_user, meal_id):
         if not meal:
             return jsonify({'error': 'Meal not found or you do not have permission to view it'}), 404
         
-        return jsonify({'meal': meal.to_dict()}), 200
+        return conditional_response(
+            make_etag('meal', meal.id, meal.updated_at),
+            lambda: (jsonify({'meal': meal.to_dict()}), 200),
+            last_modified=meal.updated_at
+        )
         
     except Exception as e:
         return jsonify({'error': f'Failed to retrieve meal: {str(e)}'}), 500
 
 
 @meals_bp.route('/meals/<int:meal_id>', methods=['PUT'])
-@token_required
+@token_required(load_user_row=False)
 @validate()
 def update_meal(current_user, meal_id, body: MealUpdateSchema):
     '''Edit an existing meal, if it belongs to the user'''
@@ -156,12 +364,16 @@ def update_meal(current_user, meal_id, body: MealUpdateSchema):
         if not meal:
             return jsonify({'error': 'Meal not found or you do not have permission to edit it'}), 404
         
+        snapshots = snapshot_meal(meal)
         update_data = body.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(meal, key, value)
         
         meal.updated_at = datetime.now(timezone.utc)
         
+        db.session.flush()
+        record_meal_update(snapshots, meal)
+        SharedItem.refresh_snapshots_for_meal(meal.id)
         db.session.commit()
         
         return jsonify({
@@ -175,16 +387,20 @@ def update_meal(current_user, meal_id, body: MealUpdateSchema):
 
 
 @meals_bp.route('/meals/<int:meal_id>', methods=['DELETE'])
-@token_required
+@token_required(load_user_row=False)
 def delete_meal(current_user, meal_id):
     '''Delete a meal, if it belongs to the user'''
     try:
-        meal = Meal.query.filter_by(id=meal_id, user__id=current_user.id).first()
+        meal = Meal.query.filter_by(id=meal_id, user_id=current_user.id).first()
         
         if not meal:
             return jsonify({'error': 'Meal not found or you do not have permission to delete it'}), 404
         
+        shared_items = SharedItem.detach_meal(meal.id)
         db.session.delete(meal)
+        db.session.flush()
+        record_meal_delete(meal)
+        SharedItem.refresh_snapshots(shared_items)
         db.session.commit()
         
         return jsonify({'message': 'Meal deleted successfully'}), 200
@@ -195,77 +411,134 @@ def delete_meal(current_user, meal_id):
 
 
 @meals_bp.route('/meals/stats', methods=['GET'])
-@token_required
+@token_required(load_user_row=False)
+@use_replica
 def get_user_stats(current_user):
     '''Get diet statistics for the authenticated user'''
     try:
-        meals = Meal.query.filter_by(user_id=current_user.id).all()
+        stats = db.session.get(UserMealStats, current_user.id)
+        if stats:
+            return conditional_response(
+                make_etag('stats', stats.user_id, stats.total_meals, stats.updated_at),
+                lambda: (jsonify(stats.to_dict()), 200),
+                last_modified=stats.updated_at
+            )
         
-        total_meals = len(meals)
-        on_diet_meals = sum(1 for meal in meals if meal.is_on_diet)
-        off_diet_meals = total_meals - on_diet_meals
-        
-        on_diet_percentage = (on_diet_meals / total_meals * 100) if total_meals > 0 else 0
-        
-        return jsonify({
-            'user_id': current_user.id,
-            'total_meals': total_meals,
-            'on_diet_meals': on_diet_meals,
-            'off_diet_meals': off_diet_meals,
-            'on_diet_percentage': round(on_diet_percentage, 2)
-        }), 200
+        # No stats row yet (no meals, or not backfilled): aggregate in SQL instead
+        counters = UserMealStats.compute(current_user.id)
+        return jsonify(UserMealStats.build_response(current_user.id, counters)), 200
         
     except Exception as e:
         return jsonify({'error': f'Failed to retrieve statistics: {str(e)}'}), 500
 
 
 @meals_bp.route('/meals/best-sequence', methods=['GET'])
-@token_required
+@token_required(load_user_row=False)
+@use_replica
 def get_best_diet_sequence(current_user):
-    '''Get the best sequence of meals on diet for the authenticated user'''
+    '''Get the best sequence of meals on diet for the authenticated user
+
+    Streaks are computed in the database. Optional query parameters:
+    ``start_date``/``end_date`` restrict the window, ``top=k`` also returns
+    the k longest streaks and ``include_meals=true`` serializes the meals
+    of the best streak.
+    '''
     try:
-        meals = Meal.query.filter_by(user_id=current_user.id).order_by(Meal.datetime.asc()).all()
-        
-        if not meals:
-            return jsonify({
-                'user_id': current_user.id,
-                'best_sequence': 0,
-                'meals': []
-            }), 200
-
-        best_sequence = 0
-        current_sequence = 0
-        best_sequence_meals = []
-        current_sequence_meals = []
-
-        for meal in meals:
-            if meal.is_on_diet:
-                current_sequence += 1
-                current_sequence_meals.append(meal.to_dict())
-            else:
-                if current_sequence > best_sequence:
-                    best_sequence = current_sequence
-                    best_sequence_meals = current_sequence_meals
-                current_sequence = 0
-                current_sequence_meals = []
-        
-        if current_sequence > best_sequence:
-            best_sequence = current_sequence
-            best_sequence_meals = current_sequence_meals
+        top = request.args.get('top', type=int)
+        if top is not None and not 1 <= top <= MAX_TOP_STREAKS:
+            return jsonify({'error': f'top must be between 1 and {MAX_TOP_STREAKS}'}), 400
+        include_meals = parse_bool_arg(request.args.get('include_meals'))
 
-        return jsonify({
+        sequenced = _sequenced_meals_subquery(
+            current_user.id, request.args.get('start_date'), request.args.get('end_date'))
+        streaks = _on_diet_streaks(sequenced, top or 1)
+        best = streaks[0] if streaks else None
+
+        response = {
             'user_id': current_user.id,
-            'best_sequence': best_sequence,
-            'meals': best_sequence_meals
-        }), 200
+            'best_sequence': best['length'] if best else 0,
+            'start_datetime': best['start_datetime'] if best else None,
+            'end_datetime': best['end_datetime'] if best else None
+        }
+        if top is not None:
+            response['streaks'] = streaks
+        if include_meals:
+            meals = []
+            if best:
+                meals = fetch_meal_dicts(
+                    select_meal_rows(sequenced.c.seq.between(best['first_seq'], best['last_seq']))
+                    .join(sequenced, Meal.id == sequenced.c.id)
+                    .order_by(sequenced.c.seq)
+                )
+            response['meals'] = meals
+
+        for streak in streaks:
+            del streak['first_seq'], streak['last_seq']
+
+        return jsonify(response), 200
         
+    except ValueError as e:
+        return jsonify({'error': f'Invalid date: {str(e)}'}), 400
     except Exception as e:
         return jsonify({'error': f'Failed to retrieve best sequence: {str(e)}'}), 500
 
+
+def _sequenced_meals_subquery(user_id, start_date=None, end_date=None):
+    '''
+    Number the user's meals chronologically and tag each with its island.
+
+    ``seq`` is the position in (datetime, id) order; ``island`` is constant
+    across a run of consecutive meals sharing the same ``is_on_diet`` value
+    (the difference of the global and the per-value row numbers).
+    '''
+    ordering = (Meal.datetime, Meal.id)
+    seq = func.row_number().over(order_by=ordering)
+    island = seq - func.row_number().over(partition_by=Meal.is_on_diet, order_by=ordering)
+    query = select(
+        Meal.id, Meal.datetime, Meal.is_on_diet,
+        seq.label('seq'), island.label('island')
+    ).where(Meal.user_id == user_id)
+    if start_date:
+        query = query.where(Meal.datetime >= datetime.fromisoformat(start_date))
+    if end_date:
+        query = query.where(Meal.datetime <= datetime.fromisoformat(end_date))
+    return query.subquery()
+
+
+def _on_diet_streaks(sequenced, limit):
+    '''Return the ``limit`` longest on-diet runs, earliest first on ties'''
+    length = func.count().label('length')
+    rows = db.session.execute(
+        select(
+            length,
+            func.min(sequenced.c.datetime).label('start_datetime'),
+            func.max(sequenced.c.datetime).label('end_datetime'),
+            func.min(sequenced.c.seq).label('first_seq'),
+            func.max(sequenced.c.seq).label('last_seq')
+        )
+        .where(sequenced.c.is_on_diet.is_(True))
+        .group_by(sequenced.c.island)
+        .order_by(length.desc(), func.min(sequenced.c.seq))
+        .limit(limit)
+    ).all()
+    return [{
+        'length': row.length,
+        'start_datetime': row.start_datetime.isoformat(),
+        'end_datetime': row.end_datetime.isoformat(),
+        'first_seq': row.first_seq,
+        'last_seq': row.last_seq
+    } for row in rows]
+
 @meals_bp.route('/meals/reports', methods=['GET'])
-@token_required
+@token_required(load_user_row=False)
+@use_replica
 def get_meal_reports(current_user):
-    '''Generate daily, weekly, or monthly meal reports'''
+    '''Generate daily, weekly, or monthly meal reports
+
+    Totals are aggregated in the database. Optional query parameters:
+    ``group_by=category|day|is_on_diet`` adds a breakdown and
+    ``include_meals`` toggles the meal list (off by default for monthly).
+    '''
     try:
         period = request.args.get('period', 'daily', type=str)
         report_date_str = request.args.get('date', date.today().isoformat(), type=str)
@@ -280,21 +553,25 @@ def get_meal_reports(current_user):
         elif period == 'monthly':
             start_date = datetime.combine(report_date.replace(day=1), datetime.min.time(), tzinfo=timezone.utc)
             next_month = start_date.replace(day=28) + timedelta(days=4)
-            end_date = datetime.combine(next_month - timedelta(days=next_month.day), datetime.min.time(), tzinfo=timezone.utc)
+            end_date = next_month.replace(day=1)
         else:
             return jsonify({'error': 'Invalid period specified. Use daily, weekly, or monthly.'}), 400
 
-        meals = Meal.query.filter(
+        group_by = request.args.get('group_by')
+        if group_by is not None and group_by not in REPORT_GROUPINGS:
+            return jsonify({'error': 'Invalid group_by specified. Use category, day, or is_on_diet.'}), 400
+        include_meals = parse_bool_arg(request.args.get('include_meals'), default=period != 'monthly')
+
+        filters = (
             Meal.user_id == current_user.id,
             Meal.datetime >= start_date,
             Meal.datetime < end_date
-        ).all()
+        )
 
-        total_meals = len(meals)
-        total_calories = sum(meal.calories for meal in meals if meal.calories)
-        total_protein = sum(meal.protein_grams for meal in meals if meal.protein_grams)
-        total_carbs = sum(meal.carbohydrates_grams for meal in meals if meal.carbohydrates_grams)
-        total_fats = sum(meal.fats_grams for meal in meals if meal.fats_grams)
+        # Periods cover whole UTC days, so totals come straight from the daily rollups
+        totals = MealDailyRollup.totals(current_user.id, start_date.date(), end_date.date())
+        total_meals = totals['total_meals']
+        total_calories = totals['total_calories']
 
         report = {
             'user_id': current_user.id,
@@ -304,21 +581,126 @@ def get_meal_reports(current_user):
             'total_meals': total_meals,
             'total_calories': total_calories,
             'average_calories_per_meal': round(total_calories / total_meals, 2) if total_meals > 0 else 0,
-            'total_protein_grams': total_protein,
-            'total_carbohydrates_grams': total_carbs,
-            'total_fats_grams': total_fats,
-            'meals': [meal.to_dict() for meal in meals]
+            'total_protein_grams': totals['total_protein_grams'],
+            'total_carbohydrates_grams': totals['total_carbohydrates_grams'],
+            'total_fats_grams': totals['total_fats_grams']
         }
 
+        if group_by:
+            report['group_by'] = group_by
+            report['breakdown'] = _report_breakdown(group_by, filters)
+
+        if include_meals:
+            report['meals'] = fetch_meal_dicts(
+                select_meal_rows(*filters).order_by(Meal.datetime.asc(), Meal.id.asc()))
+
         return jsonify(report), 200
 
     except Exception as e:
         return jsonify({'error': f'Failed to generate report: {str(e)}'}), 500
 
+
+REPORT_GROUPINGS = {
+    'category': lambda: Meal.category,
+    'day': lambda: func.date(Meal.datetime),
+    'is_on_diet': lambda: Meal.is_on_diet
+}
+
+
+def _report_aggregates():
+    '''Aggregate columns for report breakdowns'''
+    return (
+        func.count(Meal.id).label('total_meals'),
+        func.coalesce(func.sum(Meal.calories), 0).label('total_calories'),
+        func.coalesce(func.sum(Meal.protein_grams), 0).label('total_protein_grams'),
+        func.coalesce(func.sum(Meal.carbohydrates_grams), 0).label('total_carbohydrates_grams'),
+        func.coalesce(func.sum(Meal.fats_grams), 0).label('total_fats_grams')
+    )
+
+
+def _report_breakdown(group_by, filters):
+    '''Per-group report totals computed with GROUP BY'''
+    key = REPORT_GROUPINGS[group_by]().label('key')
+    rows = db.session.execute(
+        select(key, *_report_aggregates()).where(*filters).group_by(key).order_by(key)
+    ).all()
+    return [{
+        group_by: row.key.isoformat() if hasattr(row.key, 'isoformat') else row.key,
+        'total_meals': row.total_meals,
+        'total_calories': row.total_calories,
+        'total_protein_grams': row.total_protein_grams,
+        'total_carbohydrates_grams': row.total_carbohydrates_grams,
+        'total_fats_grams': row.total_fats_grams
+    } for row in rows]
+
+@meals_bp.route('/meals/timeseries', methods=['GET'])
+@token_required(load_user_row=False)
+@use_replica
+def get_meal_timeseries(current_user):
+    '''Nutrition totals per day, week or month, served from the daily rollups'''
+    try:
+        bucket = request.args.get('bucket', 'day', type=str)
+        if bucket not in TIMESERIES_BUCKETS:
+            return jsonify({'error': 'Invalid bucket specified. Use day, week, or month.'}), 400
+
+        to_date = date.fromisoformat(request.args.get('to', date.today().isoformat(), type=str))
+        from_date = date.fromisoformat(request.args.get('from', (to_date - timedelta(days=29)).isoformat(), type=str))
+        if from_date > to_date:
+            return jsonify({'error': 'from must not be after to'}), 400
+        if (to_date - from_date).days >= MAX_TIMESERIES_DAYS:
+            return jsonify({'error': f'Range must not exceed {MAX_TIMESERIES_DAYS} days'}), 400
+
+        rollups = MealDailyRollup.query.filter(
+            MealDailyRollup.user_id == current_user.id,
+            MealDailyRollup.day >= from_date,
+            MealDailyRollup.day <= to_date
+        ).all()
+
+        bucket_start = TIMESERIES_BUCKETS[bucket]
+        buckets = {}
+        day = from_date
+        while day <= to_date:
+            buckets.setdefault(bucket_start(day), dict.fromkeys(MealDailyRollup.COUNTERS, 0))
+            day += timedelta(days=1)
+
+        for rollup in rollups:
+            totals = buckets[bucket_start(rollup.day)]
+            for name in MealDailyRollup.COUNTERS:
+                totals[name] += getattr(rollup, name)
+
+        return jsonify({
+            'user_id': current_user.id,
+            'bucket': bucket,
+            'from': from_date.isoformat(),
+            'to': to_date.isoformat(),
+            'series': [{'start_date': start.isoformat(), **totals} for start, totals in buckets.items()]
+        }), 200
+
+    except ValueError as e:
+        return jsonify({'error': f'Invalid date: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Failed to generate time series: {str(e)}'}), 500
+
+
+TIMESERIES_BUCKETS = {
+    'day': lambda day: day,
+    'week': lambda day: day - timedelta(days=day.weekday()),
+    'month': lambda day: day.replace(day=1)
+}
+
+
+def _image_object_prefix(user_id, meal_id):
+    return f"user_{user_id}_meal_{meal_id}_"
+
+
 @meals_bp.route('/meals/<int:meal_id>/image', methods=['POST'])
-@token_required
+@token_required(load_user_row=False)
 def upload_meal_image(current_user, meal_id):
-    '''Upload an image for a meal'''
+    '''Upload an image for a meal
+
+    The file is spooled locally and uploaded to storage (with thumbnails) in
+    the background; the meal's image_status moves from pending to ready.
+    '''
     try:
         meal = Meal.query.filter_by(id=meal_id, user_id=current_user.id).first()
         if not meal:
@@ -331,25 +713,113 @@ def upload_meal_image(current_user, meal_id):
         if file.filename == '':
             return jsonify({'error': 'No selected file'}), 400
 
-        if file:
-            bucket_name = os.environ.get('S3_BUCKET_NAME')
-            # create a unique filename for the image
-            object_name = f"user_{current_user.id}_meal_{meal.id}_{file.filename}"
-            image_url = upload_file_to_s3(file, bucket_name, object_name)
-            if image_url:
-                meal.image_url = image_url
-                db.session.commit()
-                return jsonify({'message': 'Image uploaded successfully', 'meal': meal.to_dict()}), 200
-            else:
-                return jsonify({'error': 'Failed to upload image to S3'}), 500
+        pipeline = get_image_pipeline()
+        if not pipeline.is_image(file):
+            return jsonify({'error': 'Uploaded file is not an accepted image'}), 400
+        spool_path = pipeline.spool(file)
+        # create a unique filename for the image
+        object_name = f"{_image_object_prefix(current_user.id, meal.id)}{uuid.uuid4().hex[:8]}_{secure_filename(file.filename)}"
+
+        meal.image_status = 'pending'
+        record_meal_touch(meal)
+        SharedItem.refresh_snapshots_for_meal(meal.id)
+        db.session.commit()
+
+        pipeline.submit(meal.id, spool_path, object_name, file.mimetype)
+        db.session.refresh(meal)
+        return jsonify({'message': 'Image accepted for processing', 'meal': meal.to_dict()}), 202
     
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': f'Failed to upload image: {str(e)}'}), 500
 
+
+@meals_bp.route('/meals/<int:meal_id>/image/upload-url', methods=['POST'])
+@token_required(load_user_row=False)
+@validate()
+def create_meal_image_upload_url(current_user, meal_id, body: MealImageUploadUrlSchema):
+    '''
+    Issue a pre-signed S3 POST policy so the client uploads the image directly
+
+    The client posts the returned fields plus the file to the URL, then calls
+    the completion endpoint with the object_name.
+    '''
+    try:
+        meal = Meal.query.filter_by(id=meal_id, user_id=current_user.id).first()
+        if not meal:
+            return jsonify({'error': 'Meal not found or you do not have permission to edit it'}), 404
+
+        config = current_app.config
+        if config['IMAGE_STORAGE_BACKEND'] != 's3':
+            return jsonify({'error': 'Direct uploads require the S3 storage backend'}), 400
+        if body.content_type not in IMAGE_CONTENT_TYPES:
+            return jsonify({'error': f"content_type must be one of: {', '.join(IMAGE_CONTENT_TYPES)}"}), 400
+        filename = secure_filename(body.filename)
+        if not filename:
+            return jsonify({'error': 'Invalid filename'}), 400
+
+        object_name = f"{_image_object_prefix(current_user.id, meal.id)}{uuid.uuid4().hex[:8]}_{filename}"
+        max_size = config['IMAGE_MAX_UPLOAD_BYTES']
+        expires_in = config['IMAGE_UPLOAD_URL_EXPIRES']
+        upload = generate_presigned_upload(config['S3_BUCKET_NAME'], object_name, body.content_type, max_size, expires_in)
+        if upload is None:
+            return jsonify({'error': 'Failed to create upload URL'}), 500
+
+        return jsonify({
+            'upload_url': upload['url'],
+            'fields': upload['fields'],
+            'object_name': object_name,
+            'max_size': max_size,
+            'expires_in': expires_in
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'Failed to create upload URL: {str(e)}'}), 500
+
+
+@meals_bp.route('/meals/<int:meal_id>/image/complete', methods=['POST'])
+@token_required(load_user_row=False)
+@validate()
+def complete_meal_image_upload(current_user, meal_id, body: MealImageCompleteSchema):
+    '''Verify a direct S3 upload and attach it to the meal'''
+    try:
+        meal = Meal.query.filter_by(id=meal_id, user_id=current_user.id).first()
+        if not meal:
+            return jsonify({'error': 'Meal not found or you do not have permission to edit it'}), 404
+
+        config = current_app.config
+        if config['IMAGE_STORAGE_BACKEND'] != 's3':
+            return jsonify({'error': 'Direct uploads require the S3 storage backend'}), 400
+        # Only keys issued for this meal may be attached to it
+        if not body.object_name.startswith(_image_object_prefix(current_user.id, meal.id)) or '/' in body.object_name:
+            return jsonify({'error': 'object_name was not issued for this meal'}), 400
+
+        bucket_name = config['S3_BUCKET_NAME']
+        metadata = get_object_metadata(bucket_name, body.object_name)
+        if metadata is None:
+            return jsonify({'error': 'Image has not been uploaded yet'}), 409
+        if metadata['size'] > config['IMAGE_MAX_UPLOAD_BYTES'] or metadata['content_type'] not in IMAGE_CONTENT_TYPES:
+            delete_object(bucket_name, body.object_name)
+            return jsonify({'error': 'Uploaded object is not an accepted image'}), 400
+
+        meal.image_url = object_url(bucket_name, body.object_name)
+        meal.image_status = 'ready'
+        meal.image_thumbnails = None
+        record_meal_touch(meal)
+        SharedItem.refresh_snapshots_for_meal(meal.id)
+        db.session.commit()
+
+        return jsonify({'message': 'Image uploaded successfully', 'meal': meal.to_dict()}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to complete image upload: {str(e)}'}), 500
+
+
 @meals_bp.route('/meals/reminders/send', methods=['POST'])
 @token_required
 def send_meal_reminders(current_user):
-    '''Send meal reminders to the current user'''
+    '''Queue an email reminding the current user of their meals in the next 24 hours'''
     try:
         now = datetime.now(timezone.utc)
         end_of_day = now + timedelta(days=1)
@@ -363,17 +833,11 @@ def send_meal_reminders(current_user):
         if not meals:
             return jsonify({'message': 'No upcoming meals in the next 24 hours.'}), 200
 
-        subject = 'Your Upcoming Meal Reminders'
-        html_content = '<h1>Your upcoming meals for the next 24 hours:</h1>'
-        html_content += '<ul>'
-        for meal in meals:
-            html_content += f'<li><strong>{meal.name}</strong> at {meal.datetime.strftime("%Y-%m-%d %H:%M:%S")} UTC</li>'
-        html_content += '</ul>'
-
-        if send_email(current_user.email, subject, html_content):
-            return jsonify({'message': 'Meal reminders sent successfully.'}), 200
-        else:
-            return jsonify({'error': 'Failed to send email.'}), 500
+        queue_email(current_user.email, REMINDER_SUBJECT, render_meal_reminder(meals))
+        db.session.commit()
+        get_email_dispatcher().wake()
+        return jsonify({'message': 'Meal reminders queued.'}), 202
 
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': f'Failed to send reminders: {str(e)}'}), 500
\ No newline at end of file
@@ -1,14 +1,23 @@
 from flask import Blueprint, request, jsonify
+from sqlalchemy import and_, or_
 from app import db
 from app.models.user import User
 from app.models.meal import Meal
 from app.models.shared_item import SharedItem
+from app.models.feed_entry import FeedEntry
 from app.decorators import token_required
+from app.db_routing import use_replica
+from app.http_cache import conditional_response, make_etag
+from app.pagination import InvalidCursorError, decode_cursor, encode_cursor
 
 social_bp = Blueprint('social', __name__, url_prefix='/social')
 
+DEFAULT_FEED_LIMIT = 20
+MAX_FEED_LIMIT = 100
+PUBLIC_SHARED_ITEM_MAX_AGE = 60
+
 @social_bp.route('/share', methods=['POST'])
-@token_required
+@token_required(load_user_row=False)
 def share_meals(current_user):
     '''Share a meal or a list of meals'''
     data = request.get_json()
@@ -28,14 +37,18 @@ def share_meals(current_user):
     
     for meal in meals:
         shared_item.meals.append(meal)
+    shared_item.take_snapshot(sorted(meals, key=lambda meal: (meal.datetime, meal.id)))
 
     db.session.add(shared_item)
+    db.session.flush()
+    FeedEntry.fan_out(shared_item)
     db.session.commit()
 
     return jsonify({'message': 'Meals shared successfully', 'shared_item': shared_item.to_dict()}), 201
 
 @social_bp.route('/share/<int:shared_item_id>', methods=['GET'])
 @token_required
+@use_replica
 def get_shared_item(current_user, shared_item_id):
     '''Get a shared item by ID'''
     shared_item = SharedItem.query.get(shared_item_id)
@@ -46,13 +59,44 @@ def get_shared_item(current_user, shared_item_id):
         if shared_item.user_id != current_user.id and not current_user.is_following(shared_item.user):
              return jsonify({'error': 'You do not have permission to view this item'}), 403
     
-    return jsonify(shared_item.to_dict()), 200
+    return conditional_response(
+        make_etag('shared_item', shared_item.id, shared_item.last_modified, shared_item.is_public),
+        lambda: (jsonify(shared_item.to_dict()), 200),
+        last_modified=shared_item.last_modified,
+        public=shared_item.is_public,
+        max_age=PUBLIC_SHARED_ITEM_MAX_AGE
+    )
 
 @social_bp.route('/feed', methods=['GET'])
-@token_required
+@token_required(load_user_row=False)
+@use_replica
 def get_feed(current_user):
-    '''Get the feed of shared items from followed users'''
-    followed_users_ids = [user.id for user in current_user.followed]
-    shared_items = SharedItem.query.filter(SharedItem.user_id.in_(followed_users_ids)).order_by(SharedItem.created_at.desc()).all()
-    
-    return jsonify([item.to_dict() for item in shared_items]), 200
+    '''Get the feed of shared items from followed users, newest first
+
+    Cursor-paginated: pass ``limit`` and follow ``next_cursor``.
+    '''
+    limit = min(max(request.args.get('limit', DEFAULT_FEED_LIMIT, type=int), 1), MAX_FEED_LIMIT)
+    query = SharedItem.query.join(FeedEntry, FeedEntry.shared_item_id == SharedItem.id).filter(
+        FeedEntry.user_id == current_user.id)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+        except InvalidCursorError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(or_(
+            FeedEntry.created_at < cursor_created_at,
+            and_(FeedEntry.created_at == cursor_created_at, FeedEntry.shared_item_id < cursor_id)
+        ))
+
+    shared_items = query.order_by(FeedEntry.created_at.desc(), FeedEntry.shared_item_id.desc()).limit(limit + 1).all()
+    has_next = len(shared_items) > limit
+    shared_items = shared_items[:limit]
+    next_cursor = encode_cursor(shared_items[-1].created_at, shared_items[-1].id) if has_next else None
+
+    return jsonify({
+        'items': SharedItem.to_dicts(shared_items),
+        'has_next': has_next,
+        'next_cursor': next_cursor
+    }), 200
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from app import db
 from app.models.user import User
 from app.decorators import token_required
+from app.auth_cache import invalidate_user
 import re
 
 user_bp = Blueprint('user', __name__, url_prefix='/user')
@@ -17,7 +18,7 @@ def get_profile(current_user):
     }), 200
 
 @user_bp.route('/profile', methods=['PUT'])
-@token_required
+@token_required(bypass_cache=True)
 def update_profile(current_user):
     '''Update the current user's profile'''
     data = request.get_json()
@@ -37,10 +38,11 @@ def update_profile(current_user):
         current_user.email = new_email
 
     db.session.commit()
+    invalidate_user(current_user.id)
     return jsonify({'message': 'Profile updated successfully'}), 200
 
 @user_bp.route('/password', methods=['PUT'])
-@token_required
+@token_required(bypass_cache=True)
 def update_password(current_user):
     '''Update the current user's password'''
     data = request.get_json()
@@ -62,11 +64,12 @@ def update_password(current_user):
 
     current_user.set_password(new_password)
     db.session.commit()
+    invalidate_user(current_user.id)
 
     return jsonify({'message': 'Password updated successfully'}), 200
 
 @user_bp.route('/<username>/follow', methods=['POST'])
-@token_required
+@token_required(bypass_cache=True)
 def follow(current_user, username):
     '''Follow a user'''
     user_to_follow = User.query.filter_by(username=username).first()
@@ -81,7 +84,7 @@ def follow(current_user, username):
     return jsonify({'message': f'You are now following {username}'}), 200
 
 @user_bp.route('/<username>/unfollow', methods=['POST'])
-@token_required
+@token_required(bypass_cache=True)
 def unfollow(current_user, username):
     '''Unfollow a user'''
     user_to_unfollow = User.query.filter_by(username=username).first()
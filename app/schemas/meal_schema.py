@@ -26,4 +26,11 @@ class MealUpdateSchema(BaseModel):
     calories: Optional[int]
     protein_grams: Optional[float]
     carbohydrates_grams: Optional[float]
-    fats_grams: Optional[float]
\ No newline at end of file
+    fats_grams: Optional[float]
+
+class MealImageUploadUrlSchema(BaseModel):
+    filename: str
+    content_type: str
+
+class MealImageCompleteSchema(BaseModel):
+    object_name: str
@@ -0,0 +1,57 @@
+from datetime import date
+from sqlalchemy import select
+from app import db
+from app.models.meal import Meal
+
+
+class RowSerializer:
+    '''
+    Turn result tuples into response dicts without hydrating ORM objects
+
+    The key order and the positions of temporal columns are resolved once,
+    so serializing a row is a zip plus an isoformat() per temporal value.
+    '''
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self.keys = tuple(column.key for column in self.columns)
+        self._temporal = tuple(
+            index for index, column in enumerate(self.columns)
+            if issubclass(column.type.python_type, date)
+        )
+
+    def __call__(self, row):
+        if not self._temporal:
+            return dict(zip(self.keys, row))
+        values = list(row)
+        for index in self._temporal:
+            value = values[index]
+            if value is not None:
+                values[index] = value.isoformat()
+        return dict(zip(self.keys, values))
+
+    def many(self, rows):
+        return [self(row) for row in rows]
+
+    def select(self):
+        return select(*self.columns)
+
+
+# Same keys and order as Meal.to_dict()
+MEAL_COLUMNS = (
+    Meal.id, Meal.name, Meal.description, Meal.datetime, Meal.is_on_diet, Meal.user_id,
+    Meal.created_at, Meal.updated_at, Meal.category, Meal.calories, Meal.protein_grams,
+    Meal.carbohydrates_grams, Meal.fats_grams, Meal.image_url, Meal.image_status, Meal.image_thumbnails
+)
+
+serialize_meal_row = RowSerializer(MEAL_COLUMNS)
+
+
+def select_meal_rows(*filters):
+    '''SELECT of the serializable meal columns with the given filters'''
+    return serialize_meal_row.select().where(*filters)
+
+
+def fetch_meal_dicts(statement):
+    '''Execute a select_meal_rows() statement and serialize every row'''
+    return serialize_meal_row.many(db.session.execute(statement))
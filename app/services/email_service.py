@@ -1,26 +1,294 @@
-import os
+import threading
+from collections import namedtuple
+from flask import current_app
+from python_http_client.exceptions import HTTPError
 from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+from sendgrid.helpers.mail import Mail, Personalization, Substitution, To
+from app import db
+
+EmailMessage = namedtuple('EmailMessage', ['to_email', 'subject', 'html_content'])
+OutboxMessage = namedtuple('OutboxMessage', ['id', 'to_email', 'subject', 'html_content'])
+
+
+class EmailRejectedError(Exception):
+    '''
+    The provider refused a group because of its content (a 4xx other than 429)
+
+    Unlike outages and throttling, a rejection is caused by some message of
+    the group, so the dispatcher splits the group to isolate it.
+    '''
+
+    def __init__(self, status_code, detail=None):
+        super().__init__(f'Email provider rejected the request with {status_code}' + (f': {detail}' if detail else ''))
+        self.status_code = status_code
+
+
+def _is_rejection(status_code):
+    return 400 <= status_code < 500 and status_code != 429
+
+
+class EmailTransport:
+    '''Delivers groups of messages; each group is one provider API call'''
+    max_batch_size = 1
+
+    def group(self, messages):
+        '''Split messages into the groups passed to send()'''
+        for start in range(0, len(messages), self.max_batch_size):
+            yield messages[start:start + self.max_batch_size]
+
+    def send(self, messages):
+        '''Deliver every message in the group or raise'''
+        raise NotImplementedError
+
+
+class SendGridTransport(EmailTransport):
+    '''
+    Send through SendGrid with one long-lived API client
+
+    A group becomes a single Mail with one personalization per recipient, so
+    recipients never see each other. Each personalization carries its own
+    subject and substitutes its own body into a shared content placeholder.
+    '''
+    max_batch_size = 1000
+    BODY_TAG = '-body-'
+    # SendGrid caps the substitutions of one personalization at 10,000 bytes
+    MAX_SUBSTITUTION_BYTES = 10000
+
+    def __init__(self, api_key, from_email):
+        self.from_email = from_email
+        self.client = SendGridAPIClient(api_key)
+
+    def _fits_substitution(self, message):
+        return len(message.html_content.encode()) + len(self.BODY_TAG) <= self.MAX_SUBSTITUTION_BYTES
+
+    def group(self, messages):
+        batchable = [message for message in messages if self._fits_substitution(message)]
+        yield from super().group(batchable)
+        for message in messages:
+            if not self._fits_substitution(message):
+                yield [message]
+
+    def send(self, messages):
+        if len(messages) == 1:
+            message = messages[0]
+            mail = Mail(from_email=self.from_email, to_emails=message.to_email,
+                        subject=message.subject, html_content=message.html_content)
+        else:
+            mail = Mail(from_email=self.from_email, html_content=self.BODY_TAG)
+            for message in messages:
+                personalization = Personalization()
+                personalization.add_to(To(message.to_email))
+                personalization.subject = message.subject
+                personalization.add_substitution(Substitution(self.BODY_TAG, message.html_content))
+                mail.add_personalization(personalization)
+        try:
+            response = self.client.send(mail)
+        except HTTPError as e:
+            if _is_rejection(e.status_code):
+                raise EmailRejectedError(e.status_code, e.body) from e
+            raise
+        if _is_rejection(response.status_code):
+            raise EmailRejectedError(response.status_code, response.body)
+        if response.status_code >= 300:
+            raise RuntimeError(f'SendGrid responded with {response.status_code}')
+
+
+class LocalTransport(EmailTransport):
+    '''
+    Keep sent messages in memory instead of calling a provider; for development and tests
+
+    Groups containing an address in ``rejected`` are refused like a provider
+    4xx, and ``failures`` makes that many next calls fail like an outage.
+    '''
+    max_batch_size = 1000
+
+    def __init__(self):
+        self.sent = []
+        self.calls = 0
+        self.rejected = set()
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def send(self, messages):
+        with self._lock:
+            self.calls += 1
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError('Local transport unavailable')
+            if any(message.to_email in self.rejected for message in messages):
+                raise EmailRejectedError(400, 'rejected recipient')
+            self.sent.extend(EmailMessage(message.to_email, message.subject, message.html_content)
+                             for message in messages)
+        for message in messages:
+            current_app.logger.info('Email to %s: %s', message.to_email, message.subject)
+
+
+class EmailDispatcher:
+    '''
+    Drain the email outbox in batches
+
+    ``mode`` decides where draining happens: ``thread`` runs a daemon thread
+    in each app process that wakes on new mail and polls every
+    ``poll_interval`` seconds, ``worker`` leaves it to the
+    ``flask dispatch-emails`` process, and ``inline`` drains synchronously
+    when woken, which keeps tests deterministic.
+    '''
+
+    def __init__(self, app, transport, mode='thread', batch_size=500, poll_interval=5, max_attempts=5,
+                 backoff_base=30, backoff_max=3600, lease_seconds=300):
+        self.app = app
+        self.transport = transport
+        self.mode = mode
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def dispatch_once(self):
+        '''
+        Claim one batch of due emails and try to deliver it
+
+        :return: Dict with the number of emails sent and failed in this batch
+        '''
+        from app.models.email_outbox import EmailOutbox
+
+        claimed = EmailOutbox.claim_batch(self.batch_size, self.lease_seconds)
+        # Copy what delivery needs before the commit expires the rows
+        attempts_by_id = {message.id: message.attempts for message in claimed}
+        messages = [OutboxMessage(message.id, message.to_email, message.subject, message.html_content)
+                    for message in claimed]
+        db.session.commit()
+        sent = failed = 0
+        for group in self.transport.group(messages):
+            group_sent, group_failed = self._deliver(group, attempts_by_id)
+            sent += group_sent
+            failed += group_failed
+            db.session.commit()
+        return {'sent': sent, 'failed': failed}
+
+    def _deliver(self, group, attempts_by_id):
+        '''
+        Send a group, bisecting it when the provider rejects its content
+
+        Only the messages the provider keeps rejecting back off; an outage
+        fails the whole group, since splitting it would not help.
+
+        :return: Tuple of the number of emails sent and failed
+        '''
+        from app.models.email_outbox import EmailOutbox
+
+        ids = [message.id for message in group]
+        try:
+            self.transport.send(group)
+        except EmailRejectedError as e:
+            if len(group) > 1:
+                middle = len(group) // 2
+                first_sent, first_failed = self._deliver(group[:middle], attempts_by_id)
+                second_sent, second_failed = self._deliver(group[middle:], attempts_by_id)
+                return first_sent + second_sent, first_failed + second_failed
+            error = e
+        except Exception as e:
+            error = e
+        else:
+            EmailOutbox.mark_sent(ids)
+            return len(group), 0
+        current_app.logger.warning('Failed to send %d email(s): %s', len(group), error)
+        EmailOutbox.mark_failed({message_id: attempts_by_id[message_id] for message_id in ids},
+                                error, self.max_attempts, self.backoff_base, self.backoff_max)
+        return 0, len(group)
+
+    def drain(self):
+        '''Dispatch batches until no email is due; return the totals'''
+        totals = {'sent': 0, 'failed': 0}
+        while True:
+            result = self.dispatch_once()
+            for key in totals:
+                totals[key] += result[key]
+            if not result['sent'] and not result['failed']:
+                return totals
+
+    def run_forever(self, stop_event=None):
+        '''Drain the outbox, then sleep until woken or ``poll_interval`` passes'''
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            with self.app.app_context():
+                try:
+                    self.drain()
+                except Exception:
+                    current_app.logger.exception('Email dispatcher failed')
+                finally:
+                    db.session.remove()
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def wake(self):
+        '''Signal that new mail was committed to the outbox'''
+        if self.mode == 'inline':
+            self.drain()
+        elif self.mode == 'thread':
+            self._ensure_thread()
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self.run_forever, name='email-dispatcher', daemon=True)
+                self._thread.start()
+
+
+def init_email_dispatcher(app):
+    if app.config.get('EMAIL_TRANSPORT', 'sendgrid') == 'local':
+        transport = LocalTransport()
+    else:
+        transport = SendGridTransport(app.config.get('SENDGRID_API_KEY'), app.config.get('SENDER_EMAIL'))
+    app.extensions['email_dispatcher'] = EmailDispatcher(
+        app,
+        transport,
+        mode=app.config.get('EMAIL_DISPATCH_MODE', 'thread'),
+        batch_size=app.config.get('EMAIL_BATCH_SIZE', 500),
+        poll_interval=app.config.get('EMAIL_POLL_INTERVAL', 5),
+        max_attempts=app.config.get('EMAIL_MAX_ATTEMPTS', 5),
+        backoff_base=app.config.get('EMAIL_BACKOFF_BASE', 30),
+        backoff_max=app.config.get('EMAIL_BACKOFF_MAX', 3600),
+        lease_seconds=app.config.get('EMAIL_LEASE_SECONDS', 300)
+    )
+
+
+def get_email_dispatcher():
+    return current_app.extensions['email_dispatcher']
+
+
+def queue_email(to_emails, subject, html_content):
+    """
+    Add an email to the outbox as part of the current transaction
+
+    :param to_emails: Recipient's email address
+    :param subject: Email subject
+    :param html_content: Email content in HTML format
+    :return: The outbox row; call get_email_dispatcher().wake() after committing
+    """
+    from app.models.email_outbox import EmailOutbox
+
+    return EmailOutbox.enqueue(to_emails, subject, html_content)
+
 
 def send_email(to_emails, subject, html_content):
     """
-    Send an email using SendGrid
+    Send an email immediately, bypassing the outbox
 
     :param to_emails: Recipient's email address
     :param subject: Email subject
     :param html_content: Email content in HTML format
     :return: True if email was sent, else False
     """
-    message = Mail(
-        from_email=os.environ.get('SENDER_EMAIL'),
-        to_emails=to_emails,
-        subject=subject,
-        html_content=html_content
-    )
     try:
-        sg = SendGridAPIClient(os.environ.get('SENDGRID_API_KEY'))
-        response = sg.send(message)
-        return response.status_code == 202
-    except Exception as e:
-        print(e)
+        get_email_dispatcher().transport.send([EmailMessage(to_emails, subject, html_content)])
+        return True
+    except Exception:
+        current_app.logger.exception('Failed to send email to %s', to_emails)
         return False
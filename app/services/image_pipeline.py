@@ -0,0 +1,242 @@
+import glob
+import io
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from app import db
+from app.services.local_storage import delete_file_locally, save_file_locally
+from app.services.s3_service import delete_object, upload_file_to_s3
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - Pillow is listed in requirements.txt
+    Image = None
+
+
+class ImagePipeline:
+    '''
+    Spool uploaded meal images locally and push them to storage in the background
+
+    The request only writes the upload to the spool directory; a worker pool
+    uploads the original, generates thumbnails and marks the meal ready.
+    With ``max_workers=0`` jobs run inline, which keeps tests deterministic.
+
+    Each spooled file has a ``.job.json`` manifest next to it, so jobs lost
+    with a worker process can be found and re-queued by sweep().
+    '''
+
+    def __init__(self, app, spool_dir, max_workers=2, thumbnail_sizes=(128, 512)):
+        self.app = app
+        self.spool_dir = spool_dir
+        self.thumbnail_sizes = tuple(thumbnail_sizes)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-pipeline') if max_workers > 0 else None
+        os.makedirs(spool_dir, exist_ok=True)
+
+    @staticmethod
+    def is_image(file):
+        '''Check that an uploaded file parses as an image, leaving its stream at the start'''
+        if Image is None:
+            return (file.mimetype or '').startswith('image/')
+        try:
+            with Image.open(file.stream) as image:
+                image.verify()
+            return True
+        except Exception:
+            return False
+        finally:
+            file.stream.seek(0)
+
+    def spool(self, file):
+        '''Write an uploaded file to the spool directory and return its path'''
+        extension = os.path.splitext(file.filename or '')[1].lower()
+        path = os.path.join(self.spool_dir, f'{uuid.uuid4().hex}{extension}')
+        file.save(path)
+        return path
+
+    @staticmethod
+    def job_path(spool_path):
+        return f'{spool_path}.job.json'
+
+    def submit(self, meal_id, spool_path, object_name, content_type=None):
+        with open(self.job_path(spool_path), 'w') as job:
+            json.dump({'meal_id': meal_id, 'object_name': object_name, 'content_type': content_type}, job)
+        if self.executor is None:
+            self._run(meal_id, spool_path, object_name, content_type)
+            return None
+        return self.executor.submit(self._run, meal_id, spool_path, object_name, content_type)
+
+    def _run(self, meal_id, spool_path, object_name, content_type):
+        with self.app.app_context():
+            try:
+                self.process(meal_id, spool_path, object_name, content_type)
+            finally:
+                db.session.remove()
+
+    def store(self, file, object_name, content_type=None):
+        '''Upload a file object to the configured storage backend and return its URL'''
+        config = self.app.config
+        if config['IMAGE_STORAGE_BACKEND'] == 'filesystem':
+            return save_file_locally(file, config['IMAGE_STORAGE_DIR'], object_name, config.get('IMAGE_STORAGE_BASE_URL'))
+        return upload_file_to_s3(file, config['S3_BUCKET_NAME'], object_name, content_type)
+
+    def remove(self, object_name):
+        '''Delete a stored object from the configured storage backend'''
+        config = self.app.config
+        if config['IMAGE_STORAGE_BACKEND'] == 'filesystem':
+            delete_file_locally(config['IMAGE_STORAGE_DIR'], object_name)
+        else:
+            delete_object(config['S3_BUCKET_NAME'], object_name)
+
+    def thumbnail_name(self, object_name, size):
+        base, extension = os.path.splitext(object_name)
+        return f'{base}_thumb_{size}{extension}'
+
+    def make_thumbnails(self, spool_path, object_name, content_type):
+        '''Resize the spooled image to every configured size and store the results'''
+        if Image is None or not self.thumbnail_sizes:
+            return {}
+        thumbnails = {}
+        with Image.open(spool_path) as original:
+            image_format = original.format or 'PNG'
+            for size in self.thumbnail_sizes:
+                thumbnail = original.copy()
+                thumbnail.thumbnail((size, size))
+                buffer = io.BytesIO()
+                thumbnail.save(buffer, format=image_format)
+                buffer.seek(0)
+                url = self.store(buffer, self.thumbnail_name(object_name, size), content_type)
+                if url:
+                    thumbnails[str(size)] = url
+        return thumbnails
+
+    def process(self, meal_id, spool_path, object_name, content_type=None):
+        '''Upload a spooled image and its thumbnails, then update the meal'''
+        from app.models.meal import Meal
+        from app.models.meal_counters import record_meal_touch
+        from app.models.shared_item import SharedItem
+
+        if not os.path.exists(spool_path):
+            # Already processed, e.g. by a worker that was slower than the sweep
+            return
+        image_url = None
+        thumbnails = {}
+        try:
+            with open(spool_path, 'rb') as spooled:
+                image_url = self.store(spooled, object_name, content_type)
+            if image_url:
+                thumbnails = self.make_thumbnails(spool_path, object_name, content_type)
+        except Exception:
+            current_app.logger.exception('Failed to process image for meal %s', meal_id)
+            if image_url:
+                # Do not keep an original the thumbnails could not be made from
+                self.remove_stored(object_name)
+            image_url = None
+        finally:
+            self.discard(spool_path)
+
+        meal = db.session.get(Meal, meal_id)
+        if meal is None:
+            return
+        if image_url:
+            meal.image_url = image_url
+            meal.image_thumbnails = thumbnails
+            meal.image_status = 'ready'
+        else:
+            meal.image_status = 'failed'
+        record_meal_touch(meal)
+        SharedItem.refresh_snapshots_for_meal(meal.id)
+        db.session.commit()
+
+    def remove_stored(self, object_name):
+        '''Best-effort removal of an original and whatever thumbnails were stored for it'''
+        for name in (object_name,) + tuple(self.thumbnail_name(object_name, size) for size in self.thumbnail_sizes):
+            try:
+                self.remove(name)
+            except Exception:
+                current_app.logger.exception('Failed to remove stored image %s', name)
+
+    def discard(self, spool_path):
+        '''Remove a spooled file and its job manifest'''
+        for path in (spool_path, self.job_path(spool_path)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def sweep(self, max_age_minutes=15):
+        """
+        Recover from jobs lost with a worker process
+
+        Meals left ``pending`` for longer than ``max_age_minutes`` are re-queued
+        when their spooled file is still there and marked ``failed`` otherwise;
+        spooled files that old which no pending meal is waiting for are deleted.
+
+        :param max_age_minutes: Age after which a pending job is considered lost
+        :return: Dict with the number of jobs requeued, meals failed and files deleted
+        """
+        from app.models.meal import Meal
+        from app.models.meal_counters import record_meal_touch
+        from app.models.shared_item import SharedItem
+
+        cutoff = time.time() - max_age_minutes * 60
+        # Newest job per meal: meal id -> (spooled file, manifest)
+        jobs = {}
+        for job_path in sorted(glob.glob(os.path.join(glob.escape(self.spool_dir), '*.job.json')), key=os.path.getmtime):
+            try:
+                with open(job_path) as job:
+                    manifest = json.load(job)
+                jobs[manifest['meal_id']] = (job_path[:-len('.job.json')], manifest)
+            except (OSError, ValueError, KeyError):
+                continue
+
+        totals = {'requeued': 0, 'failed': 0, 'deleted': 0}
+        stale_meals = Meal.query.filter(
+            Meal.image_status == 'pending',
+            Meal.updated_at < datetime.now(timezone.utc) - timedelta(minutes=max_age_minutes)
+        ).all()
+        requeue = []
+        for meal in stale_meals:
+            if meal.id in jobs and os.path.exists(jobs[meal.id][0]):
+                requeue.append(jobs[meal.id])
+            else:
+                meal.image_status = 'failed'
+                record_meal_touch(meal)
+                SharedItem.refresh_snapshots_for_meal(meal.id)
+                totals['failed'] += 1
+        db.session.commit()
+
+        futures = [
+            self.submit(manifest['meal_id'], spool_path, manifest['object_name'], manifest['content_type'])
+            for spool_path, manifest in requeue
+        ]
+        for future in futures:
+            if future is not None:
+                future.result()
+        totals['requeued'] = len(requeue)
+
+        pending_ids = set(db.session.execute(
+            db.select(Meal.id).where(Meal.image_status == 'pending', Meal.id.in_(list(jobs)))
+        ).scalars()) if jobs else set()
+        kept = {jobs[meal_id][0] for meal_id in pending_ids}
+        for path in glob.glob(os.path.join(glob.escape(self.spool_dir), '*')):
+            spool_path = path[:-len('.job.json')] if path.endswith('.job.json') else path
+            if spool_path in kept or not os.path.exists(path) or os.path.getmtime(path) >= cutoff:
+                continue
+            os.remove(path)
+            totals['deleted'] += 1
+        return totals
+
+
+def init_image_pipeline(app):
+    app.extensions['image_pipeline'] = ImagePipeline(
+        app,
+        spool_dir=app.config.get('IMAGE_SPOOL_DIR') or os.path.join(app.instance_path, 'image_spool'),
+        max_workers=app.config.get('IMAGE_WORKERS', 2),
+        thumbnail_sizes=app.config.get('IMAGE_THUMBNAIL_SIZES', (128, 512))
+    )
+
+
+def get_image_pipeline():
+    return current_app.extensions['image_pipeline']
@@ -0,0 +1,33 @@
+import os
+import shutil
+
+
+def save_file_locally(file, base_dir, object_name, base_url=None):
+    """
+    Store a file in a local directory, standing in for S3 in development and tests
+
+    :param file: File object to copy from
+    :param base_dir: Directory acting as the bucket
+    :param object_name: Object key, may contain '/'
+    :param base_url: URL prefix for the returned URL; a file:// URL is returned if None
+    :return: URL of the stored file
+    """
+    path = os.path.join(base_dir, *object_name.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as destination:
+        shutil.copyfileobj(file, destination)
+    if base_url:
+        return f"{base_url.rstrip('/')}/{object_name}"
+    return f"file://{os.path.abspath(path)}"
+
+
+def delete_file_locally(base_dir, object_name):
+    """
+    Remove a file stored by save_file_locally, if it exists
+
+    :param base_dir: Directory acting as the bucket
+    :param object_name: Object key, may contain '/'
+    """
+    path = os.path.join(base_dir, *object_name.split('/'))
+    if os.path.exists(path):
+        os.remove(path)
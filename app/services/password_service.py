@@ -0,0 +1,82 @@
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasherBusyError(Exception):
+    '''Raised when the hashing pool is saturated and the request should be retried later'''
+
+
+class PasswordHasher:
+    '''
+    Run password hashing on a bounded process pool
+
+    At most ``max_workers + max_pending`` hashes are in flight; any request
+    beyond that fails fast with PasswordHasherBusyError instead of queueing.
+    With ``max_workers=0`` hashing runs inline in the calling worker.
+    '''
+
+    def __init__(self, method='scrypt', max_workers=2, max_pending=8, timeout=10):
+        self.method = method
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending) if max_workers > 0 else None
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._method_prefix = None
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                atexit.register(self._executor.shutdown, wait=False, cancel_futures=True)
+            return self._executor
+
+    def _run(self, fn, *args):
+        if self._slots is None:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusyError('Password hashing queue is full')
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError as e:
+            future.cancel()
+            raise PasswordHasherBusyError('Password hashing timed out') from e
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    @property
+    def method_prefix(self):
+        '''Fully parameterised method string, e.g. ``scrypt:32768:8:1``'''
+        if self._method_prefix is None:
+            self._method_prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return self._method_prefix
+
+    def needs_rehash(self, password_hash):
+        '''True when a stored hash was made with a different method or cost'''
+        return password_hash.split('$', 1)[0] != self.method_prefix
+
+
+def init_password_hasher(app):
+    app.extensions['password_hasher'] = PasswordHasher(
+        method=app.config.get('PASSWORD_HASH_METHOD', 'scrypt'),
+        max_workers=app.config.get('PASSWORD_HASH_WORKERS', 2),
+        max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING', 8),
+        timeout=app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+    )
+
+
+def get_password_hasher():
+    return current_app.extensions['password_hasher']
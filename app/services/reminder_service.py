@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from flask import current_app
+from markupsafe import escape
+from sqlalchemy import and_, select
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.email_outbox import EmailOutbox
+from app.models.meal import Meal
+from app.models.meal_reminder import MealReminder
+from app.models.user import User
+from app.services.email_service import get_email_dispatcher
+
+REMINDER_SUBJECT = 'Your Upcoming Meal Reminders'
+
+
+def render_meal_reminder(meals, heading='Your upcoming meals for the next 24 hours:'):
+    '''Render the reminder email body for a user's meals'''
+    html_content = f'<h1>{heading}</h1>'
+    html_content += '<ul>'
+    for meal in meals:
+        html_content += f'<li><strong>{escape(meal.name)}</strong> at {meal.datetime.strftime("%Y-%m-%d %H:%M:%S")} UTC</li>'
+    html_content += '</ul>'
+    return html_content
+
+
+class ReminderScheduler:
+    '''
+    Queue reminder emails for every user's meals starting within ``lead_minutes``
+
+    Each tick walks the users with due, not yet reminded meals in batches of
+    ``user_batch_size``: one query finds the next batch of user ids, one
+    query loads all their due meals with the recipient's email, and one
+    transaction queues an email per user and logs every meal as reminded.
+    '''
+
+    def __init__(self, lead_minutes=60, user_batch_size=1000, retention_hours=24):
+        self.lead = timedelta(minutes=lead_minutes)
+        self.user_batch_size = user_batch_size
+        self.retention = timedelta(hours=retention_hours)
+
+    def _due_filters(self, start, end):
+        return (
+            Meal.datetime >= start,
+            Meal.datetime < end,
+            MealReminder.id.is_(None)
+        )
+
+    def _reminder_join(self):
+        return and_(MealReminder.meal_id == Meal.id, MealReminder.meal_datetime == Meal.datetime)
+
+    def _next_user_ids(self, start, end, after_user_id):
+        return db.session.execute(
+            select(Meal.user_id)
+            .outerjoin(MealReminder, self._reminder_join())
+            .where(*self._due_filters(start, end), Meal.user_id > after_user_id)
+            .group_by(Meal.user_id)
+            .order_by(Meal.user_id)
+            .limit(self.user_batch_size)
+        ).scalars().all()
+
+    def _due_meals(self, start, end, first_user_id, last_user_id):
+        return db.session.execute(
+            select(Meal.id, Meal.user_id, Meal.name, Meal.datetime, User.email)
+            .join(User, User.id == Meal.user_id)
+            .outerjoin(MealReminder, self._reminder_join())
+            .where(*self._due_filters(start, end), Meal.user_id.between(first_user_id, last_user_id))
+            .order_by(Meal.user_id, Meal.datetime, Meal.id)
+        ).all()
+
+    def run_once(self, now=None):
+        '''
+        Queue reminders for all meals due in the next ``lead_minutes``
+
+        :return: Dict with the number of users emailed and meals reminded
+        '''
+        now = now or datetime.now(timezone.utc)
+        start, end = now, now + self.lead
+        totals = {'users': 0, 'meals': 0}
+        last_user_id = 0
+        while True:
+            user_ids = self._next_user_ids(start, end, last_user_id)
+            if not user_ids:
+                break
+            last_user_id = user_ids[-1]
+            meals = self._due_meals(start, end, user_ids[0], last_user_id)
+            messages = []
+            for user_id, user_meals in groupby(meals, key=lambda meal: meal.user_id):
+                user_meals = list(user_meals)
+                messages.append({
+                    'to_email': user_meals[0].email,
+                    'subject': REMINDER_SUBJECT,
+                    'html_content': render_meal_reminder(user_meals, 'Your upcoming meals:')
+                })
+            try:
+                EmailOutbox.enqueue_many(messages)
+                MealReminder.record_many(meals)
+                db.session.commit()
+            except IntegrityError:
+                # Another scheduler reminded some of these meals first; it owns this batch
+                db.session.rollback()
+                current_app.logger.warning('Skipped reminder batch for users %s-%s', user_ids[0], last_user_id)
+                continue
+            totals['users'] += len(messages)
+            totals['meals'] += len(meals)
+
+        MealReminder.sweep(now - self.retention)
+        db.session.commit()
+        if totals['users']:
+            get_email_dispatcher().wake()
+        return totals
+
+
+def init_reminder_scheduler(app):
+    app.extensions['reminder_scheduler'] = ReminderScheduler(
+        lead_minutes=app.config.get('REMINDER_LEAD_MINUTES', 60),
+        user_batch_size=app.config.get('REMINDER_USER_BATCH_SIZE', 1000),
+        retention_hours=app.config.get('REMINDER_RETENTION_HOURS', 24)
+    )
+
+
+def get_reminder_scheduler():
+    return current_app.extensions['reminder_scheduler']
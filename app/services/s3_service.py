@@ -1,26 +1,201 @@
+import threading
+import time
 import boto3
-import os
-from botocore.exceptions import NoCredentialsError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import ClientError, NoCredentialsError
+from flask import current_app
 
-def upload_file_to_s3(file, bucket_name, object_name=None):
+
+class S3Service:
+    '''
+    Long-lived S3 client shared by every request and background worker
+
+    boto3 clients are thread-safe, so one client (and its connection pool) is
+    built lazily on first use and reused, instead of paying credential
+    resolution and a fresh pool on every upload. Large files are uploaded in
+    parallel multipart chunks above ``multipart_threshold``.
+    '''
+
+    def __init__(self, aws_access_key_id=None, aws_secret_access_key=None, region_name=None, endpoint_url=None,
+                 max_pool_connections=50, connect_timeout=5, read_timeout=60, max_attempts=3,
+                 multipart_threshold=8 * 1024 * 1024, multipart_chunksize=8 * 1024 * 1024, max_concurrency=4):
+        self.client_kwargs = {
+            'aws_access_key_id': aws_access_key_id,
+            'aws_secret_access_key': aws_secret_access_key,
+            'region_name': region_name,
+            'endpoint_url': endpoint_url,
+            'config': BotoConfig(
+                max_pool_connections=max_pool_connections,
+                connect_timeout=connect_timeout,
+                read_timeout=read_timeout,
+                retries={'max_attempts': max_attempts, 'mode': 'standard'}
+            )
+        }
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=max_concurrency,
+            use_threads=max_concurrency > 1
+        )
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.uploads = 0
+        self.failures = 0
+        self.bytes_uploaded = 0
+        self.upload_seconds = 0.0
+        self.max_upload_seconds = 0.0
+
+    @property
+    def client(self):
+        if self._client is None:
+            # Session creation is not thread-safe; build the client exactly once
+            with self._client_lock:
+                if self._client is None:
+                    self._client = boto3.session.Session().client('s3', **self.client_kwargs)
+        return self._client
+
+    def _record_upload(self, seconds, size, failed):
+        with self._stats_lock:
+            if failed:
+                self.failures += 1
+                return
+            self.uploads += 1
+            self.bytes_uploaded += size
+            self.upload_seconds += seconds
+            self.max_upload_seconds = max(self.max_upload_seconds, seconds)
+
+    def upload_fileobj(self, file, bucket_name, object_name, content_type=None):
+        """
+        Stream a file object to S3, switching to multipart uploads for large files
+
+        :return: URL of the object, or None without credentials
+        """
+        extra_args = {'ContentType': content_type} if content_type else None
+        transferred = []
+        started = time.perf_counter()
+        try:
+            self.client.upload_fileobj(
+                file, bucket_name, object_name,
+                ExtraArgs=extra_args,
+                Config=self.transfer_config,
+                Callback=transferred.append
+            )
+        except NoCredentialsError:
+            self._record_upload(time.perf_counter() - started, 0, failed=True)
+            return None
+        except Exception:
+            self._record_upload(time.perf_counter() - started, 0, failed=True)
+            raise
+        self._record_upload(time.perf_counter() - started, sum(transferred), failed=False)
+        return self.object_url(bucket_name, object_name)
+
+    def object_url(self, bucket_name, object_name):
+        '''Public URL of an object; path-style under the custom endpoint (MinIO, LocalStack) if one is set'''
+        endpoint_url = self.client_kwargs['endpoint_url']
+        if endpoint_url:
+            return f"{endpoint_url.rstrip('/')}/{bucket_name}/{object_name}"
+        return f"https://{bucket_name}.s3.amazonaws.com/{object_name}"
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'uploads': self.uploads,
+                'failures': self.failures,
+                'bytes_uploaded': self.bytes_uploaded,
+                'upload_seconds_total': round(self.upload_seconds, 4),
+                'upload_seconds_avg': round(self.upload_seconds / self.uploads, 4) if self.uploads else 0,
+                'upload_seconds_max': round(self.max_upload_seconds, 4)
+            }
+
+
+def init_s3_service(app):
+    app.extensions['s3_service'] = S3Service(
+        aws_access_key_id=app.config.get('AWS_ACCESS_KEY_ID'),
+        aws_secret_access_key=app.config.get('AWS_SECRET_ACCESS_KEY'),
+        region_name=app.config.get('AWS_REGION'),
+        endpoint_url=app.config.get('S3_ENDPOINT_URL'),
+        max_pool_connections=app.config.get('S3_MAX_POOL_CONNECTIONS', 50),
+        connect_timeout=app.config.get('S3_CONNECT_TIMEOUT', 5),
+        read_timeout=app.config.get('S3_READ_TIMEOUT', 60),
+        max_attempts=app.config.get('S3_MAX_ATTEMPTS', 3),
+        multipart_threshold=app.config.get('S3_MULTIPART_THRESHOLD', 8 * 1024 * 1024),
+        multipart_chunksize=app.config.get('S3_MULTIPART_CHUNKSIZE', 8 * 1024 * 1024),
+        max_concurrency=app.config.get('S3_MAX_CONCURRENCY', 4)
+    )
+
+
+def get_s3_service():
+    return current_app.extensions['s3_service']
+
+
+def object_url(bucket_name, object_name):
+    '''Public URL of an object in a bucket, honouring S3_ENDPOINT_URL'''
+    return get_s3_service().object_url(bucket_name, object_name)
+
+
+def upload_file_to_s3(file, bucket_name, object_name=None, content_type=None):
     """
     Upload a file to an S3 bucket
 
     :param file: File to upload
     :param bucket_name: Bucket to upload to
     :param object_name: S3 object name. If not specified then file_name is used
-    :return: True if file was uploaded, else False
+    :param content_type: Optional Content-Type stored with the object
+    :return: URL of the uploaded object, or None without credentials
     """
     if object_name is None:
         object_name = file.filename
+    return get_s3_service().upload_fileobj(file, bucket_name, object_name, content_type)
 
-    s3_client = boto3.client(
-        's3',
-        aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-        aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY')
-    )
+
+def generate_presigned_upload(bucket_name, object_name, content_type, max_size, expires_in=300):
+    """
+    Create a pre-signed POST policy so a client can upload straight to S3
+
+    Unlike a pre-signed PUT, the policy lets S3 itself reject bodies that are
+    too large or carry a different Content-Type.
+
+    :param bucket_name: Bucket to upload to
+    :param object_name: Exact key the client must upload to
+    :param content_type: Content-Type the client must send
+    :param max_size: Maximum object size in bytes
+    :param expires_in: Seconds the policy stays valid
+    :return: Dict with the form 'url' and the 'fields' to post alongside the file, or None without credentials
+    """
     try:
-        s3_client.upload_fileobj(file, bucket_name, object_name)
-        return f"https://{bucket_name}.s3.amazonaws.com/{object_name}"
+        return get_s3_service().client.generate_presigned_post(
+            bucket_name,
+            object_name,
+            Fields={'Content-Type': content_type},
+            Conditions=[
+                {'Content-Type': content_type},
+                ['content-length-range', 1, max_size]
+            ],
+            ExpiresIn=expires_in
+        )
     except NoCredentialsError:
         return None
+
+
+def get_object_metadata(bucket_name, object_name):
+    """
+    Look up an uploaded object without downloading it
+
+    :param bucket_name: Bucket holding the object
+    :param object_name: Key of the object
+    :return: Dict with 'size' and 'content_type', or None if the object does not exist
+    """
+    try:
+        response = get_s3_service().client.head_object(Bucket=bucket_name, Key=object_name)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+    return {'size': response['ContentLength'], 'content_type': response.get('ContentType')}
+
+
+def delete_object(bucket_name, object_name):
+    '''Remove an object, e.g. a direct upload that failed validation'''
+    get_s3_service().client.delete_object(Bucket=bucket_name, Key=object_name)
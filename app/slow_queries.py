@@ -0,0 +1,210 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from flask import has_request_context, request
+from sqlalchemy import event
+from app.query_stats import fingerprint
+
+# Statements worth an EXPLAIN; plans of plain INSERTs say nothing useful
+_EXPLAINABLE = ('select', 'with', 'update', 'delete')
+
+
+def parameters_shape(parameters, executemany=False):
+    '''Describe bound parameters by type only, so no user data reaches the log'''
+    if executemany:
+        rows = list(parameters or ())
+        return {'rows': len(rows), 'shape': parameters_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+
+def explain(connection, cursor, statement, parameters):
+    '''
+    EXPLAIN a statement on the connection that just ran it
+
+    Goes through a fresh DBAPI cursor so the engine events (and the query
+    counters) do not see it. Outside SQLite the EXPLAIN runs in a savepoint,
+    so a failure cannot abort the caller's transaction.
+    '''
+    dialect = connection.dialect.name
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect == 'sqlite' else 'EXPLAIN '
+    explain_cursor = cursor.connection.cursor()
+    savepoint = dialect != 'sqlite'
+    try:
+        if savepoint:
+            explain_cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            explain_cursor.execute(prefix + statement, parameters)
+            plan = [' '.join(str(column) for column in row) for row in explain_cursor.fetchall()]
+        except Exception as e:
+            if savepoint:
+                explain_cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            return [f'EXPLAIN failed: {e}']
+        if savepoint:
+            explain_cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+        return plan
+    finally:
+        explain_cursor.close()
+
+
+class SlowQueryLog:
+    '''
+    Log statements slower than a threshold, with their plan, as JSON lines
+
+    The plan of a given statement fingerprint is captured at most once per
+    ``explain_interval`` seconds, so a hot slow query does not double its
+    own cost.
+    '''
+
+    def __init__(self, path, threshold_ms=100, explain=True, explain_interval=300,
+                 max_bytes=10 * 1024 * 1024, backup_count=5):
+        self.path = path
+        self.threshold = threshold_ms / 1000
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._explained_at = {}
+        self._lock = threading.Lock()
+        self._logger = None
+        self._logger_pid = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    @property
+    def logger(self):
+        '''
+        Logger writing to this process's own file
+
+        Every worker process rotates its own ``<name>.<pid><ext>`` file; one
+        shared file would be rotated by each process independently. Opened
+        lazily so a process forked after create_app gets its own file.
+        '''
+        pid = os.getpid()
+        if self._logger_pid != pid:
+            path = process_log_path(self.path, pid)
+            logger = logging.getLogger(f'{__name__}.{os.path.abspath(path)}')
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            if not logger.handlers:
+                handler = RotatingFileHandler(path, maxBytes=self.max_bytes, backupCount=self.backup_count)
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger.addHandler(handler)
+            self._logger, self._logger_pid = logger, pid
+        return self._logger
+
+    def listen(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.slow_query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, 'slow_query_started', None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        if duration >= self.threshold:
+            self.record(conn, cursor, statement, parameters, executemany, duration)
+
+    def _should_explain(self, statement, key):
+        if not self.explain or not statement.lstrip().lower().startswith(_EXPLAINABLE):
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._explained_at.get(key, -self.explain_interval) < self.explain_interval:
+                return False
+            self._explained_at[key] = now
+            return True
+
+    def record(self, conn, cursor, statement, parameters, executemany, duration):
+        key = fingerprint(statement)
+        entry = {
+            'time': datetime.now(timezone.utc).isoformat(),
+            'duration_ms': round(duration * 1000, 3),
+            'route': request.url_rule.rule if has_request_context() and request.url_rule else None,
+            'method': request.method if has_request_context() else None,
+            'fingerprint': key,
+            'statement': statement,
+            'parameters': parameters_shape(parameters, executemany),
+        }
+        if self._should_explain(statement, key):
+            explain_parameters = parameters[0] if executemany else parameters
+            try:
+                entry['plan'] = explain(conn, cursor, statement, explain_parameters)
+            except Exception as e:
+                entry['plan'] = [f'EXPLAIN failed: {e}']
+        self.logger.info(json.dumps(entry, default=str))
+
+
+def process_log_path(path, pid):
+    base, extension = os.path.splitext(path)
+    return f'{base}.{pid}{extension}'
+
+
+def read_slow_queries(path):
+    '''Entries of every process's log and rotated backups, oldest file first'''
+    base, extension = os.path.splitext(path)
+    pattern = f'{glob.escape(base)}.*{glob.escape(extension)}'
+    paths = set(glob.glob(pattern)) | set(glob.glob(f'{pattern}.*'))
+    for candidate in sorted(paths, key=lambda candidate: os.path.getmtime(candidate)):
+        with open(candidate) as source:
+            for line in source:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def summarize_slow_queries(entries):
+    '''
+    Group entries by fingerprint
+
+    :return: List of dicts with count, total/mean/max duration, routes and the latest plan
+    '''
+    groups = defaultdict(lambda: {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'routes': set(), 'plan': None})
+    for entry in entries:
+        group = groups[entry['fingerprint']]
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        group['max_ms'] = max(group['max_ms'], entry['duration_ms'])
+        if entry.get('route'):
+            group['routes'].add(f"{entry.get('method')} {entry['route']}")
+        if entry.get('plan'):
+            group['plan'] = entry['plan']
+    return [
+        dict(group, fingerprint=key, mean_ms=group['total_ms'] / group['count'], routes=sorted(group['routes']))
+        for key, group in groups.items()
+    ]
+
+
+def slow_query_log_path(app):
+    return app.config.get('SLOW_QUERY_LOG_FILE') or os.path.join(app.instance_path, 'slow_queries.log')
+
+
+def init_slow_query_log(app):
+    '''Log statements slower than SLOW_QUERY_THRESHOLD_MS on every engine of the app'''
+    if not app.config.get('SLOW_QUERY_LOG_ENABLED', True):
+        return
+    from app import db
+
+    log = SlowQueryLog(
+        slow_query_log_path(app),
+        threshold_ms=app.config.get('SLOW_QUERY_THRESHOLD_MS', 100),
+        explain=app.config.get('SLOW_QUERY_EXPLAIN', True),
+        explain_interval=app.config.get('SLOW_QUERY_EXPLAIN_INTERVAL', 300),
+        max_bytes=app.config.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024),
+        backup_count=app.config.get('SLOW_QUERY_LOG_BACKUPS', 5)
+    )
+    with app.app_context():
+        for engine in db.engines.values():
+            log.listen(engine)
+    app.extensions['slow_query_log'] = log
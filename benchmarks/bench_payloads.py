@@ -0,0 +1,112 @@
+'''
+Compare response size and encode time of JSON, MessagePack, gzip and brotli
+for the largest read endpoints.
+
+Usage: python benchmarks/bench_payloads.py [--meals N] [--repeat N]
+'''
+import argparse
+import gzip
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import brotli
+import jwt
+import msgpack
+from app import create_app, db, limiter
+from app.models.meal import Meal
+from app.models.shared_item import SharedItem
+from app.models.user import User
+from app.models.meal_counters import record_meal_create
+from app.models.feed_entry import FeedEntry
+
+CATEGORIES = ('breakfast', 'lunch', 'dinner', 'snack')
+START = datetime(2025, 1, 1, 8)
+
+ENDPOINTS = (
+    ('meals page', '/meals?per_page=100'),
+    ('monthly report', f'/meals/reports?period=monthly&date={START.date().isoformat()}&include_meals=true'),
+    ('timeseries', f'/meals/timeseries?from={START.date().isoformat()}&to={(START.date() + timedelta(days=89)).isoformat()}'),
+    ('feed', '/social/feed?limit=50'),
+)
+
+
+def seed(meals_per_user):
+    author = User(username='author', email='author@example.com')
+    reader = User(username='reader', email='reader@example.com')
+    author.password_hash = reader.password_hash = 'x'
+    db.session.add_all([author, reader])
+    db.session.flush()
+    meals = [Meal(
+        name=f'Meal {i}', description='Benchmark meal with a realistic description',
+        datetime=START + timedelta(hours=6 * i), is_on_diet=i % 4 != 3, user_id=author.id,
+        category=CATEGORIES[i % 4], calories=300 + i % 500, protein_grams=20.5,
+        carbohydrates_grams=45.0, fats_grams=12.25
+    ) for i in range(meals_per_user)]
+    db.session.add_all(meals)
+    db.session.flush()
+    for meal in meals:
+        record_meal_create(meal)
+    reader.followed.append(author)
+    for start in range(0, min(len(meals), 500), 10):
+        item = SharedItem(user_id=author.id, title=f'Day {start}', is_public=True)
+        item.meals.extend(meals[start:start + 10])
+        item.take_snapshot(meals[start:start + 10])
+        db.session.add(item)
+        db.session.flush()
+        FeedEntry.fan_out(item)
+    db.session.commit()
+    return author, reader
+
+
+def auth_header(app, user):
+    token = jwt.encode({'user_id': user.id, 'exp': datetime.now(timezone.utc) + timedelta(hours=1)},
+                       app.config['SECRET_KEY'], algorithm='HS256')
+    return {'Authorization': f'Bearer {token}'}
+
+
+def measure(fn, repeat):
+    return timeit.timeit(fn, number=repeat) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--meals', type=int, default=1000, help='Meals for the benchmark user')
+    parser.add_argument('--repeat', type=int, default=200, help='Iterations per measurement')
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    limiter.enabled = False
+    with app.app_context():
+        db.create_all()
+        author, reader = seed(args.meals)
+        headers = {'author': auth_header(app, author), 'reader': auth_header(app, reader)}
+        client = app.test_client()
+
+        print(f'{"endpoint":<16} {"format":<14} {"bytes":>9} {"ratio":>6} {"encode (us)":>12}')
+        for name, url in ENDPOINTS:
+            user = 'reader' if url.startswith('/social') else 'author'
+            response = client.get(url, headers=headers[user])
+            assert response.status_code == 200, (url, response.status_code)
+            obj = response.get_json()
+            json_body = app.json.dumps(obj).encode()
+            msgpack_body = msgpack.packb(obj, use_bin_type=True)
+            variants = (
+                ('json', json_body, lambda: app.json.dumps(obj).encode()),
+                ('json+gzip', gzip.compress(json_body, 6), lambda: gzip.compress(app.json.dumps(obj).encode(), 6)),
+                ('json+br', brotli.compress(json_body, quality=4),
+                 lambda: brotli.compress(app.json.dumps(obj).encode(), quality=4)),
+                ('msgpack', msgpack_body, lambda: msgpack.packb(obj, use_bin_type=True)),
+                ('msgpack+br', brotli.compress(msgpack_body, quality=4),
+                 lambda: brotli.compress(msgpack.packb(obj, use_bin_type=True), quality=4)),
+            )
+            for label, body, encode in variants:
+                print(f'{name:<16} {label:<14} {len(body):>9} {len(body) / len(json_body):>6.2f} '
+                      f'{measure(encode, args.repeat):>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
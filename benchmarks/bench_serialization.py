@@ -0,0 +1,68 @@
+'''
+Compare the ORM ``Meal.to_dict()`` + default JSON path with the column-tuple
+``RowSerializer`` + orjson path used by the list endpoints.
+
+Usage: python benchmarks/bench_serialization.py [--repeat N]
+'''
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider
+from app import create_app, db
+from app.json_provider import OrjsonProvider
+from app.models.meal import Meal
+from app.models.user import User
+from app.serializers import fetch_meal_dicts, select_meal_rows
+
+SIZES = (10, 100, 1000)
+
+
+def seed(rows):
+    user = User(username='bench', email='bench@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    start = datetime(2025, 1, 1, 8)
+    db.session.add_all(Meal(
+        name=f'Meal {i}', description='Benchmark meal', datetime=start + timedelta(hours=6 * i),
+        is_on_diet=i % 4 != 3, user_id=user.id, category='lunch', calories=400 + i % 300,
+        protein_grams=20.5, carbohydrates_grams=45.0, fats_grams=12.25
+    ) for i in range(rows))
+    db.session.commit()
+    return user.id
+
+
+def orm_path(app, user_id, limit):
+    meals = Meal.query.filter_by(user_id=user_id).order_by(Meal.datetime.desc()).limit(limit).all()
+    return DefaultJSONProvider(app).response({'meals': [meal.to_dict() for meal in meals]}).get_data()
+
+
+def tuple_path(app, user_id, limit):
+    meals = fetch_meal_dicts(select_meal_rows(Meal.user_id == user_id).order_by(Meal.datetime.desc()).limit(limit))
+    return OrjsonProvider(app).response({'meals': meals}).get_data()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=200, help='Iterations per measurement')
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        user_id = seed(max(SIZES))
+
+        print(f'{"rows":>6} {"to_dict (ms)":>14} {"tuples (ms)":>12} {"speedup":>8}')
+        for size in SIZES:
+            orm = timeit.timeit(lambda: orm_path(app, user_id, size), number=args.repeat) / args.repeat
+            fast = timeit.timeit(lambda: tuple_path(app, user_id, size), number=args.repeat) / args.repeat
+            db.session.remove()
+            print(f'{size:>6} {orm * 1000:>14.3f} {fast * 1000:>12.3f} {orm / fast:>7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+'''
+Diff two benchmarks/loadtest.py reports route by route.
+
+Latency or throughput changes beyond --threshold percent are flagged; with
+--fail-on-regression the exit status is 1 when any route got slower.
+
+Usage: python benchmarks/compare.py base.json new.json [--threshold 10] [--fail-on-regression]
+'''
+import argparse
+import json
+import sys
+
+# (metric, True when a higher value is better)
+METRICS = (
+    ('throughput_rps', True),
+    ('p50_ms', False),
+    ('p95_ms', False),
+    ('p99_ms', False),
+)
+
+
+def change(base, new):
+    if not base:
+        return 0.0
+    return (new - base) / base * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Percent change considered significant')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    with open(args.base) as base_file, open(args.new) as new_file:
+        base, new = json.load(base_file), json.load(new_file)
+
+    print(f'base {base["meta"].get("commit")}  new {new["meta"].get("commit")}')
+    for key in ('users', 'meals_per_user', 'concurrency', 'target'):
+        if base['meta'].get(key) != new['meta'].get(key):
+            print(f'warning: {key} differs ({base["meta"].get(key)} vs {new["meta"].get(key)})')
+
+    regressions = 0
+    print(f'{"route":<26} {"metric":<15} {"base":>10} {"new":>10} {"change":>9}')
+    for route in sorted(set(base['routes']) | set(new['routes'])):
+        if route not in base['routes'] or route not in new['routes']:
+            print(f'{route:<26} only in {"new" if route in new["routes"] else "base"}')
+            continue
+        for metric, higher_is_better in METRICS:
+            before = base['routes'][route][metric]
+            after = new['routes'][route][metric]
+            percent = change(before, after)
+            worse = percent < -args.threshold if higher_is_better else percent > args.threshold
+            better = percent > args.threshold if higher_is_better else percent < -args.threshold
+            flag = ' worse' if worse else ' better' if better else ''
+            regressions += worse
+            print(f'{route:<26} {metric:<15} {before:>10.2f} {after:>10.2f} {percent:>+8.1f}%{flag}')
+
+    if args.fail_on_regression and regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
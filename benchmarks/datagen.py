@@ -0,0 +1,202 @@
+'''
+Seeded synthetic dataset for the benchmarks.
+
+Generates N users with M meals each (four meals a day at jittered, realistic
+times with normally distributed nutrition), a power-law follower graph in which
+a few users have most of the followers, and shared items with their feed
+entries, stats, rollups and snapshots already built. The same arguments
+always produce the same rows, and user ids run from 1 to N on an empty
+database.
+
+Usage: python benchmarks/datagen.py --database-url sqlite:///bench.db [--users N] [--meals M] [--seed S]
+'''
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+
+from app import db
+from app.models.feed_entry import FeedEntry
+from app.models.meal import Meal
+from app.models.meal_daily_rollup import MealDailyRollup
+from app.models.shared_item import SharedItem, shared_item_meals
+from app.models.user import User, followers
+from app.models.user_meal_stats import UserMealStats
+from app.services.password_service import get_password_hasher
+
+PASSWORD = 'Benchmark1'
+END_DATE = datetime(2025, 3, 31)
+CHUNK_SIZE = 5000
+
+# (category, mean hour, hour spread, mean calories, on-diet probability)
+MEAL_SLOTS = (
+    ('breakfast', 7.5, 1.0, 420, 0.85),
+    ('lunch', 12.75, 0.75, 700, 0.75),
+    ('snack', 16.0, 1.5, 250, 0.55),
+    ('dinner', 19.5, 1.0, 750, 0.65),
+)
+MEAL_NAMES = {
+    'breakfast': ('Oatmeal with berries', 'Scrambled eggs', 'Greek yogurt', 'Avocado toast'),
+    'lunch': ('Chicken salad', 'Rice and beans', 'Tuna sandwich', 'Vegetable soup'),
+    'snack': ('Apple', 'Protein bar', 'Mixed nuts', 'Cookies'),
+    'dinner': ('Grilled salmon', 'Pasta bolognese', 'Stir-fried tofu', 'Pizza'),
+}
+
+
+def _insert_chunks(table, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(insert(table), rows[start:start + CHUNK_SIZE])
+
+
+def generate_users(rng, users):
+    password_hash = get_password_hasher().hash(PASSWORD)
+    rows = [{'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': password_hash}
+            for i in range(1, users + 1)]
+    _insert_chunks(User.__table__, rows)
+    return list(range(1, users + 1))
+
+
+def generate_meals(rng, user_ids, meals_per_user):
+    '''Four meals a day on consecutive days ending at END_DATE, with jittered times and nutrition'''
+    days = -(-meals_per_user // len(MEAL_SLOTS))
+    start = END_DATE - timedelta(days=days - 1)
+    rows = []
+    for user_id in user_ids:
+        for index in range(meals_per_user):
+            day, slot = divmod(index, len(MEAL_SLOTS))
+            category, hour, spread, calories, on_diet = MEAL_SLOTS[slot]
+            offset = min(max(rng.gauss(hour, spread), 0), 23.9)
+            meal_calories = max(int(rng.gauss(calories, calories * 0.25)), 50)
+            rows.append({
+                'user_id': user_id,
+                'name': rng.choice(MEAL_NAMES[category]),
+                'description': f'{category.capitalize()} logged by user {user_id}',
+                'datetime': start + timedelta(days=day, hours=offset),
+                'is_on_diet': rng.random() < on_diet,
+                'category': category,
+                'calories': meal_calories,
+                'protein_grams': round(max(rng.gauss(meal_calories * 0.05, 5), 0), 1),
+                'carbohydrates_grams': round(max(rng.gauss(meal_calories * 0.12, 10), 0), 1),
+                'fats_grams': round(max(rng.gauss(meal_calories * 0.035, 4), 0), 1),
+            })
+    _insert_chunks(Meal.__table__, rows)
+    return len(rows)
+
+
+def generate_followers(rng, user_ids, mean_following=20, alpha=1.1):
+    '''
+    Power-law follower graph
+
+    Popularity follows Zipf's law over a random ranking of users, so a handful
+    of users collect most followers; how many users each one follows is
+    Pareto distributed around ``mean_following``.
+    '''
+    ranking = user_ids[:]
+    rng.shuffle(ranking)
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, len(ranking) + 1):
+        total += 1 / rank ** alpha
+        cum_weights.append(total)
+
+    rows = []
+    for user_id in user_ids:
+        wanted = min(int(rng.paretovariate(1.5) * mean_following / 3), len(user_ids) - 1)
+        followed = set()
+        for followed_id in rng.choices(ranking, cum_weights=cum_weights, k=wanted * 2):
+            if followed_id != user_id:
+                followed.add(followed_id)
+            if len(followed) >= wanted:
+                break
+        rows.extend({'follower_id': user_id, 'followed_id': followed_id} for followed_id in sorted(followed))
+    _insert_chunks(followers, rows)
+    return len(rows)
+
+
+def generate_shared_items(rng, user_ids, meals_per_user, items_per_user=3):
+    '''Shared items of one to five consecutive meals; meal ids are contiguous per user on a fresh database'''
+    item_rows = []
+    link_rows = []
+    item_id = 0
+    for user_id in user_ids:
+        first_meal_id = (user_id - 1) * meals_per_user + 1
+        for _ in range(rng.randint(0, items_per_user * 2)):
+            size = rng.randint(1, min(5, meals_per_user))
+            start = rng.randint(0, meals_per_user - size)
+            item_id += 1
+            item_rows.append({
+                'id': item_id,
+                'user_id': user_id,
+                'title': f'Shared by user {user_id}',
+                'description': 'Benchmark shared meals',
+                'is_public': rng.random() < 0.5,
+                'created_at': END_DATE - timedelta(minutes=rng.randint(0, 90 * 24 * 60)),
+            })
+            link_rows.extend({'shared_item_id': item_id, 'meal_id': first_meal_id + offset}
+                             for offset in range(start, start + size))
+    _insert_chunks(SharedItem.__table__, item_rows)
+    _insert_chunks(shared_item_meals, link_rows)
+
+    last_id = 0
+    while True:
+        items = SharedItem.query.filter(SharedItem.id > last_id).order_by(SharedItem.id).limit(500).all()
+        if not items:
+            break
+        SharedItem.refresh_snapshots(items)
+        db.session.commit()
+        last_id = items[-1].id
+    return len(item_rows)
+
+
+def generate(users=200, meals_per_user=100, seed=42):
+    '''
+    Fill the current app's database; it must already have the schema and no rows
+
+    :return: Dict with the number of rows generated per kind
+    '''
+    rng = random.Random(seed)
+    user_ids = generate_users(rng, users)
+    counts = {
+        'users': len(user_ids),
+        'meals': generate_meals(rng, user_ids, meals_per_user),
+        'followers': generate_followers(rng, user_ids),
+        'shared_items': generate_shared_items(rng, user_ids, meals_per_user),
+    }
+    counts['feed_entries'] = FeedEntry.rebuild()
+    UserMealStats.rebuild()
+    MealDailyRollup.rebuild()
+    db.session.commit()
+    return counts
+
+
+def create_benchmark_app(database_url):
+    '''Testing configuration (inline workers, no external services) on the given database'''
+    from app import create_app
+    from app.config import config
+
+    config['benchmark'] = type('BenchmarkConfig', (config['testing'],), {'SQLALCHEMY_DATABASE_URI': database_url})
+    return create_app('benchmark')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', required=True, help='Empty database to fill; tables are created')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--meals', type=int, default=100, help='Meals per user')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    app = create_benchmark_app(args.database_url)
+    with app.app_context():
+        db.create_all()
+        counts = generate(args.users, args.meals, args.seed)
+    print(', '.join(f'{count} {kind}' for kind, count in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
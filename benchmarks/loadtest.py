@@ -0,0 +1,383 @@
+'''
+Drive the API at a fixed concurrency and report throughput and p50/p95/p99
+latency per scenario.
+
+Every route gets its own scenario: reads first, on the generated dataset,
+then writes (single, bulk, update, delete, share) and login, then a mixed
+workload interleaving reads and writes so counter and feed fan-out costs
+show up under contention. Updates and shares touch the first half of each
+user's meals and deletes the second half, so no scenario runs into meals
+another one removed.
+
+By default a fresh SQLite database is generated with benchmarks/datagen.py
+and requests go through the Flask test client in-process. With --url the
+requests go to a running server instead; fill its database beforehand with
+datagen.py (same --users/--meals/--seed) and start it with
+RATELIMIT_ENABLED=false and the same SECRET_KEY. The write scenarios change
+the data, so regenerate the database before every run.
+
+Write --output results.json on two commits and diff them with
+benchmarks/compare.py.
+
+Usage: python benchmarks/loadtest.py [--users N] [--meals M] [--requests R] [--concurrency C]
+                                     [--routes get_meals,mixed] [--url http://127.0.0.1:5000]
+                                     [--output results.json]
+'''
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from benchmarks.datagen import END_DATE, MEAL_NAMES, MEAL_SLOTS, PASSWORD, create_benchmark_app, generate
+
+
+def _random_day(rng, context):
+    return (END_DATE - timedelta(days=rng.randrange(context['days']))).date().isoformat()
+
+
+def _random_user(rng, context):
+    return rng.randint(1, context['users'])
+
+
+def _user_meal(rng, context, user_id):
+    '''A meal id from the first half of the user's meals, which nothing deletes'''
+    return (user_id - 1) * context['meals'] + 1 + rng.randrange(max(context['meals'] // 2, 1))
+
+
+def _meal_body(rng, context):
+    category = rng.choice(MEAL_SLOTS)[0]
+    calories = rng.randint(100, 900)
+    return {
+        'name': rng.choice(MEAL_NAMES[category]),
+        'description': f'{category.capitalize()} logged by the load test',
+        'datetime': f'{_random_day(rng, context)}T{rng.randint(6, 22):02d}:{rng.randint(0, 59):02d}:00',
+        'is_on_diet': rng.random() < 0.7,
+        'category': category,
+        'calories': calories,
+        'protein_grams': round(calories * 0.05, 1),
+        'carbohydrates_grams': round(calories * 0.12, 1),
+        'fats_grams': round(calories * 0.035, 1),
+    }
+
+
+def _get(path):
+    '''Build a GET of ``path`` by a random user'''
+    return lambda rng, context: (_random_user(rng, context), 'GET', path(rng, context), None)
+
+
+def _get_meal(rng, context):
+    user_id = _random_user(rng, context)
+    return user_id, 'GET', f'/meals/{_user_meal(rng, context, user_id)}', None
+
+
+def _get_shared_item(rng, context):
+    user_id, shared_item_id = rng.choice(context['shared_items'])
+    return user_id, 'GET', f'/social/share/{shared_item_id}', None
+
+
+def _create_meal(rng, context):
+    return _random_user(rng, context), 'POST', '/meals', _meal_body(rng, context)
+
+
+def _bulk_create_meals(rng, context):
+    return _random_user(rng, context), 'POST', '/meals/bulk', [_meal_body(rng, context) for _ in range(50)]
+
+
+def _update_meal(rng, context):
+    user_id = _random_user(rng, context)
+    body = {'calories': rng.randint(100, 900), 'is_on_diet': rng.random() < 0.7}
+    return user_id, 'PUT', f'/meals/{_user_meal(rng, context, user_id)}', body
+
+
+def _delete_meal(rng, context):
+    user_id, meal_id = context['deletable'].pop()
+    return user_id, 'DELETE', f'/meals/{meal_id}', None
+
+
+def _share_meals(rng, context):
+    user_id = _random_user(rng, context)
+    half = max(context['meals'] // 2, 1)
+    size = rng.randint(1, min(3, half))
+    first = (user_id - 1) * context['meals'] + 1 + rng.randrange(half - size + 1)
+    body = {'title': 'Load test share', 'meal_ids': list(range(first, first + size)), 'is_public': rng.random() < 0.5}
+    return user_id, 'POST', '/social/share', body
+
+
+def _login(rng, context):
+    user_id = _random_user(rng, context)
+    return None, 'POST', '/auth/login', {'email': f'user{user_id}@example.com', 'password': PASSWORD}
+
+
+def _mixed(rng, context):
+    name = rng.choices(MIXED_WORKLOAD_ROUTES, weights=MIXED_WORKLOAD_WEIGHTS)[0]
+    return SCENARIOS[name](rng, context)
+
+
+# (name, builder); a builder returns (user id or None, method, path, JSON body or None)
+ROUTES = (
+    ('get_meals', _get(lambda rng, context: '/meals?per_page=20')),
+    ('get_meals_filtered', _get(lambda rng, context: f'/meals?per_page=50&on_diet=true&start_date={_random_day(rng, context)}')),
+    ('get_meal', _get_meal),
+    ('get_user_stats', _get(lambda rng, context: '/meals/stats')),
+    ('get_best_diet_sequence', _get(lambda rng, context: '/meals/best-sequence?top=5')),
+    ('get_meal_reports_daily', _get(lambda rng, context: f'/meals/reports?period=daily&date={_random_day(rng, context)}')),
+    ('get_meal_reports_monthly', _get(lambda rng, context: f'/meals/reports?period=monthly&date={_random_day(rng, context)}&group_by=category')),
+    ('get_meal_timeseries', _get(lambda rng, context: f'/meals/timeseries?bucket=week&to={END_DATE.date().isoformat()}')),
+    ('export_meals', _get(lambda rng, context: '/meals/export?format=ndjson')),
+    ('get_feed', _get(lambda rng, context: '/social/feed?limit=20')),
+    ('get_shared_item', _get_shared_item),
+    ('create_meal', _create_meal),
+    ('bulk_create_meals', _bulk_create_meals),
+    ('update_meal', _update_meal),
+    ('delete_meal', _delete_meal),
+    ('share_meals', _share_meals),
+    ('login', _login),
+    ('mixed', _mixed),
+)
+SCENARIOS = dict(ROUTES)
+
+# Share of each route in the mixed scenario, roughly a day of app traffic
+MIXED_WORKLOAD = (
+    ('get_meals', 30),
+    ('get_meal', 15),
+    ('get_feed', 15),
+    ('get_user_stats', 10),
+    ('get_shared_item', 5),
+    ('create_meal', 12),
+    ('update_meal', 6),
+    ('delete_meal', 3),
+    ('share_meals', 2),
+    ('get_meal_reports_daily', 2),
+)
+MIXED_WORKLOAD_ROUTES = tuple(name for name, _ in MIXED_WORKLOAD)
+MIXED_WORKLOAD_WEIGHTS = tuple(weight for _, weight in MIXED_WORKLOAD)
+
+
+def make_tokens(secret_key, users):
+    expires = datetime.now(timezone.utc) + timedelta(hours=6)
+    return {
+        user_id: {'Authorization': 'Bearer ' + jwt.encode({'user_id': user_id, 'exp': expires}, secret_key, algorithm='HS256')}
+        for user_id in range(1, users + 1)
+    }
+
+
+class TestClientTarget:
+    '''Send requests through per-thread Flask test clients'''
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, headers, body=None):
+        ''':return: Tuple of the status code and the decoded JSON body, if any'''
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, headers=headers, json=body)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HTTPTarget:
+    '''Send requests to a running server over one keep-alive connection per thread'''
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self._local = threading.local()
+
+    def request(self, method, path, headers, body=None):
+        ''':return: Tuple of the status code (0 on connection errors) and the decoded JSON body, if any'''
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers = dict(headers, **{'Content-Type': 'application/json'})
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            content = response.read()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            self._local.connection = None
+            return 0, None
+        try:
+            return response.status, json.loads(content)
+        except ValueError:
+            return response.status, None
+
+
+def discover_shared_items(target, tokens, rng, sample=50):
+    '''
+    (user id, shared item id) pairs the user may view, read from the feeds of
+    a sample of users
+
+    datagen does not report who follows whom, so the feed is the cheapest
+    source of items that are visible without being public.
+    '''
+    pairs = []
+    for user_id in rng.sample(sorted(tokens), min(sample, len(tokens))):
+        status, content = target.request('GET', '/social/feed?limit=20', tokens[user_id])
+        if status == 200 and content:
+            pairs.extend((user_id, item['id']) for item in content['items'])
+    return pairs
+
+
+def percentile(sorted_values, percent):
+    '''Nearest-rank percentile of an already sorted list'''
+    if not sorted_values:
+        return 0.0
+    index = max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+
+def run_route(target, requests, concurrency):
+    '''
+    Issue every (method, path, headers, body) request with ``concurrency`` workers
+
+    :return: Dict with throughput and latency percentiles in milliseconds; any
+             status outside 2xx counts as an error
+    '''
+    def timed(request):
+        started = time.perf_counter()
+        status, _ = target.request(*request)
+        return time.perf_counter() - started, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, requests))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    errors = sum(1 for _, status in results if not 200 <= status < 300)
+    return {
+        'requests': len(results),
+        'errors': errors,
+        'throughput_rps': round(len(results) / elapsed, 1),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--meals', type=int, default=100, help='Meals per user')
+    parser.add_argument('--seed', type=int, default=42, help='Seeds both the dataset and the request mix')
+    parser.add_argument('--requests', type=int, default=500, help='Measured requests per route')
+    parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per route')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--routes', help='Comma-separated subset of routes to run: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--url', help='Base URL of a running server instead of the in-process test client')
+    parser.add_argument('--secret-key', default=os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production'),
+                        help='SECRET_KEY of the server, used to mint access tokens with --url')
+    parser.add_argument('--output', help='Write the report as JSON for benchmarks/compare.py')
+    args = parser.parse_args()
+    selected = set(args.routes.split(',')) if args.routes else None
+    if selected is not None and selected - set(SCENARIOS):
+        parser.error('unknown routes: ' + ', '.join(sorted(selected - set(SCENARIOS))))
+    if args.meals < 2:
+        parser.error('--meals must be at least 2')
+
+    if args.url:
+        target = HTTPTarget(args.url)
+        secret_key = args.secret_key
+    else:
+        from app import db, limiter
+
+        database = os.path.join(tempfile.mkdtemp(prefix='dailydiet-bench-'), 'bench.db')
+        app = create_benchmark_app(f'sqlite:///{database}')
+        limiter.enabled = False
+        # The per-request query warnings would bury the results table
+        app.logger.setLevel(logging.ERROR)
+        with app.app_context():
+            db.create_all()
+            counts = generate(args.users, args.meals, args.seed)
+        print('Generated ' + ', '.join(f'{count} {kind}' for kind, count in counts.items()))
+        target = TestClientTarget(app)
+        secret_key = app.config['SECRET_KEY']
+
+    tokens = make_tokens(secret_key, args.users)
+    context = {
+        'users': args.users,
+        'meals': args.meals,
+        'days': -(-args.meals // len(MEAL_SLOTS)),
+        'shared_items': discover_shared_items(target, tokens, random.Random(f'{args.seed}:shared_items')),
+    }
+    # Deletes pop from the second half of each user's meals, shared by the delete and mixed scenarios
+    deletable = [(user_id, (user_id - 1) * args.meals + index + 1)
+                 for user_id in range(1, args.users + 1) for index in range(args.meals // 2, args.meals)]
+    random.Random(f'{args.seed}:deletable').shuffle(deletable)
+    context['deletable'] = deletable
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'target': args.url or 'test-client',
+            'users': args.users,
+            'meals_per_user': args.meals,
+            'seed': args.seed,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'python': platform.python_version(),
+        },
+        'routes': {}
+    }
+
+    print(f'{"route":<26} {"req/s":>8} {"mean":>8} {"p50":>8} {"p95":>8} {"p99":>8} {"errors":>7}')
+    for name, build in ROUTES:
+        if selected is not None and name not in selected:
+            continue
+        if name == 'get_shared_item' and not context['shared_items']:
+            print(f'{name:<26} skipped, no shared items in the sampled feeds')
+            continue
+        rng = random.Random(f'{args.seed}:{name}')
+        requests = []
+        try:
+            for _ in range(args.warmup + args.requests):
+                user_id, method, path, body = build(rng, context)
+                requests.append((method, path, tokens[user_id] if user_id else {}, body))
+        except IndexError:
+            print(f'{name:<26} skipped, dataset too small for it; raise --users or --meals')
+            continue
+        run_route(target, requests[:args.warmup], args.concurrency)
+        result = run_route(target, requests[args.warmup:], args.concurrency)
+        report['routes'][name] = result
+        print(f'{name:<26} {result["throughput_rps"]:>8.1f} {result["mean_ms"]:>8.2f} {result["p50_ms"]:>8.2f} '
+              f'{result["p95_ms"]:>8.2f} {result["p99_ms"]:>8.2f} {result["errors"]:>7}')
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+            output.write('\n')
+
+
+if __name__ == '__main__':
+    main()
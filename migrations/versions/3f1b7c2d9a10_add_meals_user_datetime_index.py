@@ -0,0 +1,26 @@
+"""Add composite (user_id, datetime, id) index to meals
+
+Revision ID: 3f1b7c2d9a10
+Revises: 9620a5f3585e
+Create Date: 2025-10-06 09:12:31.482051
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1b7c2d9a10'
+down_revision = '9620a5f3585e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('meals', schema=None) as batch_op:
+        batch_op.create_index('ix_meals_user_id_datetime_id', ['user_id', 'datetime', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('meals', schema=None) as batch_op:
+        batch_op.drop_index('ix_meals_user_id_datetime_id')
@@ -0,0 +1,29 @@
+"""Add meals snapshot to SharedItem model
+
+Revision ID: 5b8f20d6c3e1
+Revises: e9b34f7c1a58
+Create Date: 2025-10-10 11:05:46.390512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8f20d6c3e1'
+down_revision = 'e9b34f7c1a58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows are served from the meals table until 'flask rebuild-shared-snapshots' runs
+    with op.batch_alter_table('shared_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('meals_snapshot', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('meals_snapshot_version', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('shared_items', schema=None) as batch_op:
+        batch_op.drop_column('meals_snapshot_version')
+        batch_op.drop_column('meals_snapshot')
@@ -0,0 +1,34 @@
+"""Add shared_items user_id and followers indexes
+
+Revision ID: 5d2b9e7c4a18
+Revises: 8e1f4b7a2c95
+Create Date: 2025-10-16 15:41:07.218634
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2b9e7c4a18'
+down_revision = '8e1f4b7a2c95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('shared_items', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_shared_items_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('followers', schema=None) as batch_op:
+        batch_op.create_index('ix_followers_follower_id_followed_id', ['follower_id', 'followed_id'], unique=False)
+        batch_op.create_index('ix_followers_followed_id_follower_id', ['followed_id', 'follower_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('followers', schema=None) as batch_op:
+        batch_op.drop_index('ix_followers_followed_id_follower_id')
+        batch_op.drop_index('ix_followers_follower_id_followed_id')
+
+    with op.batch_alter_table('shared_items', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_shared_items_user_id'))
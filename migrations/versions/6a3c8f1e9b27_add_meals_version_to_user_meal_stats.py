@@ -0,0 +1,26 @@
+"""Add meals_version to user_meal_stats
+
+Revision ID: 6a3c8f1e9b27
+Revises: 5d2b9e7c4a18
+Create Date: 2025-10-18 10:27:44.902516
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a3c8f1e9b27'
+down_revision = '5d2b9e7c4a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_meal_stats', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('meals_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user_meal_stats', schema=None) as batch_op:
+        batch_op.drop_column('meals_version')
@@ -0,0 +1,26 @@
+"""Add updated_at to SharedItem model
+
+Revision ID: 7d4a91e3b2f6
+Revises: 5b8f20d6c3e1
+Create Date: 2025-10-11 09:37:20.158843
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d4a91e3b2f6'
+down_revision = '5b8f20d6c3e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('shared_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('shared_items', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,45 @@
+"""Add meal_reminders table and meals datetime index
+
+Revision ID: 8e1f4b7a2c95
+Revises: 2c6e8a4f1d73
+Create Date: 2025-10-14 09:12:50.377016
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e1f4b7a2c95'
+down_revision = '2c6e8a4f1d73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('meal_reminders',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('meal_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('meal_datetime', sa.DateTime(), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['meal_id'], ['meals.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('meal_id', 'meal_datetime', name='uq_meal_reminders_meal_id_meal_datetime')
+    )
+    with op.batch_alter_table('meal_reminders', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_meal_reminders_meal_datetime'), ['meal_datetime'], unique=False)
+
+    with op.batch_alter_table('meals', schema=None) as batch_op:
+        batch_op.create_index('ix_meals_datetime_user_id', ['datetime', 'user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('meals', schema=None) as batch_op:
+        batch_op.drop_index('ix_meals_datetime_user_id')
+
+    with op.batch_alter_table('meal_reminders', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_meal_reminders_meal_datetime'))
+
+    op.drop_table('meal_reminders')
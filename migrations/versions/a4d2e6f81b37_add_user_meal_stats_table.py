@@ -0,0 +1,47 @@
+"""Add user_meal_stats table
+
+Revision ID: a4d2e6f81b37
+Revises: 3f1b7c2d9a10
+Create Date: 2025-10-07 14:03:52.617304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d2e6f81b37'
+down_revision = '3f1b7c2d9a10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_meal_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_meals', sa.Integer(), nullable=False),
+    sa.Column('on_diet_meals', sa.Integer(), nullable=False),
+    sa.Column('off_diet_meals', sa.Integer(), nullable=False),
+    sa.Column('total_calories', sa.Integer(), nullable=False),
+    sa.Column('total_protein_grams', sa.Float(), nullable=False),
+    sa.Column('total_carbohydrates_grams', sa.Float(), nullable=False),
+    sa.Column('total_fats_grams', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # Backfill existing users; afterwards the table is maintained on every meal write
+    op.execute(
+        'INSERT INTO user_meal_stats (user_id, total_meals, on_diet_meals, off_diet_meals, '
+        'total_calories, total_protein_grams, total_carbohydrates_grams, total_fats_grams) '
+        'SELECT user_id, COUNT(id), '
+        'SUM(CASE WHEN is_on_diet THEN 1 ELSE 0 END), '
+        'SUM(CASE WHEN is_on_diet THEN 0 ELSE 1 END), '
+        'COALESCE(SUM(calories), 0), COALESCE(SUM(protein_grams), 0), '
+        'COALESCE(SUM(carbohydrates_grams), 0), COALESCE(SUM(fats_grams), 0) '
+        'FROM meals GROUP BY user_id'
+    )
+
+
+def downgrade():
+    op.drop_table('user_meal_stats')
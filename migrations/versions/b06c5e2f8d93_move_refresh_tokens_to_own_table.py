@@ -0,0 +1,68 @@
+"""Move refresh tokens to their own hashed table
+
+Revision ID: b06c5e2f8d93
+Revises: 7d4a91e3b2f6
+Create Date: 2025-10-12 15:48:02.931577
+
+"""
+import hashlib
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b06c5e2f8d93'
+down_revision = '7d4a91e3b2f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('refresh_tokens',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('token_hash', sa.String(length=64), nullable=False),
+    sa.Column('device', sa.String(length=100), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('token_hash')
+    )
+    with op.batch_alter_table('refresh_tokens', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_refresh_tokens_expires_at'), ['expires_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_refresh_tokens_user_id'), ['user_id'], unique=False)
+
+    # Carry over still-valid plaintext tokens as hashes so nobody is logged out
+    connection = op.get_bind()
+    rows = connection.execute(sa.text(
+        'SELECT id, refresh_token, refresh_token_expiration FROM users '
+        'WHERE refresh_token IS NOT NULL AND refresh_token_expiration IS NOT NULL'
+    )).fetchall()
+    if rows:
+        connection.execute(sa.text(
+            'INSERT INTO refresh_tokens (user_id, token_hash, expires_at) '
+            'VALUES (:user_id, :token_hash, :expires_at)'
+        ), [{
+            'user_id': row.id,
+            'token_hash': hashlib.sha256(row.refresh_token.encode()).hexdigest(),
+            'expires_at': row.refresh_token_expiration
+        } for row in rows])
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_users_refresh_token', type_='unique')
+        batch_op.drop_column('refresh_token_expiration')
+        batch_op.drop_column('refresh_token')
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('refresh_token', sa.String(length=128), nullable=True))
+        batch_op.add_column(sa.Column('refresh_token_expiration', sa.DateTime(), nullable=True))
+        batch_op.create_unique_constraint('uq_users_refresh_token', ['refresh_token'])
+
+    with op.batch_alter_table('refresh_tokens', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_refresh_tokens_user_id'))
+        batch_op.drop_index(batch_op.f('ix_refresh_tokens_expires_at'))
+
+    op.drop_table('refresh_tokens')
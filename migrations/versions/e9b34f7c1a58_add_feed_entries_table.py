@@ -0,0 +1,47 @@
+"""Add feed_entries table
+
+Revision ID: e9b34f7c1a58
+Revises: c71e0b5a9d42
+Create Date: 2025-10-09 16:22:09.774120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9b34f7c1a58'
+down_revision = 'c71e0b5a9d42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('feed_entries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('shared_item_id', sa.Integer(), nullable=False),
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['author_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['shared_item_id'], ['shared_items.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'shared_item_id', name='uq_feed_entries_user_id_shared_item_id')
+    )
+    with op.batch_alter_table('feed_entries', schema=None) as batch_op:
+        batch_op.create_index('ix_feed_entries_user_id_created_at_shared_item_id', ['user_id', 'created_at', 'shared_item_id'], unique=False)
+
+    # Backfill feeds from the existing follower graph
+    op.execute(
+        'INSERT INTO feed_entries (user_id, shared_item_id, author_id, created_at) '
+        'SELECT DISTINCT followers.follower_id, shared_items.id, shared_items.user_id, shared_items.created_at '
+        'FROM followers JOIN shared_items ON shared_items.user_id = followers.followed_id'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('feed_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_feed_entries_user_id_created_at_shared_item_id')
+
+    op.drop_table('feed_entries')
@@ -0,0 +1,31 @@
+"""Add image_status and image_thumbnails to meals
+
+Revision ID: f3a7d19c5e04
+Revises: b06c5e2f8d93
+Create Date: 2025-10-13 10:21:44.518230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a7d19c5e04'
+down_revision = 'b06c5e2f8d93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('meals', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_status', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('image_thumbnails', sa.JSON(), nullable=True))
+
+    # Images uploaded before the pipeline existed were stored synchronously
+    op.execute("UPDATE meals SET image_status = 'ready' WHERE image_url IS NOT NULL")
+
+
+def downgrade():
+    with op.batch_alter_table('meals', schema=None) as batch_op:
+        batch_op.drop_column('image_thumbnails')
+        batch_op.drop_column('image_status')
@@ -0,0 +1,35 @@
+import argparse
+import os
+import time
+from app import create_app
+from app.services.reminder_service import get_reminder_scheduler
+
+# Get configuration from environment or use default
+config_name = os.environ.get('FLASK_ENV', 'development')
+
+# Create application instance
+app = create_app(config_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Queue meal reminder emails for all users on a fixed interval')
+    parser.add_argument('--interval', type=int, default=app.config['REMINDER_INTERVAL_SECONDS'],
+                        help='Seconds between scans of upcoming meals')
+    parser.add_argument('--once', action='store_true', help='Run a single scan and exit')
+    args = parser.parse_args()
+
+    while True:
+        started = time.monotonic()
+        with app.app_context():
+            try:
+                totals = get_reminder_scheduler().run_once()
+                app.logger.info('Queued reminders for %d meal(s) across %d user(s)', totals['meals'], totals['users'])
+            except Exception:
+                app.logger.exception('Reminder scan failed')
+        if args.once:
+            break
+        time.sleep(max(0, args.interval - (time.monotonic() - started)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, limiter
+from app.config import config
+
+
+@pytest.fixture
+def make_app():
+    '''Build a testing app on a fresh in-memory database, with config overrides'''
+    contexts = []
+
+    def make(**overrides):
+        config['test'] = type('TestConfig', (config['testing'],), overrides)
+        app = create_app('test')
+        limiter.enabled = False
+        context = app.app_context()
+        context.push()
+        contexts.append(context)
+        db.create_all(bind_key=None)
+        return app
+
+    yield make
+    for context in reversed(contexts):
+        db.session.remove()
+        db.drop_all(bind_key=None)
+        context.pop()
+    config.pop('test', None)
+    limiter.enabled = True
+
+
+def auth_headers(client, username='alice', password='Passw0rdA'):
+    '''Register and log in a user, returning its Authorization header'''
+    email = f'{username}@example.com'
+    client.post('/auth/register', json={'username': username, 'email': email, 'password': password})
+    response = client.post('/auth/login', json={'email': email, 'password': password})
+    return {'Authorization': 'Bearer ' + response.get_json()['access_token']}
@@ -0,0 +1,47 @@
+import io
+import json
+
+import pytest
+
+from app import bulk_import
+from app.bulk_import import MAX_ITEM_BYTES, BulkImportError, iter_json_array, iter_ndjson
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 64 * 1024])
+def test_json_array_across_chunk_boundaries(monkeypatch, chunk_size):
+    monkeypatch.setattr(bulk_import, 'CHUNK_SIZE', chunk_size)
+    items = [{'name': 'Açaí bowl 🍓', 'calories': 12345}, 67890, 'plain', [1.5, None], {}]
+    body = ' \n[ ' + ' ,\n '.join(json.dumps(item, ensure_ascii=False) for item in items) + ' ]\n'
+    assert list(iter_json_array(io.BytesIO(body.encode()))) == items
+
+
+def test_json_array_with_many_small_items():
+    assert sum(iter_json_array(io.BytesIO(('[' + ','.join(['1'] * 100000) + ']').encode()))) == 100000
+
+
+@pytest.mark.parametrize('body, message', [
+    (b'{"name": "x"}', 'Expected a JSON array'),
+    (b'', 'Expected a JSON array'),
+    (b'[1, 2', 'Unexpected end of JSON array'),
+    (b'[1, {"name": }]', 'Invalid JSON array element'),
+])
+def test_json_array_errors(body, message):
+    with pytest.raises(BulkImportError, match=message):
+        list(iter_json_array(io.BytesIO(body)))
+
+
+def test_ndjson_skips_blank_lines():
+    body = b'{"a": 1}\n\n  \n{"b": 2}\n[3]'
+    assert list(iter_ndjson(io.BytesIO(body))) == [{'a': 1}, {'b': 2}, [3]]
+
+
+def test_ndjson_rejects_invalid_lines():
+    with pytest.raises(BulkImportError, match='Invalid JSON on line 2'):
+        list(iter_ndjson(io.BytesIO(b'{"a": 1}\n{oops}\n')))
+
+
+def test_ndjson_rejects_oversized_line_without_buffering_it():
+    stream = io.BytesIO(b'{"a": 1}\n' + b'{"name": "' + b'x' * (10 * MAX_ITEM_BYTES) + b'"}\n')
+    with pytest.raises(BulkImportError, match='Line 2 exceeds'):
+        list(iter_ndjson(stream))
+    assert stream.tell() <= 2 * MAX_ITEM_BYTES
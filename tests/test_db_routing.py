@@ -0,0 +1,67 @@
+import shutil
+
+import pytest
+from flask import g
+from sqlalchemy import update
+
+from app import db
+from app.db_routing import _unavailable_until
+from app.models.meal import Meal
+from conftest import auth_headers
+
+
+@pytest.fixture
+def replicated(make_app, tmp_path):
+    '''
+    A primary and a replica SQLite database holding the same meal under
+    different names, so each read shows which database answered it
+    '''
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    app = make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{primary}', SQLALCHEMY_REPLICA_URIS=[f'sqlite:///{replica}'])
+    client = app.test_client()
+    headers = auth_headers(client)
+    meal_id = client.post('/meals', headers=headers, json={
+        'name': 'On primary', 'description': 'Lunch', 'datetime': '2025-01-01T12:00:00', 'is_on_diet': True
+    }).get_json()['meal']['id']
+
+    db.session.remove()
+    shutil.copy(primary, replica)
+    with db.engines['replica_0'].begin() as connection:
+        connection.execute(update(Meal).values(name='On replica'))
+    return app, client, headers, meal_id
+
+
+def test_read_only_handler_reads_from_the_replica(replicated):
+    _, client, headers, meal_id = replicated
+    assert client.get(f'/meals/{meal_id}', headers=headers).get_json()['meal']['name'] == 'On replica'
+
+
+def test_write_pins_the_rest_of_the_request_to_the_primary(replicated):
+    app, _, _, meal_id = replicated
+    with app.test_request_context():
+        g.use_replica = True
+        assert db.session.get(Meal, meal_id).name == 'On replica'
+        db.session.expunge_all()
+
+        db.session.add(Meal(name='New', description='Snack', datetime=db.func.now(), is_on_diet=True, user_id=1))
+        assert db.session.get(Meal, meal_id).name == 'On primary'
+        db.session.rollback()
+        # Still pinned after the write is gone: the request may have committed it
+        assert db.session.query(Meal.name).filter_by(id=meal_id).scalar() == 'On primary'
+        db.session.remove()
+
+
+def test_unavailable_replica_falls_back_to_the_primary(make_app, tmp_path):
+    app = make_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'primary.db'}",
+                   SQLALCHEMY_REPLICA_URIS=[f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"])
+    client = app.test_client()
+    headers = auth_headers(client)
+    meal_id = client.post('/meals', headers=headers, json={
+        'name': 'On primary', 'description': 'Lunch', 'datetime': '2025-01-01T12:00:00', 'is_on_diet': True
+    }).get_json()['meal']['id']
+
+    response = client.get(f'/meals/{meal_id}', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['meal']['name'] == 'On primary'
+    assert db.engines['replica_0'] in _unavailable_until
+    assert client.get('/meals', headers=headers).status_code == 200
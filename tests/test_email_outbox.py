@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import update
+
+from app import db
+from app.models.email_outbox import EmailOutbox
+from app.services.email_service import get_email_dispatcher
+
+
+@pytest.fixture
+def dispatcher(make_app):
+    make_app(EMAIL_DISPATCH_MODE='worker', EMAIL_MAX_ATTEMPTS=3)
+    return get_email_dispatcher()
+
+
+def enqueue(count):
+    EmailOutbox.enqueue_many(
+        {'to_email': f'user{index}@example.com', 'subject': f'Hello {index}', 'html_content': '<p>Hi</p>'}
+        for index in range(count)
+    )
+    db.session.commit()
+
+
+def statuses():
+    return {message.to_email: (message.status, message.attempts)
+            for message in EmailOutbox.query.order_by(EmailOutbox.id)}
+
+
+def make_due():
+    db.session.execute(update(EmailOutbox).values(next_attempt_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+    db.session.commit()
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def test_claim_leases_emails_until_the_lease_expires(dispatcher):
+    enqueue(3)
+    claimed = EmailOutbox.claim_batch(2, lease_seconds=300)
+    db.session.commit()
+    assert [message.to_email for message in claimed] == ['user0@example.com', 'user1@example.com']
+
+    db.session.expire_all()
+    leased = EmailOutbox.query.filter_by(status=EmailOutbox.SENDING).all()
+    assert len(leased) == 2
+    assert all(message.next_attempt_at > utcnow() + timedelta(seconds=290) for message in leased)
+    # Leased emails are skipped until the lease runs out, e.g. because the dispatcher died
+    assert [message.to_email for message in EmailOutbox.claim_batch(10)] == ['user2@example.com']
+    db.session.commit()
+    make_due()
+    assert len(EmailOutbox.claim_batch(10)) == 3
+
+
+def test_dispatch_sends_a_batch_in_one_call(dispatcher):
+    enqueue(5)
+    assert dispatcher.dispatch_once() == {'sent': 5, 'failed': 0}
+    assert dispatcher.transport.calls == 1
+    assert len(dispatcher.transport.sent) == 5
+
+    db.session.expire_all()
+    assert set(statuses().values()) == {(EmailOutbox.SENT, 1)}
+    assert all(message.sent_at is not None for message in EmailOutbox.query)
+    assert dispatcher.dispatch_once() == {'sent': 0, 'failed': 0}
+
+
+def test_outage_retries_with_backoff(dispatcher):
+    enqueue(4)
+    dispatcher.transport.failures = 1
+    assert dispatcher.dispatch_once() == {'sent': 0, 'failed': 4}
+
+    db.session.expire_all()
+    assert set(statuses().values()) == {(EmailOutbox.PENDING, 1)}
+    assert all(message.next_attempt_at > utcnow() for message in EmailOutbox.query)
+    assert all('unavailable' in message.last_error for message in EmailOutbox.query)
+    assert dispatcher.drain() == {'sent': 0, 'failed': 0}
+
+    make_due()
+    assert dispatcher.drain() == {'sent': 4, 'failed': 0}
+    db.session.expire_all()
+    assert set(statuses().values()) == {(EmailOutbox.SENT, 2)}
+
+
+def test_rejection_only_backs_off_the_rejected_email(dispatcher):
+    enqueue(8)
+    dispatcher.transport.rejected = {'user5@example.com'}
+    assert dispatcher.dispatch_once() == {'sent': 7, 'failed': 1}
+    # Bisecting 8 emails down to the rejected one: 1 + 2 + 2 + 2 calls
+    assert dispatcher.transport.calls == 7
+
+    db.session.expire_all()
+    result = statuses()
+    assert result.pop('user5@example.com') == (EmailOutbox.PENDING, 1)
+    assert set(result.values()) == {(EmailOutbox.SENT, 1)}
+
+
+def test_gives_up_after_max_attempts(dispatcher):
+    enqueue(2)
+    dispatcher.transport.rejected = {'user1@example.com'}
+    for _ in range(dispatcher.max_attempts):
+        make_due()
+        dispatcher.drain()
+
+    db.session.expire_all()
+    assert statuses() == {'user0@example.com': (EmailOutbox.SENT, 1), 'user1@example.com': (EmailOutbox.FAILED, 3)}
+    make_due()
+    assert dispatcher.drain() == {'sent': 0, 'failed': 0}
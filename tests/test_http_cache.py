@@ -0,0 +1,43 @@
+import msgpack
+import pytest
+
+from conftest import auth_headers
+
+MSGPACK = {'Accept': 'application/msgpack'}
+
+
+@pytest.fixture
+def meal(make_app):
+    client = make_app().test_client()
+    headers = auth_headers(client)
+    response = client.post('/meals', headers=headers, json={
+        'name': 'Salad', 'description': 'Lunch', 'datetime': '2025-01-01T12:00:00', 'is_on_diet': True
+    })
+    return client, headers, f"/meals/{response.get_json()['meal']['id']}"
+
+
+def test_json_and_msgpack_have_different_etags(meal):
+    client, headers, path = meal
+    as_json = client.get(path, headers=headers)
+    as_msgpack = client.get(path, headers=dict(headers, **MSGPACK))
+    assert as_msgpack.mimetype == 'application/msgpack'
+    assert msgpack.unpackb(as_msgpack.data)['meal'] == as_json.get_json()['meal']
+    assert as_json.headers['ETag'] != as_msgpack.headers['ETag']
+
+    # A cached JSON copy does not validate a MessagePack request, and the reverse
+    revalidated = client.get(path, headers=dict(headers, **MSGPACK, **{'If-None-Match': as_json.headers['ETag']}))
+    assert revalidated.status_code == 200
+    assert revalidated.mimetype == 'application/msgpack'
+    revalidated = client.get(path, headers=dict(headers, **{'If-None-Match': as_msgpack.headers['ETag']}))
+    assert revalidated.status_code == 200
+
+
+@pytest.mark.parametrize('accept', [{}, MSGPACK])
+def test_not_modified_varies_like_the_full_response(meal, accept):
+    client, headers, path = meal
+    full = client.get(path, headers=dict(headers, **accept))
+    not_modified = client.get(path, headers=dict(headers, **accept, **{'If-None-Match': full.headers['ETag']}))
+    assert not_modified.status_code == 304
+    assert not_modified.headers['ETag'] == full.headers['ETag']
+    for response in (full, not_modified):
+        assert {'accept', 'accept-encoding'} <= {value.lower() for value in response.vary}
@@ -0,0 +1,139 @@
+import io
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from PIL import Image
+
+from app import db
+from app.models.meal import Meal
+from app.services.image_pipeline import ImagePipeline, get_image_pipeline
+from conftest import auth_headers
+
+
+@pytest.fixture
+def image_app(make_app, tmp_path):
+    def make(**overrides):
+        return make_app(IMAGE_STORAGE_BACKEND='filesystem', IMAGE_STORAGE_DIR=str(tmp_path / 'images'),
+                        IMAGE_SPOOL_DIR=str(tmp_path / 'spool'), IMAGE_STORAGE_BASE_URL='http://images.test',
+                        **overrides)
+    return make
+
+
+def png_bytes(size=(640, 480)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 120, 40)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def create_meal(client, headers):
+    response = client.post('/meals', headers=headers, json={
+        'name': 'Salad', 'description': 'Lunch', 'datetime': '2025-01-01T12:00:00', 'is_on_diet': True
+    })
+    return response.get_json()['meal']['id']
+
+
+def upload(client, headers, meal_id, content, filename='lunch.png'):
+    return client.post(f'/meals/{meal_id}/image', headers=headers, content_type='multipart/form-data',
+                       data={'file': (io.BytesIO(content), filename)})
+
+
+def stored_files(app):
+    directory = app.config['IMAGE_STORAGE_DIR']
+    return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+
+def test_upload_is_pending_until_the_worker_finishes(image_app, monkeypatch):
+    app = image_app(IMAGE_WORKERS=1)
+    client = app.test_client()
+    headers = auth_headers(client)
+    meal_id = create_meal(client, headers)
+
+    release = threading.Event()
+    process = ImagePipeline.process
+
+    def blocked_process(self, *args, **kwargs):
+        release.wait(5)
+        return process(self, *args, **kwargs)
+
+    monkeypatch.setattr(ImagePipeline, 'process', blocked_process)
+    response = upload(client, headers, meal_id, png_bytes())
+    assert response.status_code == 202
+    assert response.get_json()['meal']['image_status'] == 'pending'
+
+    release.set()
+    get_image_pipeline().executor.shutdown(wait=True)
+
+    meal = client.get(f'/meals/{meal_id}', headers=headers).get_json()['meal']
+    assert meal['image_status'] == 'ready'
+    assert meal['image_url'].startswith('http://images.test/user_1_meal_')
+    assert sorted(meal['image_thumbnails']) == ['128', '512']
+    assert len(stored_files(app)) == 3
+
+
+def test_upload_rejects_files_that_are_not_images(image_app):
+    app = image_app()
+    client = app.test_client()
+    headers = auth_headers(client)
+    meal_id = create_meal(client, headers)
+
+    response = upload(client, headers, meal_id, b'not an image', filename='lunch.png')
+    assert response.status_code == 400
+    assert db.session.get(Meal, meal_id).image_status is None
+    assert os.listdir(app.config['IMAGE_SPOOL_DIR']) == []
+
+
+def test_spooled_non_image_fails_without_keeping_the_original(image_app):
+    app = image_app()
+    client = app.test_client()
+    meal_id = create_meal(client, auth_headers(client))
+    db.session.get(Meal, meal_id).image_status = 'pending'
+    db.session.commit()
+
+    pipeline = get_image_pipeline()
+    spool_path = os.path.join(pipeline.spool_dir, 'broken.png')
+    with open(spool_path, 'wb') as spooled:
+        spooled.write(b'not an image')
+    pipeline.submit(meal_id, spool_path, f'user_1_meal_{meal_id}_broken.png', 'image/png')
+
+    db.session.expire_all()
+    meal = db.session.get(Meal, meal_id)
+    assert meal.image_status == 'failed'
+    assert meal.image_url is None
+    assert stored_files(app) == []
+    assert os.listdir(pipeline.spool_dir) == []
+
+
+def test_sweep_requeues_orphaned_jobs_and_deletes_stale_files(image_app):
+    app = image_app()
+    client = app.test_client()
+    meal_id = create_meal(client, auth_headers(client))
+    meal = db.session.get(Meal, meal_id)
+    meal.image_status = 'pending'
+    meal.updated_at = datetime.now(timezone.utc) - timedelta(hours=1)
+    db.session.commit()
+
+    pipeline = get_image_pipeline()
+    # A job whose worker died: the spooled file and manifest are still there
+    spool_path = os.path.join(pipeline.spool_dir, 'lost.png')
+    with open(spool_path, 'wb') as spooled:
+        spooled.write(png_bytes())
+    with open(pipeline.job_path(spool_path), 'w') as job:
+        json.dump({'meal_id': meal_id, 'object_name': f'user_1_meal_{meal_id}_lost.png', 'content_type': 'image/png'}, job)
+    # A spooled file nothing is waiting for
+    orphan_path = os.path.join(pipeline.spool_dir, 'orphan.png')
+    with open(orphan_path, 'wb') as orphan:
+        orphan.write(b'leftover')
+    an_hour_ago = datetime.now().timestamp() - 3600
+    for path in (spool_path, pipeline.job_path(spool_path), orphan_path):
+        os.utime(path, (an_hour_ago, an_hour_ago))
+
+    assert pipeline.sweep(max_age_minutes=15) == {'requeued': 1, 'failed': 0, 'deleted': 1}
+
+    db.session.expire_all()
+    meal = db.session.get(Meal, meal_id)
+    assert meal.image_status == 'ready'
+    assert meal.image_url.endswith(f'user_1_meal_{meal_id}_lost.png')
+    assert os.listdir(pipeline.spool_dir) == []
@@ -0,0 +1,110 @@
+import boto3
+import pytest
+import requests
+
+moto = pytest.importorskip('moto')
+
+from conftest import auth_headers
+
+BUCKET = 'meal-bucket'
+
+
+@pytest.fixture
+def s3_app(make_app, monkeypatch):
+    for name, value in (('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'),
+                        ('AWS_DEFAULT_REGION', 'us-east-1')):
+        monkeypatch.setenv(name, value)
+    with moto.mock_aws():
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET)
+        yield make_app(IMAGE_STORAGE_BACKEND='s3', S3_BUCKET_NAME=BUCKET, AWS_REGION='us-east-1',
+                       IMAGE_MAX_UPLOAD_BYTES=1024)
+
+
+def create_meal(client, headers):
+    response = client.post('/meals', headers=headers, json={
+        'name': 'Salad', 'description': 'Lunch', 'datetime': '2025-01-01T12:00:00', 'is_on_diet': True
+    })
+    return response.get_json()['meal']['id']
+
+
+@pytest.fixture
+def meal(s3_app):
+    client = s3_app.test_client()
+    headers = auth_headers(client)
+    return client, headers, create_meal(client, headers)
+
+
+def request_upload(client, headers, meal_id, content_type='image/png'):
+    return client.post(f'/meals/{meal_id}/image/upload-url', headers=headers,
+                       json={'filename': 'my lunch.png', 'content_type': content_type})
+
+
+def test_direct_upload_attaches_the_image(meal):
+    client, headers, meal_id = meal
+    response = request_upload(client, headers, meal_id)
+    assert response.status_code == 200
+    upload = response.get_json()
+    assert upload['object_name'].startswith(f'user_1_meal_{meal_id}_')
+
+    early = client.post(f'/meals/{meal_id}/image/complete', headers=headers,
+                        json={'object_name': upload['object_name']})
+    assert early.status_code == 409
+
+    posted = requests.post(upload['upload_url'], data=upload['fields'],
+                           files={'file': ('lunch.png', b'\x89PNG' + b'0' * 100)})
+    assert posted.status_code in (200, 201, 204)
+
+    response = client.post(f'/meals/{meal_id}/image/complete', headers=headers,
+                           json={'object_name': upload['object_name']})
+    assert response.status_code == 200
+    completed = response.get_json()['meal']
+    assert completed['image_status'] == 'ready'
+    assert completed['image_url'].endswith(upload['object_name'])
+
+
+def test_complete_rejects_oversized_uploads(meal):
+    # moto does not enforce the policy's content-length-range, S3 itself would
+    client, headers, meal_id = meal
+    upload = request_upload(client, headers, meal_id).get_json()
+    requests.post(upload['upload_url'], data=upload['fields'], files={'file': ('lunch.png', b'0' * 2048)})
+
+    response = client.post(f'/meals/{meal_id}/image/complete', headers=headers,
+                           json={'object_name': upload['object_name']})
+    assert response.status_code == 400
+    s3 = boto3.client('s3', region_name='us-east-1')
+    assert 'Contents' not in s3.list_objects_v2(Bucket=BUCKET, Prefix=upload['object_name'])
+
+
+def test_upload_url_rejects_other_content_types(meal):
+    client, headers, meal_id = meal
+    assert request_upload(client, headers, meal_id, content_type='text/html').status_code == 400
+
+
+def test_complete_rejects_keys_issued_for_another_meal(meal):
+    client, headers, meal_id = meal
+    other_meal_id = create_meal(client, headers)
+    upload = request_upload(client, headers, meal_id).get_json()
+
+    response = client.post(f'/meals/{other_meal_id}/image/complete', headers=headers,
+                           json={'object_name': upload['object_name']})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'object_name was not issued for this meal'
+
+
+def test_complete_rejects_keys_with_a_slash(meal):
+    client, headers, meal_id = meal
+    response = client.post(f'/meals/{meal_id}/image/complete', headers=headers,
+                           json={'object_name': f'user_1_meal_{meal_id}_x/../other.png'})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'object_name was not issued for this meal'
+
+
+def test_complete_deletes_objects_that_are_not_images(meal):
+    client, headers, meal_id = meal
+    object_name = f'user_1_meal_{meal_id}_bad'
+    s3 = boto3.client('s3', region_name='us-east-1')
+    s3.put_object(Bucket=BUCKET, Key=object_name, Body=b'<html>', ContentType='text/html')
+
+    response = client.post(f'/meals/{meal_id}/image/complete', headers=headers, json={'object_name': object_name})
+    assert response.status_code == 400
+    assert 'Contents' not in s3.list_objects_v2(Bucket=BUCKET, Prefix=object_name)
@@ -0,0 +1,43 @@
+import pytest
+
+
+@pytest.fixture
+def metrics_client(make_app):
+    def make(**overrides):
+        return make_app(METRICS_ENDPOINT_ENABLED=True, **overrides).test_client()
+    return make
+
+
+def scrape(client, address, headers=None):
+    return client.get('/metrics', headers=headers, environ_base={'REMOTE_ADDR': address}).status_code
+
+
+def test_endpoint_is_off_by_default(make_app):
+    assert make_app().test_client().get('/metrics').status_code == 404
+
+
+def test_without_token_or_allowed_ips_only_loopback_may_scrape(metrics_client):
+    client = metrics_client()
+    assert scrape(client, '203.0.113.7') == 403
+    assert scrape(client, '127.0.0.1') == 200
+    assert scrape(client, '::1') == 200
+
+
+def test_token_is_required_from_any_address(metrics_client):
+    client = metrics_client(METRICS_TOKEN='s3cret')
+    assert scrape(client, '127.0.0.1') == 401
+    assert scrape(client, '203.0.113.7', {'Authorization': 'Bearer nope'}) == 401
+    assert scrape(client, '203.0.113.7', {'Authorization': 'Bearer s3cret'}) == 200
+
+
+def test_allowed_ips_replace_the_loopback_default(metrics_client):
+    client = metrics_client(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    assert scrape(client, '127.0.0.1') == 403
+    assert scrape(client, '10.0.0.1') == 200
+
+
+def test_scrape_reports_request_counters(metrics_client):
+    client = metrics_client()
+    client.get('/health')
+    body = client.get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'}).get_data(as_text=True)
+    assert 'http_requests_total{route="/health",method="GET",status="200"} 1' in body
@@ -0,0 +1,111 @@
+import logging
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models.meal import Meal
+from app.query_stats import assert_max_queries, collect_queries, fingerprint
+from conftest import auth_headers
+
+
+def create_meals(client, headers, count):
+    ids = []
+    for index in range(count):
+        response = client.post('/meals', headers=headers, json={
+            'name': f'Meal {index}', 'description': 'Logged', 'datetime': f'2025-01-{index % 28 + 1:02d}T12:00:00',
+            'is_on_diet': index % 3 != 0, 'category': 'lunch', 'calories': 400 + index
+        })
+        ids.append(response.get_json()['meal']['id'])
+    return ids
+
+
+@pytest.fixture
+def social(make_app):
+    '''alice shares meals and bob follows her'''
+    app = make_app()
+    client = app.test_client()
+    alice = auth_headers(client, 'alice', 'Passw0rdA')
+    bob = auth_headers(client, 'bob', 'Passw0rdB')
+    meal_ids = create_meals(client, alice, 30)
+    client.post('/user/alice/follow', headers=bob)
+    shared_ids = [
+        client.post('/social/share', headers=alice, json={'title': f'Week {index}', 'meal_ids': meal_ids[index:index + 3]})
+        .get_json()['shared_item']['id']
+        for index in range(0, 30, 3)
+    ]
+    return client, alice, bob, shared_ids
+
+
+def warm_get(client, path, headers):
+    # The first request also fills the auth cache; budgets are for the steady state
+    client.get(path, headers=headers)
+
+
+def test_fingerprint_ignores_parameters_and_whitespace():
+    assert fingerprint("SELECT *\n  FROM meals WHERE id = 5 AND name = 'x'") == 'SELECT * FROM meals WHERE id = ? AND name = ?'
+    assert fingerprint('SELECT * FROM meals WHERE id IN (?, ?, ?)') == fingerprint('SELECT * FROM meals WHERE id IN (?)')
+    assert fingerprint('SELECT * FROM meals WHERE id = :id_1') == fingerprint('SELECT * FROM meals WHERE id = %(id)s')
+
+
+def test_get_meals_query_budget(social):
+    client, alice, _, _ = social
+    warm_get(client, '/meals?per_page=20', alice)
+    with assert_max_queries(3):
+        response = client.get('/meals?per_page=20', headers=alice)
+    assert response.status_code == 200
+    assert len(response.get_json()['meals']) == 20
+
+
+def test_get_feed_query_budget(social):
+    client, _, bob, shared_ids = social
+    warm_get(client, '/social/feed?limit=20', bob)
+    with assert_max_queries(1):
+        response = client.get('/social/feed?limit=20', headers=bob)
+    assert response.status_code == 200
+    assert len(response.get_json()['items']) == len(shared_ids)
+
+
+def test_get_shared_item_query_budget(social):
+    client, _, bob, shared_ids = social
+    warm_get(client, f'/social/share/{shared_ids[0]}', bob)
+    with assert_max_queries(3):
+        response = client.get(f'/social/share/{shared_ids[0]}', headers=bob)
+    assert response.status_code == 200
+
+
+def test_assert_max_queries_lists_the_statements(make_app):
+    make_app()
+    with pytest.raises(AssertionError, match=r'Expected at most 1 queries, 2 were executed:\n  1\. SELECT 1'):
+        with assert_max_queries(1):
+            db.session.execute(text('SELECT 1'))
+            db.session.execute(text('SELECT 2'))
+
+
+def test_failed_statements_do_not_skew_later_timings(make_app):
+    make_app()
+    with collect_queries() as stats:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                db.session.execute(text('SELECT * FROM missing_table'))
+            db.session.rollback()
+        db.session.execute(text('SELECT 1'))
+    assert stats.count == 1
+    assert 0 <= stats.duration < 1
+    assert 'query_stats_started' not in db.session.connection().info
+
+
+def test_repeated_fingerprints_are_reported(make_app, caplog):
+    app = make_app(QUERY_REPEAT_WARN_THRESHOLD=5)
+
+    @app.route('/n-plus-one')
+    def n_plus_one():
+        for meal_id in range(1, 7):
+            db.session.get(Meal, meal_id)
+        return {}
+
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        assert app.test_client().get('/n-plus-one').status_code == 200
+    assert 'GET /n-plus-one executed 6 queries' in caplog.text
+    assert '6x SELECT meals.id' in caplog.text
@@ -0,0 +1,13 @@
+from app.services.s3_service import object_url
+
+BUCKET = 'meal-bucket'
+
+
+def test_object_urls_follow_a_custom_endpoint(make_app):
+    make_app(S3_ENDPOINT_URL='http://localhost:9000/')
+    assert object_url(BUCKET, 'user_1_meal_1_a.png') == 'http://localhost:9000/meal-bucket/user_1_meal_1_a.png'
+
+
+def test_object_urls_default_to_aws(make_app):
+    make_app(S3_ENDPOINT_URL=None)
+    assert object_url(BUCKET, 'user_1_meal_1_a.png') == 'https://meal-bucket.s3.amazonaws.com/user_1_meal_1_a.png'